@@ -8,15 +8,57 @@
     python auto_optimize.py --dry-run          # 模擬執行，不更新參數
     python auto_optimize.py --strategy ma20    # 只優化特定策略
     python auto_optimize.py --days 60          # 自定義回測天數
+    python auto_optimize.py --workers 8        # 多進程評估參數組合
+    python auto_optimize.py --no-result-cache  # 不使用回測結果快取
+    python auto_optimize.py --resume           # 從本週工作的檢查點續跑
+    python auto_optimize.py --max-runtime 50   # 50 分鐘後停止並保存目前最佳參數
+    python auto_optimize.py --pareto           # 另存 Alpha / Sharpe / 回撤的 Pareto 前緣 (data/pareto)
 """
 
+import os
 import json
+import time
 import argparse
 from datetime import datetime
 import yfinance as yf
 import pandas as pd
 import numpy as np
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
+
+from src.backtester import kernel, pareto, scoring
+from src.backtester.checkpoint import CheckpointStore
+from src.backtester.features import day_records, market_features
+from src.backtester.fetch import fetch_concurrent
+from src.backtester.parallel import parallel_map
+from src.backtester.results import ResultCache, frame_fingerprint
+from src.backtester.search import simplex_grid, weight_dicts
+
+RESULT_CACHE_PATH = os.environ.get('RESULT_CACHE_PATH', 'data/cache/results.sqlite')  # 回測結果快取
+CHECKPOINT_PATH = os.environ.get('CHECKPOINT_PATH', 'data/cache/checkpoints.sqlite')  # 優化工作檢查點
+PARETO_DIR = os.environ.get('PARETO_DIR', 'data/pareto')  # 優化結果的 Pareto 前緣（auto_{策略}.json）
+
+# Pareto 前緣的目標：1 = 越大越好，-1 = 越小越好（SimpleBacktester 的 max_drawdown 為正值百分比）
+PARETO_OBJECTIVES = {'alpha': 1, 'sharpe_ratio': 1, 'max_drawdown': -1}
+
+INITIAL_NAV = 10_000_000  # SimpleBacktester 初始資金
+
+# 逐日特徵：下載期間（需涵蓋 ma60 暖機 + 回測天數）與 SimpleBacktester / 策略評分使用的欄位
+FEATURE_PERIOD = '1y'
+FEATURE_COLUMNS = [
+    'close', 'change_pct', 'ma20', 'ma20_diff_pct', 'days_above_ma20', 'days_below_ma20',
+    'volume_ratio', 'vix', 'us10y_change',
+]
+
+# Default 策略權重搜索空間：各因子上下限（含端點）與格點
+DEFAULT_WEIGHT_NAMES = ['price_momentum', 'volume', 'vix', 'bond', 'mag7']
+DEFAULT_WEIGHT_BOUNDS = {
+    'price_momentum': (0.10, 0.35),
+    'volume': (0.10, 0.35),
+    'vix': (0.10, 0.35),
+    'bond': (0.10, 0.35),
+    'mag7': (0.05, 0.40),
+}
+DEFAULT_WEIGHT_RESOLUTION = 0.05
 
 # 假設已經有 qqq_analyzer.py 中的類
 try:
@@ -34,140 +76,218 @@ except ImportError:
 # ============================================
 
 class SimpleBacktester:
-    """簡化版回測引擎 - 修正 Pandas 類型問題"""
+    """簡化版回測引擎：讀取整個工作共用的逐日特徵矩陣，整批評分後以 kernel.share_fill 模擬整股交易"""
     
     @staticmethod
-    def backtest(strategy, prices: pd.DataFrame, days: int = 60) -> Dict:
+    def allocations(strategy, features: pd.DataFrame) -> np.ndarray:
+        """每日的 QQQ 目標配置比例（%）；策略有 score_batch / allocation_batch 時整批評分，否則逐日呼叫 score"""
+        score_batch = getattr(strategy, 'score_batch', None)
+        allocation_batch = getattr(strategy, 'allocation_batch', None)
+        if score_batch is not None and allocation_batch is not None:
+            try:
+                return np.asarray(allocation_batch(score_batch(features)['total_score']), dtype=float)
+            except NotImplementedError:
+                pass
+        return np.array([
+            float(strategy.get_allocation(strategy.score(day)['total_score'])['qqq_pct'])
+            for day in day_records(features)
+        ])
+    
+    @staticmethod
+    def backtest(strategy, features: pd.DataFrame, days: int = 60) -> Dict:
         """
         執行回測
         
         Args:
             strategy: 策略實例
-            prices: 價格數據 DataFrame
+            features: 逐日特徵矩陣（load_features），所有參數組合共用
             days: 回測天數
             
         Returns:
             績效指標字典
         """
-        if len(prices) < days:
-            days = len(prices)
+        test = features.tail(days)
+        closes = test['close'].to_numpy(dtype=float)
+        return SimpleBacktester.simulate(closes, SimpleBacktester.allocations(strategy, test)[None, :])[0]
+    
+    @staticmethod
+    def simulate(closes: np.ndarray, allocations: np.ndarray) -> List[Dict]:
+        """(組合數 × 天數) 的 QQQ 配置（%）以整數股同時模擬，返回每組的績效指標字典"""
+        targets = np.array(allocations, dtype=float) / 100.0
+        targets[:, :1] = 0.0  # 第一天只作為起點，不交易
         
-        # 重置索引確保連續
-        test_prices = prices.tail(days).copy().reset_index(drop=True)
+        # 整數股成交（現金不足不買）
+        fill = kernel.share_fill_batch(closes, targets, INITIAL_NAV)
+        navs = np.concatenate((np.full((len(targets), 1), float(INITIAL_NAV)), fill['nav'][:, 1:]), axis=1)
         
-        nav = 10_000_000
-        cash = float(nav)
-        shares = 0
-        nav_history = [float(nav)]
+        # 計算指標
+        final_return = (navs[:, -1] - navs[:, 0]) / navs[:, 0] * 100
         
-        for i in range(1, len(test_prices)):
-            # 🔧 修正：明確轉換為 float
-            price = float(test_prices.loc[i, 'Close'])
-            
-            # 簡化的市場數據
-            day_data = {
-                'qqq': {'close': price},
-                'vix': {'value': 20.0},
-                'technicals': {}
-            }
-            
-            try:
-                # 獲取配置
-                score_result = strategy.score(day_data)
-                allocation = strategy.get_allocation(score_result['total_score'])
-                target_pct = float(allocation['qqq_pct']) / 100.0
-                
-                # 調整持倉
-                total_value = cash + shares * price
-                target_value = total_value * target_pct
-                target_shares = int(target_value / price) if price > 0 else 0
-                
-                if target_shares > shares:
-                    # 買入
-                    shares_to_buy = target_shares - shares
-                    cost = float(shares_to_buy * price)
-                    
-                    if cost <= cash:  # 🔧 修正：現在是 float 比較，不會有問題
-                        shares += shares_to_buy
-                        cash -= cost
-                        
-                elif target_shares < shares:
-                    # 賣出
-                    shares_to_sell = shares - target_shares
-                    proceeds = float(shares_to_sell * price)
-                    cash += proceeds
-                    shares -= shares_to_sell
-                
-                # 記錄 NAV
-                nav = float(cash + shares * price)
-                nav_history.append(nav)
-                
-            except Exception as e:
-                print(f"⚠️ 第 {i} 天回測錯誤: {e}")
-                # 保持上一個 NAV
-                nav_history.append(nav_history[-1])
+        # 基準報酬（Buy & Hold）
+        benchmark_return = (closes[-1] - closes[0]) / closes[0] * 100 if len(closes) else 0.0
         
-        # 計算指標
-        try:
-            final_return = (nav_history[-1] - nav_history[0]) / nav_history[0] * 100
-            
-            # 基準報酬（Buy & Hold）
-            first_price = float(test_prices.loc[0, 'Close'])
-            last_price = float(test_prices.loc[len(test_prices)-1, 'Close'])
-            benchmark_return = (last_price - first_price) / first_price * 100
-            
-            # Sharpe Ratio
-            if len(nav_history) > 1:
-                returns = [(nav_history[i] - nav_history[i-1]) / nav_history[i-1] 
-                          for i in range(1, len(nav_history))]
-                
-                if len(returns) > 1:
-                    returns_mean = np.mean(returns)
-                    returns_std = np.std(returns)
-                    sharpe = (returns_mean / returns_std * np.sqrt(252)) if returns_std > 0 else 0
-                else:
-                    sharpe = 0
-            else:
-                sharpe = 0
-            
-            # 最大回撤
-            peak = nav_history[0]
-            max_dd = 0.0
-            for nav_val in nav_history:
-                if nav_val > peak:
-                    peak = nav_val
-                dd = (peak - nav_val) / peak * 100
-                if dd > max_dd:
-                    max_dd = dd
-            
-            return {
-                'total_return': round(final_return, 2),
-                'benchmark_return': round(benchmark_return, 2),
-                'alpha': round(final_return - benchmark_return, 2),
-                'sharpe_ratio': round(sharpe, 2),
-                'max_drawdown': round(max_dd, 2),
-                'final_nav': round(nav_history[-1], 2),
-                'days': len(nav_history) - 1
-            }
-            
-        except Exception as e:
-            print(f"❌ 計算指標錯誤: {e}")
-            return {
-                'total_return': 0.0,
-                'benchmark_return': 0.0,
-                'alpha': 0.0,
-                'sharpe_ratio': 0.0,
-                'max_drawdown': 0.0,
-                'final_nav': nav_history[-1] if nav_history else nav,
-                'days': len(nav_history) - 1
+        # Sharpe Ratio / 最大回撤
+        sharpe = kernel.return_stats(kernel.level_returns(navs))['sharpe_ratio']
+        max_dd = kernel.max_drawdown(navs, relative=True) * 100
+        
+        return [
+            {
+                'total_return': round(float(final_return[k]), 2),
+                'benchmark_return': round(float(benchmark_return), 2),
+                'alpha': round(float(final_return[k] - benchmark_return), 2),
+                'sharpe_ratio': round(float(sharpe[k]), 2),
+                'max_drawdown': round(float(max_dd[k]), 2),
+                'final_nav': round(float(navs[k, -1]), 2),
+                'days': navs.shape[1] - 1
             }
+            for k in range(len(navs))
+        ]
+    
+    @staticmethod
+    def default_weight_metrics(features: pd.DataFrame, weights: List[Dict[str, float]], days: int = 60) -> List[Dict]:
+        """
+        一次評估多組 Default 權重
+        
+        因子分數矩陣只算一次，同一鍵順序的權重以一次矩陣乘法（scoring.matrix_totals）計分，
+        配置矩陣再以 kernel.share_fill_batch 同時模擬；結果與逐組 backtest(DefaultStrategy) 相同。
+        """
+        test = features.tail(days)
+        factors = scoring.default_factor_scores(
+            scoring.frame_column(test, 'change_pct', 0),
+            scoring.frame_column(test, 'volume_ratio', 1.0),
+            scoring.frame_column(test, 'vix', 20),
+            scoring.frame_column(test, 'us10y_change', 0),
+        )
+        
+        totals = np.empty((len(weights), len(test)))
+        # 依權重鍵的順序分組，保持與 DefaultStrategy.score 相同的加總順序
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for i, w in enumerate(weights):
+            groups.setdefault(tuple(w), []).append(i)
+        for names, members in groups.items():
+            factor_matrix = np.stack([factors[f] for f in names]).astype(float)
+            matrix = np.array([[weights[i][f] for f in names] for i in members], dtype=float)
+            totals[members] = scoring.matrix_totals(factor_matrix, matrix)
+        
+        allocations = scoring.allocation_lookup(totals, scoring.DEFAULT_ALLOCATION)
+        return SimpleBacktester.simulate(test['close'].to_numpy(dtype=float), allocations)
+
+
+def load_features(period: str = FEATURE_PERIOD) -> pd.DataFrame:
+    """
+    下載 QQQ / ^VIX / ^TNX 並計算逐日特徵矩陣（每個工作只做一次）
+    
+    與 backtest.py 使用相同的特徵（真實 VIX、10Y 變化、MA20 距離、連續天數、量比），
+    只保留策略評分需要的欄位；QQQ 無資料時返回空 DataFrame。
+    """
+    frames = fetch_concurrent(["QQQ", "^VIX", "^TNX"],
+                              lambda ticker: yf.Ticker(ticker).history(period=period, auto_adjust=True))
+    if frames["QQQ"].empty:
+        return pd.DataFrame()
+    return market_features(frames)[FEATURE_COLUMNS].astype(float)
 
 
 # ============================================
 # 網格搜索優化
 # ============================================
 
-def optimize_ma20_params(prices: pd.DataFrame, days: int = 60) -> Dict:
+def _backtest_task(features: pd.DataFrame, payload: Tuple[str, Dict, int]) -> Dict:
+    """單組參數回測（可在工作進程中執行，features 為共享的特徵矩陣），失敗時返回 {'error': ...}"""
+    strategy_name, params, days = payload
+    try:
+        strategy = MA20Strategy() if strategy_name == 'ma20' else DefaultStrategy()
+        strategy.load_params(params)
+        return SimpleBacktester.backtest(strategy, features, days)
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def _default_weights_batch(features: pd.DataFrame, payloads: List[Tuple[str, Dict, int]]) -> List[Dict]:
+    """Default 權重組整批評估（矩陣計分），失敗時每組返回 {'error': ...}"""
+    try:
+        return SimpleBacktester.default_weight_metrics(features, [p[1]['weights'] for p in payloads], payloads[0][2])
+    except Exception as e:
+        return [{'error': str(e)} for _ in payloads]
+
+
+def _batched(batch, features: pd.DataFrame, payloads: List[Tuple[str, Dict, int]], size: int):
+    """依序以 batch 評估每 size 組，逐組產出結果（下一段在前一段的結果都取用後才計算）"""
+    for start in range(0, len(payloads), size):
+        yield from batch(features, payloads[start:start + size])
+
+
+def _run_backtests(payloads: List[Tuple[str, Dict, int]], features: pd.DataFrame, workers: int = 1,
+                   cache: ResultCache = None, checkpoint: CheckpointStore = None,
+                   deadline: float = None, batch=None, batch_size: int = 256) -> List[Optional[Dict]]:
+    """
+    同一策略的批次回測
+
+    - checkpoint：跳過工作中已完成的組合，其餘每完成一組立即寫入檢查點
+    - cache：只回測未命中的組合，失敗結果不寫入快取
+    - deadline（time.monotonic()）：時間到時停止派發，尚未評估的組合返回 None
+    - batch(features, payloads)：設定時以它每次評估 batch_size 組未完成的組合，取代逐組（多進程）回測；
+      每段之間檢查 deadline
+    """
+    if not payloads:
+        return []
+    strategy = f"simple_{payloads[0][0]}"
+    keys = [{'params': params, 'days': days} for _, params, days in payloads]
+    results: List[Optional[Dict]] = [None] * len(payloads)
+    
+    if checkpoint is not None:
+        results = checkpoint.completed(strategy, keys)
+        done = sum(m is not None for m in results)
+        if done:
+            print(f"   檢查點已完成: {done}/{len(payloads)}")
+    
+    fingerprint = frame_fingerprint(features) if cache is not None else None
+    pending = [i for i, m in enumerate(results) if m is None]
+    if cache is not None and pending:
+        hits = cache.get_many(fingerprint, strategy, [keys[i] for i in pending])
+        print(f"   結果快取命中: {sum(m is not None for m in hits)}/{len(pending)}")
+        for i, metrics in zip(pending, hits):
+            if metrics is not None:
+                results[i] = metrics
+                if checkpoint is not None:
+                    checkpoint.record(strategy, keys[i], metrics)
+        pending = [i for i in pending if results[i] is None]
+    
+    fresh = []
+    if batch is not None:
+        stream = _batched(batch, features, [payloads[i] for i in pending], batch_size)
+    else:
+        stream = parallel_map(_backtest_task, [payloads[i] for i in pending], features, workers)
+    try:
+        for i in pending:
+            if deadline is not None and time.monotonic() >= deadline:
+                print(f"   ⏱️ 已達執行時間上限，剩餘 {sum(m is None for m in results)} 組未評估")
+                break
+            metrics = next(stream)
+            results[i] = metrics
+            if 'error' not in metrics:
+                fresh.append(i)
+                if checkpoint is not None:
+                    checkpoint.record(strategy, keys[i], metrics)
+    finally:
+        stream.close()
+        if cache is not None:
+            cache.put_many(fingerprint, strategy, [(keys[i], results[i]) for i in fresh])
+    return results
+
+
+def _save_front(name: str, params_list: List[Dict], metrics_list: List[Dict], features: pd.DataFrame,
+                days: int, pareto_dir: str) -> str:
+    """保存已評估組合的 Pareto 前緣，返回檔案路徑"""
+    path = os.path.join(pareto_dir, f'auto_{name}.json')
+    doc = pareto.save_front(path, name, params_list, pareto.metric_columns(metrics_list), PARETO_OBJECTIVES,
+                            meta={'days': days, 'data_end': str(features.index[-1]) if len(features) else None})
+    print(f"   Pareto 前緣: {len(doc['front'])}/{doc['evaluated']} 組 → {path}")
+    return path
+
+
+def optimize_ma20_params(features: pd.DataFrame, days: int = 60, workers: int = 1,
+                         cache: ResultCache = None, checkpoint: CheckpointStore = None,
+                         deadline: float = None, pareto_dir: str = None) -> Dict:
     """優化 MA20 策略參數"""
     
     if MA20Strategy is None:
@@ -198,9 +318,9 @@ def optimize_ma20_params(prices: pd.DataFrame, days: int = 60) -> Dict:
     
     print(f"   參數組合數: {total_combinations}")
     
+    # 先展開有效組合（確保權重和為1，容許小誤差），保留原始順序
+    candidates = []
     count = 0
-    valid_count = 0
-    
     for dt in param_grid['days_threshold']:
         for vl in param_grid['vix_limit']:
             for pw in param_grid['position_weight']:
@@ -208,54 +328,65 @@ def optimize_ma20_params(prices: pd.DataFrame, days: int = 60) -> Dict:
                     for vw in param_grid['vix_weight']:
                         count += 1
                         
-                        # 確保權重和為1（容許小誤差）
                         weight_sum = pw + tw + vw
                         if abs(weight_sum - 1.0) > 0.01:
                             continue
                         
-                        valid_count += 1
-                        
-                        try:
-                            # 創建策略
-                            strategy = MA20Strategy()
-                            params = {
-                                'days_threshold': dt,
-                                'vix_limit': vl,
-                                'position_weight': pw,
-                                'trend_weight': tw,
-                                'vix_weight': vw
-                            }
-                            strategy.load_params(params)
-                            
-                            # 回測
-                            metrics = SimpleBacktester.backtest(strategy, prices, days)
-                            
-                            # 更新最佳結果
-                            if metrics['sharpe_ratio'] > best_sharpe:
-                                best_sharpe = metrics['sharpe_ratio']
-                                best_params = params
-                                best_metrics = metrics
-                            
-                            if valid_count % 20 == 0:
-                                print(f"   進度: {valid_count} 組有效參數已測試 (總計 {count}/{total_combinations})")
-                        
-                        except Exception as e:
-                            print(f"   ⚠️ 參數組合 {count} 測試失敗: {e}")
-                            continue
+                        candidates.append((count, {
+                            'days_threshold': dt,
+                            'vix_limit': vl,
+                            'position_weight': pw,
+                            'trend_weight': tw,
+                            'vix_weight': vw
+                        }))
     
-    print(f"\n✅ 優化完成")
+    payloads = [('ma20', params, days) for _, params in candidates]
+    all_metrics = _run_backtests(payloads, features, workers, cache, checkpoint, deadline)
+    
+    valid_count = 0
+    tested = []  # 成功評估的 (參數, 指標)，計算 Pareto 前緣用
+    for (count, params), metrics in zip(candidates, all_metrics):
+        if metrics is None:  # 執行時間到，未評估
+            continue
+        valid_count += 1
+        
+        if 'error' in metrics:
+            print(f"   ⚠️ 參數組合 {count} 測試失敗: {metrics['error']}")
+            continue
+        tested.append((params, metrics))
+        
+        # 更新最佳結果
+        if metrics['sharpe_ratio'] > best_sharpe:
+            best_sharpe = metrics['sharpe_ratio']
+            best_params = params
+            best_metrics = metrics
+        
+        if valid_count % 20 == 0:
+            print(f"   進度: {valid_count} 組有效參數已測試 (總計 {count}/{total_combinations})")
+    
+    complete = valid_count == len(candidates)
+    print(f"\n✅ 優化完成" if complete else f"\n⏸️ 優化未完成（{valid_count}/{len(candidates)}），使用目前最佳結果")
     print(f"   有效組合數: {valid_count}")
-    print(f"   最佳 Sharpe: {best_sharpe:.2f}")
-    print(f"   最佳參數: {best_params}")
-    print(f"   績效: Alpha={best_metrics['alpha']:.2f}%, 回撤={best_metrics['max_drawdown']:.2f}%")
+    if best_metrics:
+        print(f"   最佳 Sharpe: {best_sharpe:.2f}")
+        print(f"   最佳參數: {best_params}")
+        print(f"   績效: Alpha={best_metrics['alpha']:.2f}%, 回撤={best_metrics['max_drawdown']:.2f}%")
     
-    return {
+    result = {
         'params': best_params if best_params else {},
-        'metrics': best_metrics if best_metrics else {}
+        'metrics': best_metrics if best_metrics else {},
+        'evaluated': valid_count,
+        'candidates': len(candidates)
     }
+    if pareto_dir:
+        result['pareto_front'] = _save_front('ma20', [p for p, _ in tested], [m for _, m in tested],
+                                             features, days, pareto_dir)
+    return result
 
 
-def optimize_default_params(prices: pd.DataFrame, days: int = 60) -> Dict:
+def optimize_default_params(features: pd.DataFrame, days: int = 60, workers: int = 1,
+                            cache: ResultCache = None, checkpoint: CheckpointStore = None,
+                            deadline: float = None, pareto_dir: str = None) -> Dict:
     """優化 Default 策略參數"""
     
     if DefaultStrategy is None:
@@ -265,68 +396,61 @@ def optimize_default_params(prices: pd.DataFrame, days: int = 60) -> Dict:
     print("\n🔍 Default 策略權重優化")
     print(f"   回測天數: {days}")
     
-    # 定義權重範圍
-    weight_options = [0.10, 0.15, 0.20, 0.25, 0.30, 0.35]
+    # 權重單純形上 0.05 格點的所有組合（和為 1，mag7 為其餘四項的餘數）
+    grid = simplex_grid(DEFAULT_WEIGHT_NAMES, DEFAULT_WEIGHT_RESOLUTION, DEFAULT_WEIGHT_BOUNDS)
+    candidates = weight_dicts(grid, DEFAULT_WEIGHT_NAMES, DEFAULT_WEIGHT_RESOLUTION)
+    print(f"   權重組合數: {len(candidates)}")
     
     best_sharpe = -999
     best_weights = None
     best_metrics = None
     
-    count = 0
+    # 所有權重對同一份因子分數矩陣一次矩陣乘法計分、一次整數股模擬（不需要多進程）
+    payloads = [('default', {'weights': weights}, days) for weights in candidates]
+    all_metrics = _run_backtests(payloads, features, workers, cache, checkpoint, deadline,
+                                 batch=_default_weights_batch)
+    
     valid_count = 0
+    evaluated = 0
+    tested = []  # 成功評估的 (權重, 指標)，計算 Pareto 前緣用
+    for count, (weights, metrics) in enumerate(zip(candidates, all_metrics), 1):
+        if metrics is None:  # 執行時間到，未評估
+            continue
+        evaluated += 1
+        if 'error' in metrics:
+            print(f"   ⚠️ 權重組合 {count} 測試失敗: {metrics['error']}")
+            continue
+        tested.append((weights, metrics))
+        
+        # 更新最佳結果
+        if metrics['sharpe_ratio'] > best_sharpe:
+            best_sharpe = metrics['sharpe_ratio']
+            best_weights = weights
+            best_metrics = metrics
+        
+        valid_count += 1
+        
+        if valid_count % 50 == 0:
+            print(f"   進度: {valid_count} 組權重已測試")
     
-    for pm in weight_options:
-        for vol in weight_options:
-            for vix in weight_options:
-                for bond in weight_options:
-                    mag7 = 1.0 - pm - vol - vix - bond
-                    
-                    # 檢查 mag7 是否在合理範圍
-                    if mag7 < 0.05 or mag7 > 0.40:
-                        continue
-                    
-                    count += 1
-                    
-                    try:
-                        # 創建策略
-                        strategy = DefaultStrategy()
-                        weights = {
-                            'price_momentum': pm,
-                            'volume': vol,
-                            'vix': vix,
-                            'bond': bond,
-                            'mag7': mag7
-                        }
-                        strategy.load_params({'weights': weights})
-                        
-                        # 回測
-                        metrics = SimpleBacktester.backtest(strategy, prices, days)
-                        
-                        # 更新最佳結果
-                        if metrics['sharpe_ratio'] > best_sharpe:
-                            best_sharpe = metrics['sharpe_ratio']
-                            best_weights = weights
-                            best_metrics = metrics
-                        
-                        valid_count += 1
-                        
-                        if valid_count % 50 == 0:
-                            print(f"   進度: {valid_count} 組權重已測試")
-                    
-                    except Exception as e:
-                        print(f"   ⚠️ 權重組合 {count} 測試失敗: {e}")
-                        continue
-    
-    print(f"\n✅ 優化完成")
+    complete = evaluated == len(candidates)
+    print(f"\n✅ 優化完成" if complete else f"\n⏸️ 優化未完成（{evaluated}/{len(candidates)}），使用目前最佳結果")
     print(f"   測試組合數: {valid_count}")
-    print(f"   最佳 Sharpe: {best_sharpe:.2f}")
-    print(f"   最佳權重: {best_weights}")
-    print(f"   績效: Alpha={best_metrics['alpha']:.2f}%, 回撤={best_metrics['max_drawdown']:.2f}%")
+    if best_metrics:
+        print(f"   最佳 Sharpe: {best_sharpe:.2f}")
+        print(f"   最佳權重: {best_weights}")
+        print(f"   績效: Alpha={best_metrics['alpha']:.2f}%, 回撤={best_metrics['max_drawdown']:.2f}%")
     
-    return {
+    result = {
         'weights': best_weights if best_weights else {},
-        'metrics': best_metrics if best_metrics else {}
+        'metrics': best_metrics if best_metrics else {},
+        'evaluated': evaluated,
+        'candidates': len(candidates)
     }
+    if pareto_dir:
+        result['pareto_front'] = _save_front('default', [{'weights': w} for w, _ in tested], [m for _, m in tested],
+                                             features, days, pareto_dir)
+    return result
 
 
 # ============================================
@@ -338,8 +462,23 @@ def main():
     parser.add_argument('--dry-run', action='store_true', help='模擬執行，不更新參數')
     parser.add_argument('--strategy', type=str, default='all', help='策略名稱 (ma20, default, all)')
     parser.add_argument('--days', type=int, default=60, help='回測天數')
+    parser.add_argument('--workers', type=int, default=1, help='優化使用的進程數 (0 = 全部 CPU)')
+    parser.add_argument('--no-result-cache', action='store_true', help='不讀寫回測結果快取')
+    parser.add_argument('--job-id', type=str, default=None,
+                        help='檢查點工作 ID（預設為 ISO 週次-策略-天數，例如 2026-W42-all-60d）')
+    parser.add_argument('--resume', action='store_true', help='從檢查點續跑，跳過已完成的參數組合')
+    parser.add_argument('--max-runtime', type=float, default=None,
+                        help='最長執行時間（分鐘），到時停止並保存目前最佳參數')
+    parser.add_argument('--pareto', action='store_true',
+                        help='另存已評估組合在 Alpha / Sharpe / 最大回撤上的 Pareto 前緣 (data/pareto/auto_{策略}.json)')
     args = parser.parse_args()
     
+    started = time.monotonic()
+    deadline = started + args.max_runtime * 60 if args.max_runtime else None
+    job_id = args.job_id or f"{datetime.now():%G-W%V}-{args.strategy}-{args.days}d"
+    job_config = {'strategy': args.strategy, 'days': args.days, 'inputs': 'features'}
+    checkpoint = CheckpointStore(CHECKPOINT_PATH, job_id)
+    
     print("\n" + "="*60)
     print("🚀 QQQ 自動化參數優化")
     print("="*60)
@@ -347,15 +486,31 @@ def main():
     print(f"🎯 策略: {args.strategy}")
     print(f"📅 回測天數: {args.days}")
     print(f"🔄 模式: {'模擬執行' if args.dry_run else '正式執行'}")
+    print(f"🗂️ 工作: {job_id}")
     
-    # 下載數據
-    print("\n📥 下載歷史數據...")
-    try:
-        qqq = yf.download('QQQ', period='6mo', progress=False)
-        print(f"   ✓ 獲取 {len(qqq)} 天數據")
-    except Exception as e:
-        print(f"❌ 下載數據失敗: {e}")
-        return
+    # 續跑時沿用工作啟動時的特徵快照，確保已完成與新評估的組合使用同一份數據
+    features = pd.DataFrame()
+    if args.resume:
+        status = checkpoint.status()
+        if status is None:
+            print("   ⚠️ 找不到此工作的檢查點，重新開始")
+        elif checkpoint.config() != job_config:
+            print(f"❌ 檢查點設定 {checkpoint.config()} 與本次參數不符，請改用其他 --job-id")
+            return
+        else:
+            features = checkpoint.frame()
+            print(f"   ↩️ 從檢查點續跑（狀態: {status}，數據 {len(features)} 天）")
+    
+    if features.empty:
+        # 下載數據並計算特徵（整個工作共用）
+        print("\n📥 下載歷史數據 (QQQ / VIX / 10Y)...")
+        features = load_features()
+        if features.empty:
+            print("❌ 下載數據失敗: QQQ 無資料")
+            return
+        print(f"   ✓ 獲取 {len(features)} 天特徵")
+        checkpoint.start(job_config, features)
+        features = checkpoint.frame()
     
     # 載入現有參數
     try:
@@ -369,10 +524,13 @@ def main():
         }
     
     optimization_results = {}
+    result_cache = None if args.no_result_cache else ResultCache(RESULT_CACHE_PATH)
+    pareto_dir = PARETO_DIR if args.pareto else None
     
     # 優化 MA20
     if args.strategy in ['ma20', 'all']:
-        ma20_result = optimize_ma20_params(qqq, args.days)
+        ma20_result = optimize_ma20_params(features, args.days, args.workers, result_cache, checkpoint, deadline,
+                                           pareto_dir)
         optimization_results['ma20'] = ma20_result
         
         if not args.dry_run and ma20_result['params']:
@@ -380,16 +538,25 @@ def main():
     
     # 優化 Default
     if args.strategy in ['default', 'all']:
-        default_result = optimize_default_params(qqq, args.days)
+        default_result = optimize_default_params(features, args.days, args.workers, result_cache, checkpoint,
+                                                 deadline, pareto_dir)
         optimization_results['default'] = default_result
         
         if not args.dry_run and default_result['weights']:
             params_file['default']['weights'] = default_result['weights']
     
+    complete = all(r.get('evaluated') == r.get('candidates') for r in optimization_results.values())
+    checkpoint.finish('done' if complete else 'partial')
+    checkpoint.close()
+    if not complete:
+        print(f"\n⏸️ 未評估完全部組合，可用 --resume --job-id {job_id} 續跑")
+    
     # 更新元數據
     params_file['meta']['last_updated'] = datetime.now().isoformat()
     params_file['meta']['optimization_days'] = args.days
     params_file['meta']['optimization_results'] = optimization_results
+    params_file['meta']['optimization_job'] = job_id
+    params_file['meta']['optimization_complete'] = complete
     
     # 保存參數
     if not args.dry_run:
@@ -399,7 +566,7 @@ def main():
         
         # 發送通知
         if TelegramNotifier:
-            notification = f"""🔄 *參數優化完成*
+            notification = f"""🔄 *參數優化{'完成' if complete else '中止（部分結果）'}*
 
 ⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 📊 回測天數: {args.days}
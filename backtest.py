@@ -15,13 +15,27 @@ Version: 2.0
     python backtest.py --optimize           # 參數優化 (自動更新 JSON)
     python backtest.py --strategy ma20      # 指定策略
     python backtest.py --compare            # 比較所有策略
+    python backtest.py --engine loop        # 使用逐日迴圈引擎（對照用）
+    python backtest.py --optimize --wide-grid --workers 8   # 加密網格 + 多進程優化
+    python backtest.py --optimize --wide-grid --prune       # 加密網格 + 上界剪枝
+    python backtest.py --offline            # 只使用本地行情快取 (data/cache/ohlcv)
+    python backtest.py --weeks 104 --optimize --walk-forward --workers 4   # 滾動樣本外驗證
+    python backtest.py --weeks 52 --optimize --search halving    # Default 權重細格點搜索
+    python backtest.py --weeks 52 --optimize --search simplex    # Default 權重完整格點列舉
+    python backtest.py --compare --no-result-cache   # 忽略回測結果快取 (data/cache/results.sqlite)
+    python backtest.py --panel --weeks 52   # data/symbols.yaml 所有標的的面板回測
+    python backtest.py --interval 1m --weeks 52 --strategy ma20   # 1 分鐘 K 線回測 (data/cache/bars)
+    python backtest.py --weeks 52 --optimize --robustness --paths 5000   # 優化後附上重抽樣信賴區間
+    python backtest.py --weeks 52 --optimize --search simplex --pareto   # 另存多目標 Pareto 前緣 (data/pareto)
+    python backtest.py --front-weights alpha=0.4,sharpe_ratio=0.4,max_drawdown=-0.2   # 不重跑搜索，在前緣上改用新權重挑選
+    python backtest.py --front-weights alpha=1,max_drawdown=-0.5 --front auto_ma20    # 從 auto_optimize 的前緣挑選
 """
 
 import json
 import os
 import argparse
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Sequence, Tuple
 from dataclasses import dataclass
 import itertools
 
@@ -29,12 +43,68 @@ import yfinance as yf
 import pandas as pd
 import numpy as np
 
+from src.backtester import kernel, pareto, scoring
+from src.backtester.accumulator import RunningMetrics
+from src.backtester.bars import (BAR_MINUTES, BarStore, TRADING_DAYS, bars_per_day, date_format, is_intraday,
+                                 periods_per_year)
+from src.backtester.bootstrap import robustness_summary
+from src.backtester.cache import OHLCVCache
+from src.backtester.daily import DailyColumns
+from src.backtester.features import market_features, streak_lengths
+from src.backtester.fetch import fetch_concurrent
+from src.backtester.panel import load_price_panel, load_universe
+from src.backtester.parallel import parallel_map, resolve_workers
+from src.backtester.pruning import pruned_grid_search
+from src.backtester.results import ResultCache, frame_fingerprint
+from src.backtester.search import halving_budgets, sample_weights, simplex_grid, successive_halving, weight_dicts
+
 
 # ============================================
 # 設定
 # ============================================
 
 PARAMS_FILE = 'optimized_params.json'  # 參數檔案路徑
+CACHE_DIR = os.environ.get('OHLCV_CACHE_DIR', 'data/cache/ohlcv')  # 歷史行情快取目錄
+RESULT_CACHE_PATH = os.environ.get('RESULT_CACHE_PATH', 'data/cache/results.sqlite')  # 回測結果快取
+SYMBOLS_FILE = 'data/symbols.yaml'  # 面板回測的標的清單
+PRICES_DIR = 'data/prices'  # 面板回測的日線 CSV 目錄
+BAR_STORE_DIR = os.environ.get('BAR_STORE_DIR', 'data/cache/bars')  # 盤中 K 線的記憶體映射存放
+PARETO_DIR = os.environ.get('PARETO_DIR', 'data/pareto')  # 優化結果的多目標 Pareto 前緣（{策略}.json）
+WARMUP_BARS = 60  # 最長滾動視窗（ma60），分段計算特徵時每段多帶的暖機列數
+
+# MA20 參數搜索空間
+MA20_PARAM_GRID = {
+    'days_threshold': [1, 2, 3],
+    'vix_limit': [30, 35, 40, 45],
+    'position_weight': [0.4, 0.5, 0.6],
+    'trend_weight': [0.2, 0.3, 0.4],
+}
+
+# 加密網格（--wide-grid）
+MA20_WIDE_PARAM_GRID = {
+    'days_threshold': [1, 2, 3, 4, 5],
+    'vix_limit': [25, 30, 35, 40, 45, 50],
+    'position_weight': [round(0.30 + 0.05 * i, 2) for i in range(9)],
+    'trend_weight': [round(0.10 + 0.05 * i, 2) for i in range(9)],
+}
+
+# Default 策略權重搜索空間
+DEFAULT_WEIGHT_SETS = [
+    {"price_momentum": 0.30, "volume": 0.20, "vix": 0.20, "bond": 0.15, "mag7": 0.15},
+    {"price_momentum": 0.35, "volume": 0.15, "vix": 0.25, "bond": 0.10, "mag7": 0.15},
+    {"price_momentum": 0.25, "volume": 0.25, "vix": 0.25, "bond": 0.10, "mag7": 0.15},
+    {"price_momentum": 0.40, "volume": 0.15, "vix": 0.20, "bond": 0.10, "mag7": 0.15},
+    {"price_momentum": 0.30, "volume": 0.15, "vix": 0.30, "bond": 0.10, "mag7": 0.15},
+    {"price_momentum": 0.25, "volume": 0.20, "vix": 0.25, "bond": 0.15, "mag7": 0.15},
+    {"price_momentum": 0.35, "volume": 0.20, "vix": 0.15, "bond": 0.15, "mag7": 0.15},
+    {"price_momentum": 0.30, "volume": 0.10, "vix": 0.30, "bond": 0.15, "mag7": 0.15},
+    {"price_momentum": 0.35, "volume": 0.10, "vix": 0.30, "bond": 0.10, "mag7": 0.15},
+    {"price_momentum": 0.40, "volume": 0.10, "vix": 0.25, "bond": 0.10, "mag7": 0.15},
+]
+
+# Default 權重 successive halving 搜索：各因子上下限與最短評估視窗（交易日）
+DEFAULT_WEIGHT_BOUNDS = {f: (0.05, 0.45) for f in DEFAULT_WEIGHT_SETS[0]}
+HALVING_MIN_DAYS = 40
 
 
 # ============================================
@@ -103,12 +173,22 @@ class ParamsManager:
         params[strategy_name].update(new_params)
         params[strategy_name]['backtest_result'] = backtest_result
         
-        # 更新 meta
-        params['meta']['last_backtest_weeks'] = weeks
+        # 更新 meta（回測週數未知時保留原值）
+        if weeks is not None:
+            params['meta']['last_backtest_weeks'] = weeks
         
         ParamsManager.save(params)
         
         return params
+    
+    @staticmethod
+    def attach_robustness(strategy_name: str, summary: Dict):
+        """把重抽樣分布摘要寫入策略的 backtest_result['robustness']"""
+        params = ParamsManager.load()
+        params.setdefault(strategy_name, {}).setdefault('backtest_result', {})['robustness'] = summary
+        ParamsManager.save(params)
+        
+        return params
 
 
 # ============================================
@@ -134,6 +214,16 @@ class DailyResult:
     cumulative_pnl: float
 
 
+DAILY_FIELDS = tuple(DailyResult.__dataclass_fields__)
+
+
+def daily_columns(columns: Dict[str, Any] = None) -> DailyColumns:
+    """以 DailyResult 為逐列型別的欄式逐日結果（未給欄位時為空）"""
+    if columns is None:
+        return DailyColumns.empty(DAILY_FIELDS, DailyResult)
+    return DailyColumns(columns, DailyResult)
+
+
 @dataclass
 class BacktestResult:
     """回測總結果"""
@@ -148,7 +238,7 @@ class BacktestResult:
     profit_loss_ratio: float
     total_trades: int
     accuracy: float
-    daily_results: List[DailyResult]
+    daily_results: DailyColumns  # 欄式逐日結果，迭代 / 索引時才建立 DailyResult
     
     def to_dict(self) -> Dict:
         """轉換為字典"""
@@ -163,6 +253,18 @@ class BacktestResult:
             'accuracy': self.accuracy,
             'total_trades': self.total_trades
         }
+    
+    @classmethod
+    def from_dict(cls, strategy: str, params: Dict, metrics: Dict) -> 'BacktestResult':
+        """由 to_dict() 的指標還原（不含逐日結果）"""
+        return cls(strategy=strategy, params=params, daily_results=daily_columns(), **metrics)
+
+
+# BacktestResult.to_dict() 的指標欄位（結果快取存放的內容）
+RESULT_METRIC_KEYS = [
+    'total_return', 'qqq_return', 'alpha', 'sharpe_ratio', 'max_drawdown',
+    'win_rate', 'profit_loss_ratio', 'accuracy', 'total_trades'
+]
 
 
 # ============================================
@@ -170,14 +272,24 @@ class BacktestResult:
 # ============================================
 
 class DataFetcher:
-    """歷史數據抓取"""
+    """歷史數據抓取（經由本地快取，只補抓缺少的尾端）"""
+    
+    cache = OHLCVCache(CACHE_DIR)
+    offline = False  # True 時只使用本地快取
     
     @staticmethod
-    def fetch_historical(ticker: str, weeks: int) -> pd.DataFrame:
+    def download(ticker: str, start: pd.Timestamp, end: pd.Timestamp = None, adjusted: bool = True) -> pd.DataFrame:
+        """從 yfinance 下載 [start, end) 區間的日線"""
+        return yf.Ticker(ticker).history(start=start, end=end, auto_adjust=adjusted)
+    
+    @classmethod
+    def fetch_historical(cls, ticker: str, weeks: int) -> pd.DataFrame:
         """抓取歷史數據"""
-        period = f"{weeks * 7 + 30}d"
+        start = datetime.now() - timedelta(days=weeks * 7 + 30)
         try:
-            df = yf.Ticker(ticker).history(period=period)
+            df = cls.cache.get(ticker, start, fetch=cls.download, offline=cls.offline)
+            if df.empty:
+                print(f"❌ 抓取 {ticker} 失敗: 無資料")
             return df
         except Exception as e:
             print(f"❌ 抓取 {ticker} 失敗: {e}")
@@ -188,80 +300,12 @@ class DataFetcher:
         """準備回測數據"""
         print(f"📊 抓取過去 {weeks} 週數據...")
         
-        # 抓取 QQQ
-        qqq = DataFetcher.fetch_historical("QQQ", weeks)
-        if qqq.empty:
+        # 同時抓取 QQQ / VIX / 10Y
+        frames = fetch_concurrent(["QQQ", "^VIX", "^TNX"],
+                                  lambda ticker: DataFetcher.fetch_historical(ticker, weeks))
+        if frames["QQQ"].empty:
             return pd.DataFrame()
-        
-        # 抓取 VIX
-        vix = DataFetcher.fetch_historical("^VIX", weeks)
-        
-        # 抓取 10Y
-        tnx = DataFetcher.fetch_historical("^TNX", weeks)
-        
-        # 合併數據
-        df = pd.DataFrame()
-        df['close'] = qqq['Close']
-        df['high'] = qqq['High']
-        df['low'] = qqq['Low']
-        df['volume'] = qqq['Volume']
-        df['change_pct'] = qqq['Close'].pct_change() * 100
-        
-        # 計算技術指標
-        df['ma5'] = qqq['Close'].rolling(5).mean()
-        df['ma20'] = qqq['Close'].rolling(20).mean()
-        df['ma60'] = qqq['Close'].rolling(60).mean()
-        
-        # RSI
-        delta = qqq['Close'].diff()
-        gain = delta.where(delta > 0, 0).rolling(14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
-        
-        # 成交量比
-        df['volume_ratio'] = qqq['Volume'] / qqq['Volume'].rolling(20).mean()
-        
-        # MA20 相對位置
-        df['ma20_diff_pct'] = (df['close'] - df['ma20']) / df['ma20'] * 100
-        df['above_ma20'] = df['close'] > df['ma20']
-        
-        # 計算連續站上/跌破天數
-        df['days_above_ma20'] = 0
-        df['days_below_ma20'] = 0
-        
-        days_above = 0
-        days_below = 0
-        for i in range(len(df)):
-            if pd.isna(df['above_ma20'].iloc[i]):
-                continue
-            if df['above_ma20'].iloc[i]:
-                days_above += 1
-                days_below = 0
-            else:
-                days_below += 1
-                days_above = 0
-            df.iloc[i, df.columns.get_loc('days_above_ma20')] = days_above
-            df.iloc[i, df.columns.get_loc('days_below_ma20')] = days_below
-        
-        # 加入 VIX
-        if not vix.empty:
-            df['vix'] = vix['Close'].reindex(df.index, method='ffill')
-            df['vix_change'] = vix['Close'].pct_change().reindex(df.index, method='ffill') * 100
-        else:
-            df['vix'] = 20
-            df['vix_change'] = 0
-        
-        # 加入 10Y
-        if not tnx.empty:
-            df['us10y'] = tnx['Close'].reindex(df.index, method='ffill')
-            df['us10y_change'] = tnx['Close'].diff().reindex(df.index, method='ffill')
-        else:
-            df['us10y'] = 4.5
-            df['us10y_change'] = 0
-        
-        # 移除 NaN
-        df = df.dropna()
+        df = DataFetcher.build_features(frames)
         
         # 只保留最近 N 週 (處理時區問題)
         cutoff_date = datetime.now() - timedelta(weeks=weeks)
@@ -274,6 +318,151 @@ class DataFetcher:
         print(f"  ✓ 期間: {df.index[0].strftime('%Y-%m-%d')} ~ {df.index[-1].strftime('%Y-%m-%d')}")
         
         return df
+    
+    @staticmethod
+    def build_features(frames: Dict[str, pd.DataFrame], bar_interval: str = '1d',
+                       dropna: bool = True) -> pd.DataFrame:
+        """由 QQQ / ^VIX / ^TNX 計算回測特徵（見 features.market_features）"""
+        return market_features(frames, bar_interval, dropna)
+    
+    @staticmethod
+    def build_features_chunked(store: BarStore, ticker: str, bar_interval: str, market: Dict[str, pd.DataFrame],
+                               start=None, end=None, chunk_rows: int = 50_000) -> pd.DataFrame:
+        """
+        從 BarStore 逐段讀取 K 線並計算特徵，結果與整段 build_features 相同
+        
+        每段多帶 WARMUP_BARS 列讓滾動指標暖機，算完後捨去；連續站上 / 跌破根數
+        跨段相依，在串接後整段重算一次（只是一次布林陣列運算）。
+        """
+        parts = []
+        for bars, warm in store.iter_chunks(ticker, bar_interval, start, end, chunk_rows, overlap=WARMUP_BARS):
+            frames = {"QQQ": bars, **market}
+            parts.append(DataFetcher.build_features(frames, bar_interval, dropna=False).iloc[warm:])
+        if not parts:
+            return pd.DataFrame()
+        
+        df = pd.concat(parts)
+        df['days_above_ma20'], df['days_below_ma20'] = streak_lengths(df['above_ma20'])
+        return df.dropna()
+    
+    @classmethod
+    def fetch_intraday(cls, ticker: str, bar_interval: str) -> int:
+        """以 yfinance 補抓最近的盤中 K 線寫入 BarStore，返回下載的列數（離線時不下載）"""
+        if cls.offline:
+            return 0
+        # yfinance 的盤中資料只提供最近一段期間（1m 約 7 天、其餘約 60 天）
+        period = '7d' if bar_interval == '1m' else '60d'
+        try:
+            df = yf.Ticker(ticker).history(period=period, interval=bar_interval, auto_adjust=True)
+        except Exception as e:
+            print(f"⚠️ 補抓 {ticker} {bar_interval} K 線失敗，使用本地資料: {e}")
+            return 0
+        df = df[['Open', 'High', 'Low', 'Close', 'Volume']] if not df.empty else df
+        BarStore(BAR_STORE_DIR).write(ticker, bar_interval, df)
+        return len(df)
+    
+    @staticmethod
+    def prepare_intraday(weeks: int, bar_interval: str) -> pd.DataFrame:
+        """準備盤中回測數據：QQQ 取自 BarStore（逐段計算特徵），VIX / 10Y 使用日線"""
+        print(f"📊 讀取過去 {weeks} 週 {bar_interval} K 線 ({BAR_STORE_DIR})...")
+        
+        store = BarStore(BAR_STORE_DIR)
+        DataFetcher.fetch_intraday("QQQ", bar_interval)
+        if not store.exists("QQQ", bar_interval):
+            return pd.DataFrame()
+        
+        market = fetch_concurrent(["^VIX", "^TNX"], lambda ticker: DataFetcher.fetch_historical(ticker, weeks))
+        start = datetime.now() - timedelta(weeks=weeks)
+        df = DataFetcher.build_features_chunked(store, "QQQ", bar_interval, market, start=start)
+        if df.empty:
+            return df
+        
+        fmt = date_format(bar_interval)
+        print(f"  ✓ 共 {len(df):,} 根 K 線")
+        print(f"  ✓ 期間: {df.index[0].strftime(fmt)} ~ {df.index[-1].strftime(fmt)}")
+        return df
+    
+    @staticmethod
+    def prepare_panel(weeks: int, symbols_file: str = SYMBOLS_FILE,
+                      prices_dir: str = PRICES_DIR) -> Dict[str, pd.DataFrame]:
+        """準備多標的面板數據：{特徵: DataFrame(日期 × 標的)}，只保留最近 N 週都有完整數據的標的"""
+        symbols = load_universe(symbols_file)
+        print(f"📊 載入 {len(symbols)} 個標的日線 ({prices_dir})...")
+        
+        prices = load_price_panel(symbols, prices_dir)
+        if prices['close'].empty:
+            return {}
+        
+        frames = fetch_concurrent(["^VIX", "^TNX"], lambda ticker: DataFetcher.fetch_historical(ticker, weeks))
+        features = DataFetcher.build_panel_features(prices, frames["^VIX"], frames["^TNX"])
+        
+        # 只保留最近 N 週
+        dates = features['close'].index
+        keep = dates >= pd.Timestamp(datetime.now() - timedelta(weeks=weeks)).normalize()
+        features = {k: v[keep] for k, v in features.items()}
+        
+        # 先移除所有標的都缺值的日期，再移除仍有缺值的標的
+        valid = np.logical_and.reduce([v.notna().to_numpy() for v in features.values()])
+        rows = valid.any(axis=1)
+        cols = valid[rows].all(axis=0)
+        dropped = [s for s, ok in zip(features['close'].columns, cols) if not ok]
+        if dropped:
+            print(f"  ⚠️ 數據不完整，略過 {len(dropped)} 個標的: {', '.join(dropped[:10])}"
+                  f"{' ...' if len(dropped) > 10 else ''}")
+        features = {k: v.loc[rows, cols] for k, v in features.items()}
+        
+        close = features['close']
+        if close.empty:
+            return {}
+        print(f"  ✓ {close.shape[1]} 個標的 × {close.shape[0]} 個交易日")
+        print(f"  ✓ 期間: {close.index[0].strftime('%Y-%m-%d')} ~ {close.index[-1].strftime('%Y-%m-%d')}")
+        return features
+    
+    @staticmethod
+    def build_panel_features(prices: Dict[str, pd.DataFrame], vix: pd.DataFrame,
+                             tnx: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        與 build_features 相同的特徵，逐欄位以 (日期 × 標的) 一次計算
+        
+        VIX / 10Y 為全市場共用，廣播到每個標的；未移除 NaN。
+        """
+        close, volume = prices['close'], prices['volume']
+        dates = close.index
+        
+        def broadcast(series: pd.Series) -> pd.DataFrame:
+            values = np.repeat(series.to_numpy(dtype=float)[:, None], close.shape[1], axis=1)
+            return pd.DataFrame(values, index=dates, columns=close.columns)
+        
+        def market(df: pd.DataFrame, default: float, change) -> Tuple[pd.DataFrame, pd.DataFrame]:
+            if df.empty:
+                return broadcast(pd.Series(default, index=dates)), broadcast(pd.Series(0.0, index=dates))
+            level = df['Close'].copy()
+            index = level.index.tz_localize(None) if level.index.tz is not None else level.index
+            level.index = index.normalize()
+            level = level[~level.index.duplicated(keep='last')]
+            return (broadcast(level.reindex(dates, method='ffill')),
+                    broadcast(change(level).reindex(dates, method='ffill')))
+        
+        f = {'close': close, 'change_pct': close.pct_change(fill_method=None) * 100}
+        f['ma20'] = close.rolling(20).mean()
+        f['ma60'] = close.rolling(60).mean()
+        
+        delta = close.diff()
+        gain = delta.where(delta > 0, 0).rolling(14).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
+        f['rsi'] = 100 - (100 / (1 + gain / loss))
+        
+        f['volume_ratio'] = volume / volume.rolling(20).mean()
+        f['ma20_diff_pct'] = (close - f['ma20']) / f['ma20'] * 100
+        above = close > f['ma20']
+        f['above_ma20'] = above
+        days_above, days_below = streak_lengths(above.to_numpy())
+        f['days_above_ma20'] = pd.DataFrame(days_above, index=dates, columns=close.columns)
+        f['days_below_ma20'] = pd.DataFrame(days_below, index=dates, columns=close.columns)
+        
+        f['vix'], f['vix_change'] = market(vix, 20, lambda s: s.pct_change() * 100)
+        f['us10y'], f['us10y_change'] = market(tnx, 4.5, lambda s: s.diff())
+        return f
 
 
 # ============================================
@@ -290,9 +479,34 @@ class BaseStrategy:
     def score(self, row: pd.Series) -> Tuple[float, str, Dict]:
         raise NotImplementedError
     
+    def score_batch(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """
+        整批評分，返回 (總分, 訊號代碼, 各因子分數) 陣列
+        
+        訊號代碼對應 scoring.SIGNALS；子類別未覆寫時逐列呼叫 score()。
+        """
+        totals = np.empty(len(df), dtype=float)
+        codes = np.empty(len(df), dtype=np.int8)
+        factors: Dict[str, np.ndarray] = {}
+        for i, row in enumerate(df.to_dict('records')):
+            totals[i], signal, row_factors = self.score(row)
+            codes[i] = scoring.SIGNAL_CODES[signal]
+            for name, value in row_factors.items():
+                factors.setdefault(name, np.empty(len(df), dtype=float))[i] = value
+        return totals, codes, factors
+    
     def get_allocation(self, score: float) -> int:
         raise NotImplementedError
     
+    def allocation_batch(self, scores: np.ndarray) -> np.ndarray:
+        """整批分數轉換為配置比例（只對不重複的分數呼叫 get_allocation）"""
+        scores = np.asarray(scores, dtype=float)
+        if scores.size == 0:
+            return np.zeros(0, dtype=int)
+        unique, inverse = np.unique(scores, return_inverse=True)
+        table = np.array([self.get_allocation(float(s)) for s in unique], dtype=int)
+        return table[inverse.reshape(scores.shape)]
+    
     def get_params_for_save(self) -> Dict:
         """返回要儲存的參數"""
         return self.params
@@ -380,6 +594,17 @@ class DefaultStrategy(BaseStrategy):
         
         return total, signal, factors
     
+    def score_batch(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        change = scoring.frame_column(df, 'change_pct', 0)
+        factors = scoring.default_factor_scores(
+            change,
+            scoring.frame_column(df, 'volume_ratio', 1.0),
+            scoring.frame_column(df, 'vix', 20),
+            scoring.frame_column(df, 'us10y_change', 0),
+        )
+        total = scoring.round_scores(scoring.weighted_total(factors, self.weights))
+        return total, scoring.threshold_signal_codes(total), factors
+    
     def get_allocation(self, score: float) -> int:
         if score <= 2: return 10
         elif score <= 3: return 20
@@ -390,6 +615,9 @@ class DefaultStrategy(BaseStrategy):
         elif score <= 8: return 85
         else: return 90
     
+    def allocation_batch(self, scores: np.ndarray) -> np.ndarray:
+        return scoring.allocation_lookup(scores, scoring.DEFAULT_ALLOCATION)
+    
     def get_params_for_save(self) -> Dict:
         return {'weights': self.weights}
 
@@ -470,6 +698,31 @@ class MA20Strategy(BaseStrategy):
         
         return total, signal, factors
     
+    def score_batch(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        vix = scoring.frame_column(df, 'vix', 20)
+        trend, trend_codes = scoring.ma20_trend_scores(
+            scoring.frame_column(df, 'days_above_ma20', 0),
+            scoring.frame_column(df, 'days_below_ma20', 0),
+            self.days_threshold
+        )
+        factors = {
+            'ma20_position': scoring.ma20_position_scores(scoring.frame_column(df, 'ma20_diff_pct', 0)),
+            'ma20_trend': trend,
+            'vix_filter': scoring.vix_filter_scores(vix),
+        }
+        weights = {
+            'ma20_position': self.position_weight,
+            'ma20_trend': self.trend_weight,
+            'vix_filter': self.vix_weight
+        }
+        total = scoring.round_scores(scoring.weighted_total(factors, weights))
+        
+        risk_off = vix > self.vix_limit
+        total = np.where(risk_off, np.minimum(total, 4), total)
+        codes = np.where(risk_off, scoring.SIGNAL_CODES['RISK_OFF'], trend_codes).astype(np.int8)
+        
+        return total, codes, factors
+    
     def get_allocation(self, score: float) -> int:
         if score <= 2: return 0
         elif score <= 3: return 10
@@ -480,6 +733,9 @@ class MA20Strategy(BaseStrategy):
         elif score <= 8: return 85
         else: return 95
     
+    def allocation_batch(self, scores: np.ndarray) -> np.ndarray:
+        return scoring.allocation_lookup(scores, scoring.MA20_ALLOCATION)
+    
     def get_params_for_save(self) -> Dict:
         return {
             'days_threshold': self.days_threshold,
@@ -494,16 +750,124 @@ class MA20Strategy(BaseStrategy):
 # 回測引擎
 # ============================================
 
+def lagged_pnl(change: np.ndarray, allocations: np.ndarray) -> np.ndarray:
+    """
+    由每列配置計算每日損益，支援 (組合數, 列數) 的二維配置
+    
+    第 i 天（i >= 1）以第 i-1 列評分，損益使用再前一天的配置，第一天沿用 50%。
+    change 也可以是與 allocations 同形狀的二維陣列（每列一個標的）。
+    """
+    allocations = np.atleast_2d(allocations)
+    rows, n = allocations.shape
+    if n < 2:
+        return np.zeros((rows, 0))
+    held = np.concatenate((np.full((rows, 1), 50), allocations[:, :n - 2]), axis=1)
+    return kernel.fractional_pnl(change[..., 1:], held)
+
+
+def path_metrics(pnls: np.ndarray, day_change: np.ndarray, day_codes: np.ndarray,
+                 periods: int = TRADING_DAYS) -> Dict[str, np.ndarray]:
+    """逐列計算未四捨五入的績效指標（每列為一個參數組合的損益路徑，periods 為每年 K 線根數）"""
+    pnls = np.atleast_2d(pnls)
+    rows, days = pnls.shape
+    zeros = np.zeros(rows)
+    cumulative = np.cumsum(pnls, axis=1)
+    
+    if days == 0:
+        return {
+            'total_return': zeros, 'win_rate': zeros, 'profit_loss_ratio': zeros,
+            'max_drawdown': zeros, 'sharpe_ratio': zeros, 'total_trades': np.zeros(rows, dtype=int),
+            'accuracy': zeros, 'cumulative': cumulative
+        }
+    
+    stats = kernel.return_stats(pnls, periods)
+    
+    day_codes = np.broadcast_to(day_codes, pnls.shape)
+    is_buy = day_codes == scoring.SIGNAL_CODES['BUY']
+    is_sell = day_codes == scoring.SIGNAL_CODES['SELL']
+    total_predictions = (is_buy | is_sell).sum(axis=1)
+    correct = ((is_buy & (day_change > 0)) | (is_sell & (day_change < 0))).sum(axis=1)
+    accuracy = np.divide(correct * 100, total_predictions, out=np.zeros(rows), where=total_predictions > 0)
+    
+    return {
+        'total_return': cumulative[:, -1], 'win_rate': stats['win_rate'],
+        'profit_loss_ratio': stats['profit_loss_ratio'], 'max_drawdown': kernel.max_drawdown(cumulative),
+        'sharpe_ratio': stats['sharpe_ratio'], 'total_trades': total_predictions,
+        'accuracy': accuracy, 'cumulative': cumulative
+    }
+
+
+def composite_score(alpha, sharpe_ratio, win_rate, accuracy, max_drawdown):
+    """優化器綜合評分（可用於純量或陣列）"""
+    return (
+        alpha * 0.30 +
+        sharpe_ratio * 0.25 +
+        win_rate * 0.20 +
+        accuracy * 0.15 -
+        max_drawdown * 0.10
+    )
+
+
+def rounded_result(strategy: str, params: Dict, metrics: Dict, qqq_return: float,
+                   daily_results: DailyColumns = None) -> BacktestResult:
+    """由單一路徑的 path_metrics 結果組出四捨五入後的 BacktestResult"""
+    total_return = metrics['total_return']
+    return BacktestResult(
+        strategy=strategy,
+        params=params,
+        total_return=round(total_return, 2),
+        qqq_return=round(qqq_return, 2),
+        alpha=round(total_return - qqq_return, 2),
+        sharpe_ratio=round(metrics['sharpe_ratio'], 2),
+        max_drawdown=round(metrics['max_drawdown'], 2),
+        win_rate=round(metrics['win_rate'], 1),
+        profit_loss_ratio=round(metrics['profit_loss_ratio'], 2),
+        total_trades=int(metrics['total_trades']),
+        accuracy=round(metrics['accuracy'], 1),
+        daily_results=daily_results if daily_results is not None else daily_columns()
+    )
+
+
 class BacktestEngine:
     """回測引擎"""
     
-    def __init__(self, data: pd.DataFrame, initial_capital: float = 10_000_000):
+    def __init__(self, data: pd.DataFrame, initial_capital: float = 10_000_000, vectorized: bool = True,
+                 record_daily: bool = True, result_cache: ResultCache = None, bar_interval: str = '1d'):
         self.data = data
         self.initial_capital = initial_capital
+        self.vectorized = vectorized
+        self.record_daily = record_daily  # False 時不建立逐日 DailyResult（參數搜尋用）
+        self.result_cache = result_cache  # 不需逐日結果時，命中即直接返回快取的指標
+        self.bar_interval = bar_interval
+        self.periods_per_year = periods_per_year(bar_interval)  # 夏普年化因子
+        self._fingerprint = None
+    
+    @property
+    def fingerprint(self) -> str:
+        """回測資料（與非日線週期）的指紋（第一次使用時計算）"""
+        if self._fingerprint is None:
+            self._fingerprint = frame_fingerprint(self.data)
+            if self.bar_interval != '1d':
+                self._fingerprint += f":{self.bar_interval}"
+        return self._fingerprint
     
     def run(self, strategy: BaseStrategy) -> BacktestResult:
-        """執行回測"""
+        """執行回測（預設使用向量化路徑）"""
+        params = strategy.get_params_for_save()
+        if self.result_cache is not None and not self.record_daily:
+            cached = self.result_cache.get(self.fingerprint, strategy.name, params)
+            if cached is not None:
+                return BacktestResult.from_dict(strategy.name, params, cached)
+        
+        result = self.run_vectorized(strategy) if self.vectorized else self.run_loop(strategy)
+        if self.result_cache is not None:
+            self.result_cache.put(self.fingerprint, strategy.name, params, result.to_dict())
+        return result
+    
+    def run_loop(self, strategy: BaseStrategy) -> BacktestResult:
+        """逐日迴圈回測（原始實作，作為向量化路徑的對照）"""
         results = []
+        stats = RunningMetrics()
         cumulative_pnl = 0
         prev_allocation = 50
         
@@ -520,29 +884,31 @@ class BacktestEngine:
             change = row['change_pct']
             pnl = change * (prev_allocation / 100)
             cumulative_pnl += pnl
+            stats.add_return(pnl)
+            stats.mark(cumulative_pnl)
             
             if signal in ['BUY', 'SELL']:
                 total_predictions += 1
                 if (signal == 'BUY' and change > 0) or (signal == 'SELL' and change < 0):
                     correct_predictions += 1
             
-            result = DailyResult(
-                date=row.name.strftime('%Y-%m-%d'),
-                close=row['close'],
-                change_pct=change,
-                ma20=row.get('ma20', 0),
-                above_ma20=row.get('above_ma20', False),
-                days_above=row.get('days_above_ma20', 0),
-                days_below=row.get('days_below_ma20', 0),
-                vix=row.get('vix', 20),
-                score=score,
-                signal=signal,
-                regime='offense' if score >= 6.5 else 'defense' if score <= 3.5 else 'neutral',
-                qqq_pct=allocation,
-                pnl_pct=pnl,
-                cumulative_pnl=cumulative_pnl
-            )
-            results.append(result)
+            if self.record_daily:
+                results.append(DailyResult(
+                    date=row.name.strftime(date_format(self.bar_interval)),
+                    close=row['close'],
+                    change_pct=change,
+                    ma20=row.get('ma20', 0),
+                    above_ma20=row.get('above_ma20', False),
+                    days_above=row.get('days_above_ma20', 0),
+                    days_below=row.get('days_below_ma20', 0),
+                    vix=row.get('vix', 20),
+                    score=score,
+                    signal=signal,
+                    regime='offense' if score >= 6.5 else 'defense' if score <= 3.5 else 'neutral',
+                    qqq_pct=allocation,
+                    pnl_pct=pnl,
+                    cumulative_pnl=cumulative_pnl
+                ))
             prev_allocation = allocation
         
         # 計算績效指標
@@ -550,32 +916,10 @@ class BacktestEngine:
         qqq_return = (self.data['close'].iloc[-1] / self.data['close'].iloc[0] - 1) * 100
         alpha = total_return - qqq_return
         
-        pnls = [r.pnl_pct for r in results]
-        win_days = len([p for p in pnls if p > 0])
-        win_rate = win_days / len(pnls) * 100 if pnls else 0
-        
-        gains = [p for p in pnls if p > 0]
-        losses = [abs(p) for p in pnls if p < 0]
-        avg_gain = sum(gains) / len(gains) if gains else 0
-        avg_loss = sum(losses) / len(losses) if losses else 1
-        pl_ratio = avg_gain / avg_loss if avg_loss > 0 else 0
-        
-        cumulative = [r.cumulative_pnl for r in results]
-        peak = cumulative[0] if cumulative else 0
-        max_dd = 0
-        for c in cumulative:
-            if c > peak:
-                peak = c
-            dd = peak - c
-            if dd > max_dd:
-                max_dd = dd
-        
-        if len(pnls) > 1:
-            mean_return = np.mean(pnls) * 252
-            std_return = np.std(pnls) * np.sqrt(252)
-            sharpe = mean_return / std_return if std_return > 0 else 0
-        else:
-            sharpe = 0
+        win_rate = stats.win_rate
+        pl_ratio = stats.profit_loss_ratio
+        max_dd = stats.max_drawdown
+        sharpe = stats.sharpe(self.periods_per_year) if stats.count > 1 else 0
         
         accuracy = correct_predictions / total_predictions * 100 if total_predictions > 0 else 0
         
@@ -591,76 +935,465 @@ class BacktestEngine:
             profit_loss_ratio=round(pl_ratio, 2),
             total_trades=total_predictions,
             accuracy=round(accuracy, 1),
-            daily_results=results
+            daily_results=DailyColumns.from_rows(results, DAILY_FIELDS, DailyResult)
+        )
+    
+    def run_vectorized(self, strategy: BaseStrategy) -> BacktestResult:
+        """
+        向量化回測：一次計算整段期間的配置、損益、回撤與準確率
+        
+        第 i 天的損益使用第 i-2 天收盤評分得出的配置（與 run_loop 相同的延遲），
+        第一天沿用初始 50% 配置。
+        """
+        path = self.daily_path(strategy)
+        scores, codes, allocations, change, pnls = (
+            path['scores'], path['codes'], path['allocations'], path['change'], path['pnls']
         )
+        metrics = {k: v[0] for k, v in path_metrics(pnls, change[1:], codes[:-1], self.periods_per_year).items()}
+        qqq_return = (self.data['close'].iloc[-1] / self.data['close'].iloc[0] - 1) * 100
+        
+        results = None
+        if self.record_daily:
+            signals = scoring.SIGNAL_NAMES[codes[:-1]]
+            results = self._daily_results(scores[:-1], signals, allocations[:-1], pnls, metrics['cumulative'])
+        
+        return rounded_result(strategy.name, strategy.get_params_for_save(), metrics, qqq_return, results)
+    
+    def daily_path(self, strategy: BaseStrategy) -> Dict[str, np.ndarray]:
+        """每列的分數、訊號代碼、配置與漲跌幅，以及自第 1 列起的每日損益"""
+        scores, codes, _ = strategy.score_batch(self.data)
+        allocations = strategy.allocation_batch(scores)
+        change = self.data['change_pct'].to_numpy(dtype=float)
+        return {
+            'scores': scores,
+            'codes': codes,
+            'allocations': allocations,
+            'change': change,
+            'pnls': lagged_pnl(change, allocations)[0],
+        }
+    
+    def _daily_results(self, scores: np.ndarray, signals: np.ndarray, allocations: np.ndarray,
+                       pnls: np.ndarray, cumulative: np.ndarray) -> DailyColumns:
+        """由欄位陣列組出欄式每日結果（第 1 列起）"""
+        days = self.data.iloc[1:]
+        n = len(days)
+        
+        def column(name, default):
+            if name in days.columns:
+                return days[name].to_numpy()
+            return np.full(n, default)
+        
+        return daily_columns({
+            'date': days.index.strftime(date_format(self.bar_interval)).to_numpy(dtype=str),
+            'close': column('close', 0),
+            'change_pct': column('change_pct', 0),
+            'ma20': column('ma20', 0),
+            'above_ma20': column('above_ma20', False),
+            'days_above': column('days_above_ma20', 0),
+            'days_below': column('days_below_ma20', 0),
+            'vix': column('vix', 20),
+            'score': scores,
+            'signal': signals,
+            'regime': np.where(scores >= 6.5, 'offense', np.where(scores <= 3.5, 'defense', 'neutral')),
+            'qqq_pct': allocations,
+            'pnl_pct': pnls,
+            'cumulative_pnl': cumulative,
+        })
+
+
+# ============================================
+# 多標的面板回測
+# ============================================
+
+@dataclass
+class PanelResult:
+    """面板回測結果：每個標的一份 BacktestResult，加上等權組合的彙總"""
+    strategy: str
+    symbols: List[str]
+    results: List[BacktestResult]
+    aggregate: BacktestResult
+    
+    def to_dict(self) -> Dict:
+        return {
+            'strategy': self.strategy,
+            'aggregate': self.aggregate.to_dict(),
+            'symbols': {s: r.to_dict() for s, r in zip(self.symbols, self.results)},
+        }
+
+
+class PanelBacktestEngine:
+    """
+    多標的面板回測
+    
+    所有標的的特徵攤平成一張長表，以同一策略的 score_batch 一次評分，
+    之後配置、損益與績效都以 (標的 × 天數) 陣列計算；每個標的的結果
+    與單獨對該標的執行 BacktestEngine 相同。
+    """
+    
+    def __init__(self, features: Dict[str, pd.DataFrame]):
+        self.features = features
+        self.symbols = [str(s) for s in features['close'].columns]
+        self.dates = features['close'].index
+    
+    def _long_frame(self) -> pd.DataFrame:
+        """(標的 × 天數) 依標的優先攤平成長表，每列一個 (標的, 日期)"""
+        return pd.DataFrame({
+            name: frame.to_numpy(dtype=float).T.ravel() for name, frame in self.features.items()
+        })
+    
+    def run(self, strategy: BaseStrategy) -> PanelResult:
+        n_symbols, n_days = len(self.symbols), len(self.dates)
+        params = strategy.get_params_for_save()
+        
+        scores, codes, _ = strategy.score_batch(self._long_frame())
+        scores = scores.reshape(n_symbols, n_days)
+        codes = codes.reshape(n_symbols, n_days)
+        allocations = strategy.allocation_batch(scores)
+        
+        close = self.features['close'].to_numpy(dtype=float).T
+        change = self.features['change_pct'].to_numpy(dtype=float).T
+        pnls = lagged_pnl(change, allocations)
+        metrics = path_metrics(pnls, change[:, 1:], codes[:, :-1])
+        buy_hold = (close[:, -1] / close[:, 0] - 1) * 100
+        
+        results = [
+            rounded_result(strategy.name, params, {k: v[i] for k, v in metrics.items()}, buy_hold[i])
+            for i in range(n_symbols)
+        ]
+        
+        # 等權組合：每日損益取各標的平均；準確率以所有標的的預測合計
+        portfolio = {k: v[0] for k, v in path_metrics(pnls.mean(axis=0), change[:, 1:].mean(axis=0),
+                                                      scoring.SIGNAL_CODES['HOLD']).items()}
+        trades = metrics['total_trades'].sum()
+        correct = (metrics['accuracy'] * metrics['total_trades'] / 100).sum()
+        portfolio['total_trades'] = trades
+        portfolio['accuracy'] = correct * 100 / trades if trades > 0 else 0
+        aggregate = rounded_result(strategy.name, params, portfolio, buy_hold.mean())
+        
+        return PanelResult(strategy.name, self.symbols, results, aggregate)
 
 
 # ============================================
 # 參數優化
 # ============================================
 
+def _strategy_task(data: pd.DataFrame, payload: Tuple[str, Dict, str]) -> BacktestResult:
+    """工作進程任務：以指定參數回測單一策略"""
+    name, params, bar_interval = payload
+    strategy = MA20Strategy(params) if name == 'ma20' else DefaultStrategy(params)
+    return BacktestEngine(data, record_daily=False, bar_interval=bar_interval).run(strategy)
+
+
+def _ma20_grid_task(data: pd.DataFrame, payload: Tuple[List[Dict], str]) -> Dict[str, np.ndarray]:
+    """工作進程任務：評估一段 MA20 參數網格"""
+    combos, bar_interval = payload
+    return ParameterOptimizer(data, 0, bar_interval=bar_interval).evaluate_ma20_grid(combos)
+
+
 class ParameterOptimizer:
     """參數優化器"""
     
-    def __init__(self, data: pd.DataFrame, weeks: int):
+    def __init__(self, data: pd.DataFrame, weeks: int, workers: int = 1, result_cache: ResultCache = None,
+                 prune: bool = False, bar_interval: str = '1d', pareto_dir: str = None):
         self.data = data
         self.weeks = weeks
-        self.engine = BacktestEngine(data)
+        self.workers = workers
+        self.result_cache = result_cache
+        # True 時逐段評估並剪掉上界已無法勝出的組合；被剪掉的組合沒有完整績效，保存前緣時不能剪枝
+        self.prune = prune and not pareto_dir
+        self.bar_interval = bar_interval
+        self.pareto_dir = pareto_dir  # 設定時另存每次優化所有評估組合的 Pareto 前緣
+        self.engine = BacktestEngine(data, record_daily=False, result_cache=result_cache, bar_interval=bar_interval)
+        self._factors = None
     
-    def optimize_ma20(self, auto_save: bool = True) -> Tuple[Dict, BacktestResult]:
-        """優化 MA20 策略參數"""
-        print("\n🔧 優化 MA20 策略參數...")
-        
-        # 參數搜索空間
-        days_thresholds = [1, 2, 3]
-        vix_limits = [30, 35, 40, 45]
-        position_weights = [0.4, 0.5, 0.6]
-        trend_weights = [0.2, 0.3, 0.4]
-        
+    def _run_all(self, name: str, params_list: List[Dict]) -> List[BacktestResult]:
+        """依序（或多進程）回測每組參數，結果順序與輸入一致；有快取時只回測未命中的組合"""
+        if self.result_cache is None:
+            payloads = [(name, p, self.bar_interval) for p in params_list]
+            return list(parallel_map(_strategy_task, payloads, self.data, self.workers))
+        
+        cached = self.result_cache.get_many(self.engine.fingerprint, name, params_list)
+        misses = [i for i, m in enumerate(cached) if m is None]
+        payloads = [(name, params_list[i], self.bar_interval) for i in misses]
+        fresh = list(parallel_map(_strategy_task, payloads, self.data, self.workers))
+        self.result_cache.put_many(self.engine.fingerprint, name, [(params_list[i], r.to_dict()) for i, r in zip(misses, fresh)])
+        
+        results = [
+            BacktestResult.from_dict(name, p, m) if m is not None else None
+            for p, m in zip(params_list, cached)
+        ]
+        for i, result in zip(misses, fresh):
+            results[i] = result
+        if params_list:
+            print(f"  結果快取命中 {len(params_list) - len(misses)}/{len(params_list)} 組")
+        return results
+    
+    def _rank(self, name: str, params_list: List[Dict]) -> List[Dict]:
+        """回測每組參數並依綜合評分由高至低排序（同分保持輸入順序）"""
         results = []
-        total = len(days_thresholds) * len(vix_limits) * len(position_weights) * len(trend_weights)
-        
-        print(f"  測試 {total} 種參數組合...")
+        for params, result in zip(params_list, self._run_all(name, params_list)):
+            results.append({
+                'params': params,
+                'result': result,
+                'composite_score': composite_score(
+                    result.alpha, result.sharpe_ratio, result.win_rate,
+                    result.accuracy, result.max_drawdown
+                )
+            })
         
-        for days, vix_lim, pos_w, trend_w in itertools.product(
-            days_thresholds, vix_limits, position_weights, trend_weights
-        ):
+        results.sort(key=lambda x: x['composite_score'], reverse=True)
+        return results
+    
+    def _save_front(self, name: str, params_list: List[Dict], columns: Dict[str, Sequence]):
+        """保存所有評估組合在 Alpha / 夏普 / 最大回撤 / 準確率上的非支配前緣（columns 與 params_list 同順序）"""
+        path = os.path.join(self.pareto_dir, f'{name}.json')
+        meta = {'weeks': self.weeks, 'bar_interval': self.bar_interval,
+                'data_start': str(self.data.index[0]), 'data_end': str(self.data.index[-1])}
+        doc = pareto.save_front(path, name, params_list, {k: columns[k] for k in RESULT_METRIC_KEYS}, meta=meta)
+        print(f"  Pareto 前緣: {len(doc['front'])}/{doc['evaluated']} 組 → {path}")
+    
+    def _save_ranked_front(self, name: str, results: List[Dict]):
+        """_rank 結果的 Pareto 前緣"""
+        self._save_front(name, [r['params'] for r in results],
+                         pareto.metric_columns([r['result'].to_dict() for r in results]))
+    
+    @staticmethod
+    def ma20_param_combinations(param_grid: Dict[str, List] = None) -> Tuple[List[Dict], int]:
+        """展開 MA20 參數網格，返回 (有效組合, 網格總數)"""
+        grid = param_grid or MA20_PARAM_GRID
+        product = list(itertools.product(
+            grid['days_threshold'], grid['vix_limit'], grid['position_weight'], grid['trend_weight']
+        ))
+        
+        combos = []
+        for days, vix_lim, pos_w, trend_w in product:
             vix_w = round(1 - pos_w - trend_w, 2)
             if vix_w < 0.1 or vix_w > 0.4:
                 continue
-            
-            params = {
+            combos.append({
                 'days_threshold': days,
                 'vix_limit': vix_lim,
                 'position_weight': pos_w,
                 'trend_weight': trend_w,
                 'vix_weight': vix_w
+            })
+        
+        return combos, len(product)
+    
+    def _factor_inputs(self) -> Dict[str, np.ndarray]:
+        """與參數無關的逐列因子分數（第一次使用時計算）"""
+        if self._factors is None:
+            data = self.data
+            change = scoring.frame_column(data, 'change_pct', 0)
+            vix = scoring.frame_column(data, 'vix', 20)
+            self._factors = {
+                'vix': vix,
+                'days_above': scoring.frame_column(data, 'days_above_ma20', 0),
+                'days_below': scoring.frame_column(data, 'days_below_ma20', 0),
+                'ma20_position': scoring.ma20_position_scores(scoring.frame_column(data, 'ma20_diff_pct', 0)),
+                'vix_filter': scoring.vix_filter_scores(vix),
+                'default': scoring.default_factor_scores(
+                    change,
+                    scoring.frame_column(data, 'volume_ratio', 1.0),
+                    vix,
+                    scoring.frame_column(data, 'us10y_change', 0),
+                ),
             }
+        return self._factors
+    
+    def _default_factor_matrix(self, names: Sequence[str], start: int = 0, end: int = None) -> np.ndarray:
+        """Default 因子分數矩陣 (因子數 × 列數)，列順序依 names"""
+        factors = self._factor_inputs()['default']
+        return np.stack([factors[f][start:end] for f in names]).astype(float)
+    
+    def ma20_allocations(self, combos: List[Dict], start: int = 0, end: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """MA20 組合在 [start, end) 列的配置與訊號代碼，皆為 (組合數 × 列數)"""
+        inputs = {k: v[start:end] for k, v in self._factor_inputs().items() if k != 'default'}
+        
+        def column(key):
+            return np.array([c[key] for c in combos], dtype=float)[:, None]
+        
+        thresholds = np.array([c['days_threshold'] for c in combos])
+        vix_limits = column('vix_limit')
+        weights = {
+            'ma20_position': column('position_weight'),
+            'ma20_trend': column('trend_weight'),
+            'vix_filter': column('vix_weight'),
+        }
+        
+        shape = (len(combos), len(inputs['vix']))
+        totals = np.empty(shape)
+        codes = np.empty(shape, dtype=np.int8)
+        for threshold in np.unique(thresholds):
+            trend, trend_codes = scoring.ma20_trend_scores(inputs['days_above'], inputs['days_below'], threshold)
+            factors = {'ma20_position': inputs['ma20_position'], 'ma20_trend': trend,
+                       'vix_filter': inputs['vix_filter']}
+            sel = np.flatnonzero(thresholds == threshold)
             
-            strategy = MA20Strategy(params)
-            result = self.engine.run(strategy)
-            
-            # 綜合評分
-            composite = (
-                result.alpha * 0.30 +
-                result.sharpe_ratio * 0.25 +
-                result.win_rate * 0.20 +
-                result.accuracy * 0.15 -
-                result.max_drawdown * 0.10
-            )
-            
-            results.append({
-                'params': params,
-                'result': result,
-                'composite_score': composite
-            })
+            group = scoring.round_scores(scoring.weighted_total(factors, {f: w[sel] for f, w in weights.items()}))
+            risk_off = inputs['vix'] > vix_limits[sel]
+            totals[sel] = np.where(risk_off, np.minimum(group, 4), group)
+            codes[sel] = np.where(risk_off, scoring.SIGNAL_CODES['RISK_OFF'], trend_codes)
         
-        # 排序
-        results.sort(key=lambda x: x['composite_score'], reverse=True)
+        return scoring.allocation_lookup(totals, scoring.MA20_ALLOCATION), codes
+    
+    def default_allocations(self, params_list: List[Dict], start: int = 0, end: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Default 權重組在 [start, end) 列的配置與訊號代碼，皆為 (組合數 × 列數)"""
+        all_weights = [DefaultStrategy(params).weights for params in params_list]
+        
+        totals = np.empty((len(params_list), len(self.data.iloc[start:end])))
+        # 依權重鍵的順序分組，保持與 DefaultStrategy.score_batch 相同的加總順序
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for i, weights in enumerate(all_weights):
+            groups.setdefault(tuple(weights), []).append(i)
+        for names, members in groups.items():
+            weights = np.array([[all_weights[i][f] for f in names] for i in members], dtype=float)
+            totals[members] = scoring.matrix_totals(self._default_factor_matrix(names, start, end), weights)
+        
+        return scoring.allocation_lookup(totals, scoring.DEFAULT_ALLOCATION), scoring.threshold_signal_codes(totals)
+    
+    def evaluate_default_weights(self, weights: np.ndarray, names: Sequence[str],
+                                 chunk_size: int = 256) -> Dict[str, np.ndarray]:
+        """
+        一次評估整個 Default 權重矩陣 (組合數 × 因子數，欄順序依 names)
+        
+        每段 chunk_size 組以一次矩陣乘法對預先算好的因子分數矩陣計分，
+        返回每組（依列順序）四捨五入後的績效與綜合評分。
+        """
+        factor_matrix = self._default_factor_matrix(names)
+        parts = []
+        for start in range(0, len(weights), chunk_size):
+            totals = scoring.matrix_totals(factor_matrix, weights[start:start + chunk_size])
+            parts.append(self._grid_metrics(scoring.allocation_lookup(totals, scoring.DEFAULT_ALLOCATION),
+                                            scoring.threshold_signal_codes(totals)))
+        if not parts:
+            return self._grid_metrics(np.zeros((0, len(self.data)), dtype=int),
+                                      np.zeros((0, len(self.data)), dtype=np.int8))
+        return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+    
+    def _grid_metrics(self, allocations: np.ndarray, codes: np.ndarray) -> Dict[str, np.ndarray]:
+        """(組合數 × 列數) 配置的四捨五入績效與綜合評分（與 BacktestResult 相同）"""
+        change = self.data['change_pct'].to_numpy(dtype=float)
+        qqq_return = (self.data['close'].iloc[-1] / self.data['close'].iloc[0] - 1) * 100
+        raw = path_metrics(lagged_pnl(change, allocations), change[1:], codes[:, :-1], self.engine.periods_per_year)
+        
+        n = len(allocations)
+        out = {
+            'total_return': scoring.round_scores(raw['total_return'], 2),
+            'qqq_return': np.full(n, round(qqq_return, 2)),
+            'alpha': scoring.round_scores(raw['total_return'] - qqq_return, 2),
+            'sharpe_ratio': scoring.round_scores(raw['sharpe_ratio'], 2),
+            'max_drawdown': scoring.round_scores(raw['max_drawdown'], 2),
+            'win_rate': scoring.round_scores(raw['win_rate'], 1),
+            'profit_loss_ratio': scoring.round_scores(raw['profit_loss_ratio'], 2),
+            'accuracy': scoring.round_scores(raw['accuracy'], 1),
+            'total_trades': np.asarray(raw['total_trades']).astype(int),
+        }
+        out['composite_score'] = composite_score(
+            out['alpha'], out['sharpe_ratio'], out['win_rate'], out['accuracy'], out['max_drawdown']
+        )
+        return out
+    
+    def evaluate_ma20_grid(self, combos: List[Dict], chunk_size: int = 256) -> Dict[str, np.ndarray]:
+        """
+        一次評估整個 MA20 參數網格
+        
+        與參數無關的因子分數只算一次，權重與門檻以 (組合數 × 天數) 矩陣廣播，
+        返回每個組合（依 combos 順序）四捨五入後的績效與綜合評分。
+        """
+        parts = [
+            self._grid_metrics(*self.ma20_allocations(combos[start:start + chunk_size]))
+            for start in range(0, len(combos), chunk_size)
+        ]
+        if not parts:
+            return self._grid_metrics(np.zeros((0, len(self.data)), dtype=int),
+                                      np.zeros((0, len(self.data)), dtype=np.int8))
+        return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+    
+    def _pruned_scores(self, name: str, params_list: List[Dict], top_k: int = 1,
+                       block: int = 21, chunk_size: int = 256) -> Dict[str, np.ndarray]:
+        """以上界剪枝評估 MA20 網格或 Default 權重組（被剪掉的組合 composite_score 為 -inf）"""
+        allocate = self.ma20_allocations if name == 'ma20' else self.default_allocations
+        table = scoring.MA20_ALLOCATION if name == 'ma20' else scoring.DEFAULT_ALLOCATION
         
-        best = results[0]
-        best_params = best['params']
-        best_result = best['result']
+        def rows(idx, start, end):
+            return allocate([params_list[i] for i in idx], start, end)
+        
+        def full(idx):
+            parts = [self._grid_metrics(*allocate([params_list[i] for i in idx[s:s + chunk_size]]))
+                     for s in range(0, len(idx), chunk_size)]
+            return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+        
+        qqq_return = (self.data['close'].iloc[-1] / self.data['close'].iloc[0] - 1) * 100
+        out, evaluated = pruned_grid_search(
+            len(params_list), rows, full, self.data['change_pct'].to_numpy(dtype=float), qqq_return,
+            (min(table), max(table)), scoring.SIGNAL_CODES, top_k=top_k, block=block,
+            periods=self.engine.periods_per_year
+        )
+        print(f"  剪枝: 完整評估 {int(evaluated.sum())}/{len(params_list)} 組")
+        return out
+    
+    def _ma20_grid_scores(self, combos: List[Dict]) -> Dict[str, np.ndarray]:
+        """網格評估；有結果快取時只評估未命中的組合"""
+        if self.result_cache is None:
+            return self._ma20_grid_eval(combos)
+        
+        cached = self.result_cache.get_many(self.engine.fingerprint, 'ma20', combos)
+        misses = [i for i, m in enumerate(cached) if m is None]
+        print(f"  結果快取命中 {len(combos) - len(misses)}/{len(combos)} 組")
+        
+        rows = list(cached)
+        if misses:
+            fresh = self._ma20_grid_eval([combos[i] for i in misses])
+            for j, i in enumerate(misses):
+                rows[i] = {k: fresh[k][j] for k in RESULT_METRIC_KEYS}
+            self.result_cache.put_many(self.engine.fingerprint, 'ma20', [(combos[i], rows[i]) for i in misses])
+        
+        out = {k: np.array([r[k] for r in rows], dtype=float) for k in RESULT_METRIC_KEYS}
+        out['total_trades'] = out['total_trades'].astype(int)
+        out['composite_score'] = composite_score(
+            out['alpha'], out['sharpe_ratio'], out['win_rate'], out['accuracy'], out['max_drawdown']
+        )
+        return out
+    
+    def _ma20_grid_eval(self, combos: List[Dict]) -> Dict[str, np.ndarray]:
+        """網格評估；多進程時將組合切成連續區段，各進程各算一段再依序合併"""
+        workers = min(resolve_workers(self.workers), len(combos))
+        if workers <= 1:
+            return self.evaluate_ma20_grid(combos)
+        
+        parts = np.array_split(np.arange(len(combos)), workers)
+        chunks = [[combos[i] for i in part] for part in parts]
+        payloads = [(chunk, self.bar_interval) for chunk in chunks]
+        outputs = list(parallel_map(_ma20_grid_task, payloads, self.data, workers))
+        return {k: np.concatenate([o[k] for o in outputs]) for k in outputs[0]}
+    
+    def best_ma20_params(self, combos: List[Dict]) -> Tuple[Dict, float]:
+        """以網格評估選出綜合評分最高的 MA20 參數，返回 (參數, 綜合評分)"""
+        grid = self._pruned_scores('ma20', combos) if self.prune else self._ma20_grid_scores(combos)
+        if self.pareto_dir:
+            self._save_front('ma20', combos, grid)
+        best_index = int(np.argsort(-grid['composite_score'], kind='stable')[0])
+        return combos[best_index], float(grid['composite_score'][best_index])
+    
+    def optimize_ma20(self, auto_save: bool = True, param_grid: Dict[str, List] = None,
+                      grid_mode: bool = True) -> Tuple[Dict, BacktestResult]:
+        """優化 MA20 策略參數"""
+        print("\n🔧 優化 MA20 策略參數...")
+        
+        combos, total = self.ma20_param_combinations(param_grid)
+        
+        print(f"  測試 {total} 種參數組合...")
+        
+        if grid_mode:
+            best_params, _ = self.best_ma20_params(combos)
+            best_result = self.engine.run(MA20Strategy(best_params))
+        else:
+            results = self._rank('ma20', combos)
+            if self.pareto_dir:
+                self._save_ranked_front('ma20', results)
+            best_params = results[0]['params']
+            best_result = results[0]['result']
         
         print(f"\n🏆 最佳參數:")
         print(f"  days_threshold: {best_params['days_threshold']}")
@@ -685,56 +1418,82 @@ class ParameterOptimizer:
         
         return best_params, best_result
     
-    def optimize_default(self, auto_save: bool = True) -> Tuple[Dict, BacktestResult]:
-        """優化 Default 策略權重"""
+    def _halving_default(self, samples: int, resolution: float, eta: int) -> Dict:
+        """successive halving 搜索 Default 權重，返回完整期間綜合評分最高的參數"""
+        names = list(DEFAULT_WEIGHT_SETS[0])
+        weights = DEFAULT_WEIGHT_SETS + sample_weights(samples, names, DEFAULT_WEIGHT_BOUNDS, resolution)
+        candidates = [{'weights': w} for w in weights]
+        budgets = halving_budgets(len(self.data), HALVING_MIN_DAYS, eta)
+        print(f"  測試 {len(candidates)} 種權重組合 (successive halving, 視窗 {budgets} 天)...")
+        evaluated: Dict[int, Dict] = {}  # 任一輪評估過的組合（依首次評估順序）
+        
+        def evaluate(batch: List[Dict], budget: int) -> List[float]:
+            window = ParameterOptimizer(self.data.iloc[-budget:], self.weeks, self.workers, self.result_cache,
+                                        bar_interval=self.bar_interval)
+            results = window._run_all('default', batch)
+            evaluated.update((id(p), p) for p in batch)
+            return [
+                composite_score(r.alpha, r.sharpe_ratio, r.win_rate, r.accuracy, r.max_drawdown)
+                for r in results
+            ]
+        
+        ranked = successive_halving(candidates, evaluate, budgets, eta)
+        if self.pareto_dir and evaluated:
+            # 各輪視窗長度不同，指標不能直接比較：所有評估過的組合以完整期間重新計分（矩陣計算）後取前緣
+            params_list = list(evaluated.values())
+            self._save_front('default', params_list, self._grid_metrics(*self.default_allocations(params_list)))
+        return ranked[0][0]
+    
+    def _simplex_default(self, resolution: float) -> Dict:
+        """列舉 DEFAULT_WEIGHT_BOUNDS 內所有 resolution 格點權重，以權重矩陣一次評估，返回綜合評分最高的參數"""
+        names = list(DEFAULT_WEIGHT_SETS[0])
+        grid = simplex_grid(names, resolution, DEFAULT_WEIGHT_BOUNDS)
+        print(f"  測試 {len(grid)} 種權重組合 (單純形格點 {resolution})...")
+        
+        params_list = [{'weights': w} for w in weight_dicts(grid, names, resolution)]
+        if self.prune:
+            scores = self._pruned_scores('default', params_list)['composite_score']
+        else:
+            metrics = self.evaluate_default_weights(grid / grid.sum(axis=1, keepdims=True), names)
+            if self.pareto_dir:
+                self._save_front('default', params_list, metrics)
+            scores = metrics['composite_score']
+        return params_list[int(np.argsort(-scores, kind='stable')[0])]
+    
+    def best_default_params(self, search: str = 'sets', samples: int = 243, resolution: float = None,
+                            eta: int = 3) -> Tuple[Dict, BacktestResult]:
+        """依 search 選出綜合評分最高的 Default 權重，返回 (參數, 完整期間回測結果)；參數見 optimize_default"""
+        if search == 'halving':
+            best_params = self._halving_default(samples, resolution or 0.01, eta)
+            return best_params, self.engine.run(DefaultStrategy(best_params))
+        if search == 'simplex':
+            best_params = self._simplex_default(resolution or 0.05)
+            return best_params, self.engine.run(DefaultStrategy(best_params))
+        
+        print(f"  測試 {len(DEFAULT_WEIGHT_SETS)} 種權重組合...")
+        params_list = [{'weights': weights} for weights in DEFAULT_WEIGHT_SETS]
+        if self.prune:
+            grid = self._pruned_scores('default', params_list)
+            best_params = params_list[int(np.argsort(-grid['composite_score'], kind='stable')[0])]
+            return best_params, self.engine.run(DefaultStrategy(best_params))
+        
+        ranked = self._rank('default', params_list)
+        if self.pareto_dir:
+            self._save_ranked_front('default', ranked)
+        return ranked[0]['params'], ranked[0]['result']
+    
+    def optimize_default(self, auto_save: bool = True, search: str = 'sets',
+                         samples: int = 243, resolution: float = None, eta: int = 3) -> Tuple[Dict, BacktestResult]:
+        """
+        優化 Default 策略權重
+        
+        search='sets' 測試 DEFAULT_WEIGHT_SETS；search='halving' 在 resolution（預設 0.01）格點上取樣
+        samples 組權重，以 successive halving 從短視窗逐輪淘汰到完整期間；
+        search='simplex' 完整列舉 resolution（預設 0.05）格點上的所有權重。
+        """
         print("\n🔧 優化 Default 策略權重...")
         
-        # 權重搜索空間
-        weight_sets = [
-            {"price_momentum": 0.30, "volume": 0.20, "vix": 0.20, "bond": 0.15, "mag7": 0.15},
-            {"price_momentum": 0.35, "volume": 0.15, "vix": 0.25, "bond": 0.10, "mag7": 0.15},
-            {"price_momentum": 0.25, "volume": 0.25, "vix": 0.25, "bond": 0.10, "mag7": 0.15},
-            {"price_momentum": 0.40, "volume": 0.15, "vix": 0.20, "bond": 0.10, "mag7": 0.15},
-            {"price_momentum": 0.30, "volume": 0.15, "vix": 0.30, "bond": 0.10, "mag7": 0.15},
-            {"price_momentum": 0.25, "volume": 0.20, "vix": 0.25, "bond": 0.15, "mag7": 0.15},
-            {"price_momentum": 0.35, "volume": 0.20, "vix": 0.15, "bond": 0.15, "mag7": 0.15},
-            {"price_momentum": 0.30, "volume": 0.10, "vix": 0.30, "bond": 0.15, "mag7": 0.15},
-            {"price_momentum": 0.35, "volume": 0.10, "vix": 0.30, "bond": 0.10, "mag7": 0.15},
-            {"price_momentum": 0.40, "volume": 0.10, "vix": 0.25, "bond": 0.10, "mag7": 0.15},
-        ]
-        
-        results = []
-        
-        print(f"  測試 {len(weight_sets)} 種權重組合...")
-        
-        for weights in weight_sets:
-            params = {'weights': weights}
-            strategy = DefaultStrategy(params)
-            result = self.engine.run(strategy)
-            # 將所有指標標準化為 0~1 或相似量級
-            # win_rate: 60% -> 0.6
-            # max_drawdown: 10% -> 0.1
-            # sharpe: 除以 3 (假設 3 為極優秀)
-            # alpha: 使用小數點 (0.05 代表 5%)
-            composite = (
-                result.alpha * 0.30 +
-                result.sharpe_ratio * 0.25 +
-                result.win_rate * 0.20 +
-                result.accuracy * 0.15 -
-                result.max_drawdown * 0.10
-            )
-            
-            results.append({
-                'params': params,
-                'result': result,
-                'composite_score': composite
-            })
-        
-        results.sort(key=lambda x: x['composite_score'], reverse=True)
-        
-        best = results[0]
-        best_params = best['params']
-        best_result = best['result']
+        best_params, best_result = self.best_default_params(search, samples, resolution, eta)
         
         print(f"\n🏆 最佳權重:")
         for k, v in best_params['weights'].items():
@@ -755,6 +1514,146 @@ class ParameterOptimizer:
         return best_params, best_result
 
 
+# ============================================
+# Walk-forward 驗證
+# ============================================
+
+@dataclass
+class WalkForwardWindow:
+    """單一訓練 / 測試視窗的結果"""
+    strategy: str
+    train_start: str
+    train_end: str
+    test_start: str
+    test_end: str
+    params: Dict
+    train_score: float
+    test_result: BacktestResult
+
+
+def _walk_forward_task(data: pd.DataFrame, payload: Tuple) -> Dict:
+    """
+    工作進程任務：在訓練區段選參數，再於測試區段做樣本外回測
+    
+    測試區段多帶前兩列，讓第一個測試日的配置來自新參數對前兩日的評分（與連續執行相同的延遲），
+    算完後捨去屬於訓練期間的那一筆損益。
+    """
+    name, train_start, test_start, test_end, param_grid, bar_interval, prune, default_search = payload
+    optimizer = ParameterOptimizer(data.iloc[train_start:test_start], 0, prune=prune, bar_interval=bar_interval)
+    
+    if name == 'ma20':
+        combos, _ = optimizer.ma20_param_combinations(param_grid)
+        params, train_score = optimizer.best_ma20_params(combos)
+        strategy = MA20Strategy(params)
+    else:
+        params, train = optimizer.best_default_params(**default_search)
+        train_score = composite_score(train.alpha, train.sharpe_ratio, train.win_rate, train.accuracy,
+                                      train.max_drawdown)
+        strategy = DefaultStrategy(params)
+    
+    engine = BacktestEngine(data.iloc[test_start - 2:test_end], bar_interval=bar_interval)
+    path = engine.daily_path(strategy)
+    pnls = path['pnls'][1:]
+    day_codes = path['codes'][1:-1]
+    metrics = {k: v[0] for k, v in path_metrics(pnls, path['change'][2:], day_codes, engine.periods_per_year).items()}
+    close = data['close']
+    qqq_return = (close.iloc[test_end - 1] / close.iloc[test_start - 1] - 1) * 100
+    
+    return {
+        'params': params,
+        'train_score': train_score,
+        'test_result': rounded_result(strategy.name, strategy.get_params_for_save(), metrics, qqq_return),
+        'pnls': pnls,
+        'day_codes': day_codes,
+    }
+
+
+class WalkForwardOptimizer:
+    """
+    Walk-forward 參數驗證
+    
+    特徵只在完整歷史上準備一次，各視窗以列位置切片；
+    每個視窗在訓練區段選出最佳參數，於緊接的測試區段做樣本外回測，
+    最後把各測試區段的每日損益串接成一條樣本外權益曲線。
+    """
+    
+    def __init__(self, data: pd.DataFrame, train_weeks: int = 26, test_weeks: int = 4,
+                 anchored: bool = False, workers: int = 1, bar_interval: str = '1d', prune: bool = False,
+                 default_search: Dict = None):
+        self.data = data
+        self.bar_interval = bar_interval
+        self.train_days = train_weeks * 5 * bars_per_day(bar_interval)  # 視窗長度以 K 線根數計
+        self.test_days = test_weeks * 5 * bars_per_day(bar_interval)
+        self.anchored = anchored  # True：訓練區段固定從頭開始並逐步擴大
+        self.workers = workers
+        self.prune = prune  # 各視窗選參數時使用上界剪枝
+        self.default_search = default_search or {}  # Default 權重的搜索方式（best_default_params 的參數）
+        self.oos_cumulative = None  # 最近一次 run() 的樣本外累積損益
+    
+    def windows(self) -> List[Tuple[int, int, int]]:
+        """(train_start, test_start, test_end) 列位置"""
+        n = len(self.data)
+        windows = []
+        test_start = max(self.train_days, 2)
+        while test_start < n:
+            test_end = min(test_start + self.test_days, n)
+            train_start = 0 if self.anchored else test_start - self.train_days
+            windows.append((train_start, test_start, test_end))
+            test_start = test_end
+        return windows
+    
+    def run(self, strategy: str, param_grid: Dict[str, List] = None) -> Tuple[List[WalkForwardWindow], BacktestResult]:
+        """執行所有視窗，返回 (各視窗結果, 串接後的樣本外績效)"""
+        windows = self.windows()
+        if not windows:
+            raise ValueError(f"數據只有 {len(self.data)} 天，不足一個訓練視窗 ({self.train_days} 天)")
+        
+        payloads = [(strategy, a, b, c, param_grid, self.bar_interval, self.prune, self.default_search)
+                    for a, b, c in windows]
+        outputs = list(parallel_map(_walk_forward_task, payloads, self.data, self.workers))
+        
+        dates = self.data.index.strftime(date_format(self.bar_interval))
+        results = [
+            WalkForwardWindow(
+                strategy=strategy,
+                train_start=dates[a], train_end=dates[b - 1],
+                test_start=dates[b], test_end=dates[c - 1],
+                params=out['params'],
+                train_score=round(out['train_score'], 2),
+                test_result=out['test_result'],
+            )
+            for (a, b, c), out in zip(windows, outputs)
+        ]
+        
+        # 串接樣本外損益（與單段回測相同的指標定義）
+        first, last = windows[0][1], windows[-1][2]
+        change = self.data['change_pct'].to_numpy(dtype=float)
+        pnls = np.concatenate([out['pnls'] for out in outputs])
+        day_codes = np.concatenate([out['day_codes'] for out in outputs])
+        periods = periods_per_year(self.bar_interval)
+        metrics = {k: v[0] for k, v in path_metrics(pnls, change[first:last], day_codes, periods).items()}
+        close = self.data['close']
+        qqq_return = (close.iloc[last - 1] / close.iloc[first - 1] - 1) * 100
+        oos = rounded_result(f"{strategy} (walk-forward)", {'windows': len(windows)}, metrics, qqq_return)
+        self.oos_cumulative = metrics['cumulative']
+        
+        return results, oos
+
+
+def print_walk_forward(windows: List[WalkForwardWindow], oos: BacktestResult):
+    """列印 walk-forward 各視窗與串接後的樣本外績效"""
+    print(f"\n{'='*60}")
+    print(f"📊 {oos.strategy.upper()} 樣本外驗證")
+    print(f"{'='*60}")
+    print(f"{'測試期間':<25} {'訓練評分':>8} {'報酬':>9} {'Alpha':>9} {'夏普':>7}")
+    print("-" * 60)
+    for w in windows:
+        r = w.test_result
+        print(f"{w.test_start + ' ~ ' + w.test_end:<25} {w.train_score:>8.2f} "
+              f"{r.total_return:>+8.2f}% {r.alpha:>+8.2f}% {r.sharpe_ratio:>7.2f}")
+    print_backtest_result(oos)
+
+
 # ============================================
 # 報表
 # ============================================
@@ -778,10 +1677,176 @@ def print_backtest_result(result: BacktestResult):
     print(f"  • 預測準確率: {result.accuracy:.1f}%")
 
 
+def print_panel_result(panel: PanelResult, top: int = 20):
+    """列印面板回測：依 Alpha 排序的前後各 top 個標的與等權組合"""
+    print(f"\n{'='*60}")
+    print(f"📊 {panel.strategy.upper()} 面板回測 ({len(panel.symbols)} 個標的)")
+    print(f"{'='*60}")
+    print(f"{'標的':<10} {'報酬':>10} {'持有':>10} {'Alpha':>10} {'夏普':>8} {'勝率':>8} {'回撤':>8}")
+    print("-" * 60)
+    
+    ranked = sorted(zip(panel.symbols, panel.results), key=lambda x: x[1].alpha, reverse=True)
+    shown = ranked if len(ranked) <= top * 2 else ranked[:top] + [None] + ranked[-top:]
+    for item in shown:
+        if item is None:
+            print(f"{'...':<10}")
+            continue
+        symbol, r = item
+        print(f"{symbol:<10} {r.total_return:>+9.2f}% {r.qqq_return:>+9.2f}% {r.alpha:>+9.2f}% "
+              f"{r.sharpe_ratio:>7.2f} {r.win_rate:>7.1f}% {r.max_drawdown:>7.2f}%")
+    
+    print("\n🧺 等權組合")
+    print_backtest_result(panel.aggregate)
+
+
 # ============================================
 # 主程式
 # ============================================
 
+def run_panel(args):
+    """以 data/symbols.yaml 的所有標的執行面板回測，列印並（可選）輸出 JSON"""
+    features = DataFetcher.prepare_panel(args.weeks, args.symbols_file, args.prices_dir)
+    if not features:
+        print("❌ 無法取得面板數據")
+        return
+    
+    saved_params = ParamsManager.load()
+    names = ['default', 'ma20'] if args.strategy == 'all' else [args.strategy]
+    engine = PanelBacktestEngine(features)
+    
+    report = {}
+    for name in names:
+        strategy = MA20Strategy(saved_params.get('ma20', {})) if name == 'ma20' else \
+            DefaultStrategy(saved_params.get('default', {}))
+        panel = engine.run(strategy)
+        print_panel_result(panel)
+        report[name] = panel.to_dict()
+    
+    if args.panel_report:
+        with open(args.panel_report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, default=float)
+        print(f"\n💾 面板結果已儲存: {args.panel_report}")
+
+
+def run_robustness(engine: BacktestEngine, strategies: List[Tuple[str, BaseStrategy]], args, save: bool):
+    """對優化後的策略做 block bootstrap / 隨機起始日重抽樣，列印並（可選）寫入參數檔"""
+    print("\n" + "="*60)
+    print(f"🎲 穩健度重抽樣 ({args.paths} 條路徑，平均區塊 {args.block_days} 天)")
+    print("="*60)
+    
+    for name, strategy in strategies:
+        path = engine.daily_path(strategy)
+        summary = robustness_summary(path['pnls'], path['change'][1:], n_paths=args.paths,
+                                     mean_block=args.block_days, workers=args.workers,
+                                     periods=engine.periods_per_year)
+        
+        print(f"\n📊 {name}")
+        print(f"  {'方法':<16} {'指標':<14} {'p05':>9} {'p50':>9} {'p95':>9}")
+        for key in ('block_bootstrap', 'random_start'):
+            for metric in ('sharpe_ratio', 'alpha', 'max_drawdown'):
+                stats = summary[key].get(metric)
+                if stats:
+                    print(f"  {key:<16} {metric:<14} {stats['p05']:>9.2f} {stats['p50']:>9.2f} {stats['p95']:>9.2f}")
+        
+        if save:
+            ParamsManager.attach_robustness(name, summary)
+
+
+def front_path(front: str) -> str:
+    """--front 的值：JSON 檔路徑，或 PARETO_DIR 下的前緣名稱（ma20、default、auto_ma20 ...）"""
+    if front.endswith('.json') or os.path.sep in front:
+        return front
+    return os.path.join(PARETO_DIR, f'{front}.json')
+
+
+def run_front_selection(args, save: bool):
+    """不重跑參數搜索：以 --front-weights 在已保存的 Pareto 前緣上重新挑選參數"""
+    try:
+        weights = pareto.parse_weights(args.front_weights)
+    except ValueError as e:
+        print(f"❌ --front-weights: {e}")
+        return
+    if args.front:
+        fronts = [f.strip() for f in args.front.split(',') if f.strip()]
+    else:
+        fronts = ['ma20', 'default'] if args.strategy == 'all' else [args.strategy]
+    
+    print("\n" + "="*60)
+    print(f"🎯 Pareto 前緣重新挑選: {', '.join(f'{k}={v:+g}' for k, v in weights.items())}")
+    print("="*60)
+    
+    for front in fronts:
+        path = front_path(front)
+        if not os.path.exists(path):
+            print(f"❌ 找不到 Pareto 前緣: {path}（請先以 --pareto 執行優化）")
+            continue
+        doc = pareto.load_front(path)
+        try:
+            best = pareto.select(doc, weights)
+        except ValueError as e:
+            print(f"❌ {path}: 無法挑選 ({e})")
+            continue
+        
+        name = doc['strategy']
+        metrics = best['metrics']
+        print(f"\n🏆 {name}（{path}，前緣 {len(doc['front'])}/{doc['evaluated']} 組，{doc['meta'].get('data_end', '')}）")
+        print(f"  參數: {best['params']}")
+        print(f"  分數: {best['score']:.2f}")
+        print("  " + "  ".join(f"{k}: {metrics[k]}" for k in doc['objectives']))
+        
+        if save:
+            ParamsManager.update_strategy(name, best['params'], metrics, doc['meta'].get('weeks'))
+
+
+def run_walk_forward(data: pd.DataFrame, args):
+    """對 MA20 與 Default 各跑一次 walk-forward，列印並（可選）輸出 JSON"""
+    wf = WalkForwardOptimizer(data, args.train_weeks, args.test_weeks,
+                              anchored=args.anchored, workers=args.workers, bar_interval=args.interval,
+                              prune=args.prune,
+                              default_search={'search': args.search, 'samples': args.samples,
+                                              'resolution': args.resolution})
+    windows = wf.windows()
+    if not windows:
+        print(f"❌ 數據只有 {len(data)} 天，不足一個 {args.train_weeks} 週的訓練視窗，請加大 --weeks")
+        return
+    
+    print("\n" + "="*60)
+    print(f"🔁 Walk-forward 驗證 ({'anchored' if args.anchored else 'rolling'}, "
+          f"訓練 {args.train_weeks} 週 / 測試 {args.test_weeks} 週, {len(windows)} 個視窗)")
+    print("="*60)
+    
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'train_weeks': args.train_weeks,
+        'test_weeks': args.test_weeks,
+        'anchored': args.anchored,
+        'strategies': {}
+    }
+    for name in ('ma20', 'default'):
+        grid = MA20_WIDE_PARAM_GRID if args.wide_grid and name == 'ma20' else None
+        results, oos = wf.run(name, grid)
+        print_walk_forward(results, oos)
+        report['strategies'][name] = {
+            'windows': [
+                {
+                    'train_period': [w.train_start, w.train_end],
+                    'test_period': [w.test_start, w.test_end],
+                    'params': w.params,
+                    'train_score': w.train_score,
+                    'test_metrics': w.test_result.to_dict(),
+                }
+                for w in results
+            ],
+            'oos': oos.to_dict(),
+            'oos_cumulative': [round(float(c), 4) for c in wf.oos_cumulative],
+        }
+    
+    if args.wf_report:
+        with open(args.wf_report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Walk-forward 結果已儲存: {args.wf_report}")
+
+
 def main():
     parser = argparse.ArgumentParser(description='QQQ 策略回測工具 v2.0')
     parser.add_argument('--weeks', type=int, default=10, help='回測週數')
@@ -789,34 +1854,110 @@ def main():
     parser.add_argument('--optimize', action='store_true', help='執行參數優化並自動儲存')
     parser.add_argument('--compare', action='store_true', help='比較所有策略')
     parser.add_argument('--no-save', action='store_true', help='不自動儲存參數')
+    parser.add_argument('--engine', type=str, default='vector', choices=['vector', 'loop'],
+                        help='回測引擎 (vector: 向量化, loop: 逐日迴圈)')
+    parser.add_argument('--wide-grid', action='store_true', help='MA20 優化使用加密參數網格')
+    parser.add_argument('--prune', action='store_true', help='優化時逐段評估，剪掉評分上界已無法勝出的組合')
+    parser.add_argument('--workers', type=int, default=1, help='優化使用的進程數 (0 = 全部 CPU)')
+    parser.add_argument('--offline', action='store_true', help='只使用本地行情快取，不連網')
+    parser.add_argument('--interval', type=str, default='1d', choices=list(BAR_MINUTES),
+                        help='K 線週期 (1d, 1h, 30m, 15m, 5m, 1m)；盤中週期從 BAR_STORE_DIR 逐段讀取')
+    parser.add_argument('--no-result-cache', action='store_true', help='不讀寫回測結果快取')
+    parser.add_argument('--search', type=str, default='sets', choices=['sets', 'halving', 'simplex'],
+                        help='Default 權重搜索 (sets: 固定權重組, halving: 細格點 successive halving, '
+                             'simplex: 完整列舉格點權重)')
+    parser.add_argument('--samples', type=int, default=243, help='halving 搜索的取樣權重組數')
+    parser.add_argument('--resolution', type=float, default=None,
+                        help='權重格點 (halving 預設 0.01, simplex 預設 0.05)')
+    parser.add_argument('--robustness', action='store_true',
+                        help='搭配 --optimize：以重抽樣估計夏普 / Alpha / 回撤的分布並寫入 backtest_result')
+    parser.add_argument('--paths', type=int, default=2000, help='重抽樣路徑數')
+    parser.add_argument('--block-days', type=float, default=10, help='block bootstrap 平均區塊長度（交易日）')
+    parser.add_argument('--walk-forward', action='store_true',
+                        help='搭配 --optimize：以滾動視窗做樣本外驗證（不儲存參數；各視窗依 --search / --prune 選參數）')
+    parser.add_argument('--train-weeks', type=int, default=26, help='walk-forward 訓練視窗週數')
+    parser.add_argument('--test-weeks', type=int, default=4, help='walk-forward 測試視窗週數')
+    parser.add_argument('--anchored', action='store_true', help='walk-forward 訓練視窗固定從頭開始')
+    parser.add_argument('--wf-report', type=str, default=None, help='walk-forward 結果輸出 JSON 路徑')
+    parser.add_argument('--pareto', action='store_true',
+                        help='優化時另存 Alpha / 夏普 / 最大回撤 / 準確率的 Pareto 前緣 (data/pareto/{策略}.json)')
+    parser.add_argument('--front-weights', type=str, default=None,
+                        help='不重跑搜索，以新權重在已保存的前緣上挑選參數，例如 alpha=0.4,sharpe_ratio=0.4,max_drawdown=-0.2')
+    parser.add_argument('--front', type=str, default=None,
+                        help='--front-weights 使用的前緣（名稱或 JSON 路徑，逗號分隔），例如 auto_ma20,auto_default；預設依 --strategy')
+    parser.add_argument('--panel', action='store_true', help='多標的面板回測 (標的清單見 --symbols-file)')
+    parser.add_argument('--symbols-file', type=str, default=SYMBOLS_FILE, help='面板回測的標的清單 YAML')
+    parser.add_argument('--prices-dir', type=str, default=PRICES_DIR, help='面板回測的日線 CSV 目錄')
+    parser.add_argument('--panel-report', type=str, default=None, help='面板回測結果輸出 JSON 路徑')
     args = parser.parse_args()
+    if args.pareto and args.prune:
+        parser.error('--pareto 需要所有組合的完整績效，不能與 --prune 同時使用')
+    if args.pareto and args.walk_forward:
+        parser.error('--walk-forward 每個視窗各自選參數，沒有單一的 Pareto 前緣，不能與 --pareto 同時使用')
     
     print("\n" + "="*60)
     print("🔬 QQQ 策略回測工具 v2.0")
     print("="*60)
     
+    DataFetcher.offline = args.offline
+    
+    # 在已保存的 Pareto 前緣上重新挑選（不需要行情數據）
+    if args.front_weights:
+        run_front_selection(args, save=not args.no_save)
+        return
+    
+    # 多標的面板回測
+    if args.panel:
+        run_panel(args)
+        return
+    
     # 抓取數據
-    data = DataFetcher.prepare_data(args.weeks)
+    if is_intraday(args.interval):
+        data = DataFetcher.prepare_intraday(args.weeks, args.interval)
+    else:
+        data = DataFetcher.prepare_data(args.weeks)
     if data.empty:
         print("❌ 無法取得數據")
         return
     
-    engine = BacktestEngine(data)
+    result_cache = None if args.no_result_cache else ResultCache(RESULT_CACHE_PATH)
+    engine = BacktestEngine(data, vectorized=args.engine == 'vector', record_daily=False,
+                            result_cache=result_cache, bar_interval=args.interval)
     auto_save = not args.no_save
     
+    # Walk-forward 驗證
+    if args.optimize and args.walk_forward:
+        run_walk_forward(data, args)
+        return
+    
     # 參數優化
     if args.optimize:
-        optimizer = ParameterOptimizer(data, args.weeks)
+        optimizer = ParameterOptimizer(data, args.weeks, workers=args.workers, result_cache=result_cache,
+                                       prune=args.prune, bar_interval=args.interval,
+                                       pareto_dir=PARETO_DIR if args.pareto else None)
         
         print("\n" + "="*60)
         print("🔧 開始參數優化")
         print("="*60)
         
         # 優化 MA20
-        ma20_params, ma20_result = optimizer.optimize_ma20(auto_save=auto_save)
+        ma20_params, ma20_result = optimizer.optimize_ma20(
+            auto_save=auto_save,
+            param_grid=MA20_WIDE_PARAM_GRID if args.wide_grid else None,
+            grid_mode=args.engine == 'vector'
+        )
         
         # 優化 Default
-        default_params, default_result = optimizer.optimize_default(auto_save=auto_save)
+        default_params, default_result = optimizer.optimize_default(
+            auto_save=auto_save,
+            search=args.search,
+            samples=args.samples,
+            resolution=args.resolution
+        )
+        
+        if args.robustness:
+            run_robustness(engine, [('ma20', MA20Strategy(ma20_params)), ('default', DefaultStrategy(default_params))],
+                           args, save=auto_save)
         
         # 顯示最終參數檔
         print("\n" + "="*60)
@@ -18,30 +18,46 @@ from typing import Dict, List, Tuple, Any
 from itertools import product
 import yfinance as yf
 
+from src.backtester import kernel, pareto
+from src.backtester.features import day_records, streak_lengths
+from src.backtester.kernel import TRADE_DTYPE
+from src.backtester.parallel import parallel_map
+
+# 保存優化結果時計算 Pareto 前緣的目標（max_drawdown 為負值百分比，越接近 0 越好）
+PARETO_OBJECTIVES = {'alpha': 1, 'sharpe_ratio': 1, 'max_drawdown': 1}
+
 
 # ============================================
 # 回測引擎
 # ============================================
 
 class Backtester:
-    """回測引擎"""
+    """回測引擎（整數股成交，模擬與指標由 src.backtester.kernel 計算）"""
     
-    def __init__(self, initial_capital: float = 10_000_000):
+    def __init__(self, initial_capital: float = 10_000_000, record_history: bool = True):
         self.initial_capital = initial_capital
+        self.record_history = record_history  # False 時不保留現金 / 股數序列與交易明細（參數搜尋用）
         self.reset()
     
     def reset(self):
         """重置回測狀態"""
         self.cash = self.initial_capital
         self.shares = 0
-        self.nav_history = []
-        self.trades = []
-        self.daily_returns = []
+        self.dates = pd.DatetimeIndex([])
+        self.prices = np.empty(0)
+        self.nav = np.empty(0)
+        self.cash_series = np.empty(0)
+        self.shares_series = np.empty(0, dtype=np.int64)
+        self.ledger = np.empty(0, dtype=TRADE_DTYPE)
+        self.trade_count = 0
     
     def run(self, prices: pd.DataFrame, signals: pd.Series) -> Dict:
         """
         執行回測
         
+        價格與配置轉成 NumPy 陣列後交給 kernel.share_fill（整數股、現金不足不買）；
+        record_history 時另保留每日現金 / 股數與交易明細。
+        
         Args:
             prices: DataFrame with 'Close' column
             signals: Series with allocation percentages (0-100)
@@ -50,119 +66,194 @@ class Backtester:
             績效統計字典
         """
         self.reset()
+        close = _single_column(prices, 'Close').to_numpy(dtype=float)
+        target = np.asarray(signals, dtype=float)[:len(close)] / 100
+        fill = kernel.share_fill(close, target, self.initial_capital, record=self.record_history)
         
-        for i in range(len(prices)):
-            date = prices.index[i]
-            price = prices['Close'].iloc[i]
-            target_pct = signals.iloc[i] / 100
-            
-            # 計算目標持倉
-            total_value = self.cash + self.shares * price
-            target_value = total_value * target_pct
-            target_shares = int(target_value / price)
-            
-            # 交易
-            if target_shares > self.shares:
-                # 買入
-                shares_to_buy = target_shares - self.shares
-                cost = shares_to_buy * price
-                if cost <= self.cash:
-                    self.shares += shares_to_buy
-                    self.cash -= cost
-                    self.trades.append({
-                        'date': date,
-                        'action': 'BUY',
-                        'shares': shares_to_buy,
-                        'price': price,
-                        'value': cost
-                    })
-            elif target_shares < self.shares:
-                # 賣出
-                shares_to_sell = self.shares - target_shares
-                proceeds = shares_to_sell * price
-                self.shares -= shares_to_sell
-                self.cash += proceeds
-                self.trades.append({
-                    'date': date,
-                    'action': 'SELL',
-                    'shares': shares_to_sell,
-                    'price': price,
-                    'value': proceeds
-                })
-            
-            # 記錄 NAV
-            nav = self.cash + self.shares * price
-            self.nav_history.append({
-                'date': date,
-                'nav': nav,
-                'cash': self.cash,
-                'shares': self.shares,
-                'price': price
-            })
-            
-            # 記錄每日報酬
-            if i > 0:
-                prev_nav = self.nav_history[i-1]['nav']
-                daily_return = (nav - prev_nav) / prev_nav
-                self.daily_returns.append(daily_return)
+        self.nav = fill['nav']
+        self.cash, self.shares = fill['cash'], fill['shares']
+        self.trade_count = fill['trades']
+        if self.record_history:
+            self.dates = prices.index[:len(self.nav)]
+            self.prices = close[:len(self.nav)]
+            self.cash_series = fill['cash_series']
+            self.shares_series = fill['shares_series']
+            self.ledger = fill['ledger']
         
         return self.calculate_metrics(prices)
     
+    @property
+    def daily_returns(self) -> np.ndarray:
+        """逐日報酬（第 1 天起）"""
+        return kernel.level_returns(self.nav)
+    
+    @property
+    def nav_history(self) -> List[Dict]:
+        """逐日 NAV 明細（list of dict，與舊介面相容）"""
+        return self.nav_frame().reset_index().to_dict('records')
+    
+    @property
+    def trades(self) -> List[Dict]:
+        """交易明細（list of dict，與舊介面相容）"""
+        return self.trade_frame().reset_index().to_dict('records')
+    
+    def nav_frame(self) -> pd.DataFrame:
+        """逐日 NAV / 現金 / 股數 / 價格（以日期為索引）"""
+        return pd.DataFrame({
+            'nav': self.nav, 'cash': self.cash_series, 'shares': self.shares_series, 'price': self.prices,
+        }, index=pd.Index(self.dates, name='date'), copy=False)
+    
+    def trade_frame(self) -> pd.DataFrame:
+        """交易明細（以成交日期為索引）"""
+        ledger = self.ledger
+        return pd.DataFrame({
+            'action': ledger['action'], 'shares': ledger['shares'],
+            'price': ledger['price'], 'value': ledger['value'],
+        }, index=pd.Index(self.dates[ledger['row']], name='date'))
+    
     def calculate_metrics(self, prices: pd.DataFrame) -> Dict:
         """計算績效指標"""
-        if not self.nav_history:
+        if not len(self.nav):
             return {}
         
-        nav_df = pd.DataFrame(self.nav_history)
-        nav_df.set_index('date', inplace=True)
-        
-        final_nav = nav_df['nav'].iloc[-1]
+        final_nav = float(self.nav[-1])
         total_return = (final_nav - self.initial_capital) / self.initial_capital * 100
         
         # 基準報酬（Buy & Hold）
-        benchmark_return = (prices['Close'].iloc[-1] - prices['Close'].iloc[0]) / prices['Close'].iloc[0] * 100
+        close = _single_column(prices, 'Close')
+        benchmark_return = (close.iloc[-1] - close.iloc[0]) / close.iloc[0] * 100
         
         # Alpha
         alpha = total_return - benchmark_return
         
-        # 最大回撤
-        nav_series = nav_df['nav']
-        cummax = nav_series.cummax()
-        drawdown = (nav_series - cummax) / cummax * 100
-        max_drawdown = drawdown.min()
-        
-        # Sharpe Ratio (假設無風險利率 = 0)
-        if self.daily_returns:
-            returns_std = np.std(self.daily_returns)
-            sharpe = (np.mean(self.daily_returns) / returns_std * np.sqrt(252)) if returns_std > 0 else 0
-        else:
-            sharpe = 0
-        
-        # 勝率
-        wins = sum(1 for r in self.daily_returns if r > 0)
-        win_rate = wins / len(self.daily_returns) * 100 if self.daily_returns else 0
-        
-        # 盈虧比
-        profits = [r for r in self.daily_returns if r > 0]
-        losses = [abs(r) for r in self.daily_returns if r < 0]
-        avg_profit = np.mean(profits) if profits else 0
-        avg_loss = np.mean(losses) if losses else 1
-        profit_loss_ratio = avg_profit / avg_loss if avg_loss > 0 else 0
+        # 最大回撤（負值百分比；沒有回撤時為 0.0 而非 -0.0）
+        max_drawdown = -abs(float(kernel.max_drawdown(self.nav, relative=True)[0])) * 100 + 0.0
+        
+        # Sharpe / 勝率 / 盈虧比（逐日報酬，假設無風險利率 = 0）
+        stats = {k: float(v[0]) for k, v in kernel.return_stats(self.daily_returns).items()}
         
         return {
             'total_return': round(total_return, 2),
             'benchmark_return': round(benchmark_return, 2),
             'alpha': round(alpha, 2),
             'max_drawdown': round(max_drawdown, 2),
-            'sharpe_ratio': round(sharpe, 2),
-            'win_rate': round(win_rate, 1),
-            'profit_loss_ratio': round(profit_loss_ratio, 2),
-            'total_trades': len(self.trades),
+            'sharpe_ratio': round(stats['sharpe_ratio'], 2),
+            'win_rate': round(stats['win_rate'], 1),
+            'profit_loss_ratio': round(stats['profit_loss_ratio'], 2),
+            'total_trades': self.trade_count,
             'final_nav': round(final_nav, 2),
-            'days': len(self.nav_history)
+            'days': len(self.nav)
         }
 
 
+# ============================================
+# 信號生成
+# ============================================
+
+def market_matrix(prices: pd.DataFrame, market_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    一次算好逐日評分所需的所有輸入，每個欄位為與 prices 對齊的陣列
+    
+    技術指標與 qqq_analyzer.TechnicalAnalyzer 相同的定義（ma20 乖離四捨五入到 0.01、
+    連續站上 / 跌破天數最多回看 5 天、量比為當日 / 20 日均量）；欄位名稱與
+    backtest.DataFetcher.build_features 相同，可直接交給策略的 score_batch。
+    market_data 可含 VIX 與 US10Y（殖利率水準），依列位置對齊。
+    """
+    close = _single_column(prices, 'Close').astype(float)
+    n = len(close)
+    m = pd.DataFrame(index=prices.index)
+    m['close'] = close.to_numpy()
+    m['change_pct'] = (close.pct_change() * 100).fillna(0).to_numpy()
+    
+    ma20 = close.rolling(20).mean()
+    m['ma20'] = ma20.fillna(close).to_numpy()
+    m['ma20_diff_pct'] = ((close - ma20) / ma20 * 100).round(2).fillna(0).to_numpy()
+    days_above, days_below = streak_lengths((close > ma20).where(ma20.notna()))
+    m['days_above_ma20'] = np.minimum(days_above, 5).astype(float)
+    m['days_below_ma20'] = np.minimum(days_below, 5).astype(float)
+    
+    if 'Volume' in prices.columns:
+        volume = _single_column(prices, 'Volume').astype(float)
+        avg = volume.rolling(20).mean()
+        m['volume_ratio'] = (volume / avg).round(2).where(avg > 0, 1.0).fillna(1.0).to_numpy()
+    else:
+        m['volume_ratio'] = 1.0
+    
+    def market(name: str) -> np.ndarray:
+        return _single_column(market_data, name).to_numpy(dtype=float)[:n]
+    
+    m['vix'] = market('VIX') if 'VIX' in market_data.columns else 20.0
+    if 'US10Y' in market_data.columns:
+        m['us10y_change'] = np.nan_to_num(np.round(np.diff(market('US10Y'), prepend=np.nan), 3))
+    else:
+        m['us10y_change'] = 0.0
+    return m
+
+
+def generate_signals(strategy, prices: pd.DataFrame, market_data: pd.DataFrame = None,
+                     matrix: pd.DataFrame = None) -> pd.Series:
+    """
+    評分並轉換為 QQQ 配置比例
+    
+    逐日輸入由 market_matrix 一次算好（可傳入已算好的 matrix）；策略有 score_batch / allocation_batch 時整批評分，
+    否則以矩陣逐列組出 day_data 呼叫 score。
+    """
+    if matrix is None:
+        matrix = market_matrix(prices, market_data)
+    score_batch = getattr(strategy, 'score_batch', None)
+    allocation_batch = getattr(strategy, 'allocation_batch', None)
+    if score_batch is not None and allocation_batch is not None:
+        try:
+            return pd.Series(allocation_batch(score_batch(matrix)['total_score']), index=prices.index)
+        except NotImplementedError:
+            pass
+    allocations = [
+        strategy.get_allocation(strategy.score(day)['total_score'])['qqq_pct']
+        for day in day_records(matrix)
+    ]
+    return pd.Series(allocations, index=prices.index)
+
+
+def params_signals(strategy_class, params: Dict, prices: pd.DataFrame,
+                   market_data: pd.DataFrame, initial_capital: float) -> pd.Series:
+    """以一組參數建立策略並生成配置信號"""
+    strategy = strategy_class(config={'capital': initial_capital})
+    strategy.load_params(params)
+    return generate_signals(strategy, prices, market_data)
+
+
+def evaluate_params(strategy_class, params: Dict, prices: pd.DataFrame,
+                    market_data: pd.DataFrame, initial_capital: float) -> Dict:
+    """以一組參數建立策略、生成信號並回測"""
+    signals = params_signals(strategy_class, params, prices, market_data, initial_capital)
+    
+    backtester = Backtester(initial_capital, record_history=False)
+    return backtester.run(prices, signals)
+
+
+def _single_column(frame: pd.DataFrame, name: str) -> pd.Series:
+    """取出欄位（yfinance 多層欄位時取第一個 ticker）"""
+    column = frame[name]
+    if isinstance(column, pd.DataFrame):
+        column = column.iloc[:, 0]
+    return column
+
+
+def _signals_task(matrix: pd.DataFrame, payload: Tuple) -> np.ndarray:
+    """工作進程任務：生成一組參數的配置序列（matrix 為 market_matrix 的結果）"""
+    strategy_class, params, initial_capital = payload
+    strategy = strategy_class(config={'capital': initial_capital})
+    strategy.load_params(params)
+    return generate_signals(strategy, matrix, matrix=matrix).to_numpy(dtype=float)
+
+
+def _simulate_task(matrix: pd.DataFrame, payload: Tuple) -> Dict:
+    """工作進程任務：以一條配置序列回測"""
+    signals, initial_capital = payload
+    prices = pd.DataFrame({'Close': matrix['close']}, index=matrix.index)
+    return Backtester(initial_capital, record_history=False).run(prices, pd.Series(signals, index=matrix.index))
+
+
 # ============================================
 # 參數優化器
 # ============================================
@@ -187,7 +278,7 @@ class ParameterOptimizer:
         return grid
     
     def optimize(self, prices: pd.DataFrame, market_data: pd.DataFrame, 
-                 param_ranges: Dict, metric: str = 'sharpe_ratio') -> Tuple[Dict, List]:
+                 param_ranges: Dict, metric: str = 'sharpe_ratio', workers: int = 1) -> Tuple[Dict, List]:
         """
         執行參數優化
         
@@ -196,6 +287,7 @@ class ParameterOptimizer:
             market_data: 市場數據（包含 VIX, 技術指標等）
             param_ranges: 參數範圍，例如 {'days_threshold': [1, 2, 3], 'vix_limit': [30, 35, 40]}
             metric: 優化目標指標
+            workers: 進程數（1 = 單進程，0 = 全部 CPU）
         
         Returns:
             (最佳參數, 所有結果)
@@ -208,30 +300,29 @@ class ParameterOptimizer:
         
         self.results = []
         
-        for i, params in enumerate(param_grid, 1):
-            # 創建策略實例
-            strategy = self.strategy_class(config={'capital': self.initial_capital})
-            strategy.load_params(params)
-            
-            # 生成信號
-            signals = []
-            for idx in range(len(prices)):
-                # 構建當日市場數據
-                day_data = {
-                    'qqq': {'close': prices['Close'].iloc[idx]},
-                    'vix': {'value': market_data['VIX'].iloc[idx] if 'VIX' in market_data.columns else 20},
-                    'technicals': {}
-                }
-                
-                # 計算評分
-                score_result = strategy.score(day_data)
-                allocation = strategy.get_allocation(score_result['total_score'])
-                signals.append(allocation['qqq_pct'])
-            
-            # 回測
-            backtester = Backtester(self.initial_capital)
-            metrics = backtester.run(prices, pd.Series(signals, index=prices.index))
-            
+        # 所有參數組合共用的逐日輸入只算一次，放進共享數據
+        frame = market_matrix(prices, market_data)
+        
+        payloads = [(self.strategy_class, params, self.initial_capital) for params in param_grid]
+        all_signals = list(parallel_map(_signals_task, payloads, frame, workers))
+        
+        # 分數經配置階梯量化後，許多參數組合產生相同的配置序列：每種序列只回測一次
+        unique: Dict[bytes, int] = {}
+        distinct: List[np.ndarray] = []
+        series_of = []
+        for signals in all_signals:
+            key = signals.tobytes()
+            if key not in unique:
+                unique[key] = len(distinct)
+                distinct.append(signals)
+            series_of.append(unique[key])
+        print(f"   不重複配置序列: {len(distinct)}/{len(param_grid)}")
+        
+        simulated = list(parallel_map(_simulate_task, [(signals, self.initial_capital) for signals in distinct],
+                                      frame, workers))
+        all_metrics = [dict(simulated[k]) for k in series_of]
+        
+        for i, (params, metrics) in enumerate(zip(param_grid, all_metrics), 1):
             result = {
                 'params': params,
                 'metrics': metrics,
@@ -252,14 +343,22 @@ class ParameterOptimizer:
         
         return best_result['params'], self.results
     
+    def pareto_front(self) -> Dict:
+        """所有組合在 PARETO_OBJECTIVES 上的非支配前緣（之後可用 pareto.select 以新權重重新挑選）"""
+        return pareto.front_document(
+            self.strategy_class.__name__, [r['params'] for r in self.results],
+            pareto.metric_columns([r['metrics'] for r in self.results]), PARETO_OBJECTIVES
+        )
+    
     def save_results(self, filename: str = 'optimization_results.json'):
-        """保存優化結果"""
+        """保存優化結果（前 20 名與完整的 Pareto 前緣）"""
         output = {
             'timestamp': datetime.now().isoformat(),
             'total_combinations': len(self.results),
             'best_params': self.results[0]['params'] if self.results else {},
             'best_metrics': self.results[0]['metrics'] if self.results else {},
-            'all_results': self.results[:20]  # 只保存前20名
+            'all_results': self.results[:20],  # 只保存前20名
+            'pareto_front': self.pareto_front()
         }
         
         with open(filename, 'w', encoding='utf-8') as f:
@@ -286,25 +385,16 @@ class StrategyComparator:
         print(f"   策略數量: {len(self.strategies)}")
         print(f"   回測天數: {len(prices)}")
         
+        matrix = market_matrix(prices, market_data)
         for name, strategy in self.strategies.items():
             print(f"\n   測試策略: {name}")
             
             # 生成信號
-            signals = []
-            for idx in range(len(prices)):
-                day_data = {
-                    'qqq': {'close': prices['Close'].iloc[idx]},
-                    'vix': {'value': market_data['VIX'].iloc[idx] if 'VIX' in market_data.columns else 20},
-                    'technicals': {}
-                }
-                
-                score_result = strategy.score(day_data)
-                allocation = strategy.get_allocation(score_result['total_score'])
-                signals.append(allocation['qqq_pct'])
+            signals = generate_signals(strategy, prices, matrix=matrix)
             
             # 回測
             backtester = Backtester(self.initial_capital)
-            metrics = backtester.run(prices, pd.Series(signals, index=prices.index))
+            metrics = backtester.run(prices, signals)
             
             self.comparison_results[name] = metrics
         
@@ -336,7 +426,7 @@ class StrategyComparator:
 # 主執行函數
 # ============================================
 
-def run_optimization_example():
+def run_optimization_example(workers: int = 1):
     """執行優化示例"""
     from qqq_analyzer import MA20Strategy, DefaultStrategy
     
@@ -348,9 +438,11 @@ def run_optimization_example():
     print("\n📥 下載歷史數據...")
     qqq = yf.download('QQQ', period='6mo', progress=False)
     vix = yf.download('^VIX', period='6mo', progress=False)
+    tnx = yf.download('^TNX', period='6mo', progress=False)
     
     market_data = pd.DataFrame({
-        'VIX': vix['Close']
+        'VIX': _single_column(vix, 'Close').reindex(qqq.index, method='ffill'),
+        'US10Y': _single_column(tnx, 'Close').reindex(qqq.index, method='ffill'),
     }, index=qqq.index)
     
     print(f"   ✓ 獲取 {len(qqq)} 天數據")
@@ -371,7 +463,8 @@ def run_optimization_example():
         qqq, 
         market_data, 
         param_ranges, 
-        metric='sharpe_ratio'
+        metric='sharpe_ratio',
+        workers=workers
     )
     
     optimizer.save_results('ma20_optimization.json')
@@ -415,4 +508,10 @@ def run_optimization_example():
 
 
 if __name__ == "__main__":
-    run_optimization_example()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='QQQ 參數優化系統')
+    parser.add_argument('--workers', type=int, default=1, help='優化使用的進程數 (0 = 全部 CPU)')
+    args = parser.parse_args()
+    
+    run_optimization_example(workers=args.workers)
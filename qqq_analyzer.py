@@ -29,6 +29,10 @@ import pandas as pd
 import numpy as np
 import requests
 
+from src.backtester import scoring
+from src.backtester.features import streak_lengths
+from src.backtester.fetch import fetch_concurrent
+
 
 # ============================================
 # 設定
@@ -121,10 +125,22 @@ class ParamsManager:
 # ============================================
 
 class MarketDataFetcher:
+    # 每日分析需要的報價；QQQ 直接抓 3 個月，技術分析重用同一份歷史
+    QUOTE_PERIODS = {"QQQ": "3mo", "^VIX": "5d", "^TNX": "5d", "^IRX": "5d", "DX-Y.NYB": "5d"}
+    histories: Dict[str, pd.DataFrame] = {}
+    
     @staticmethod
     def fetch_quote(ticker: str) -> Dict[str, Any]:
         try:
             hist = yf.Ticker(ticker).history(period="5d")
+        except Exception as e:
+            return {"ticker": ticker, "success": False, "error": str(e)}
+        return MarketDataFetcher.quote_from_history(ticker, hist)
+    
+    @staticmethod
+    def quote_from_history(ticker: str, hist: pd.DataFrame) -> Dict[str, Any]:
+        """由日線歷史取最後兩根 K 線組成報價"""
+        try:
             if hist.empty:
                 return {"ticker": ticker, "success": False, "error": "No data"}
             latest = hist.iloc[-1]
@@ -142,24 +158,35 @@ class MarketDataFetcher:
         except Exception as e:
             return {"ticker": ticker, "success": False, "error": str(e)}
     
-    @staticmethod
-    def fetch_all() -> Dict[str, Any]:
+    @classmethod
+    def fetch_histories(cls) -> Dict[str, pd.DataFrame]:
+        """同時抓取所有報價 ticker 的日線，保留給技術分析重用"""
+        cls.histories = fetch_concurrent(
+            list(cls.QUOTE_PERIODS),
+            lambda ticker: yf.Ticker(ticker).history(period=cls.QUOTE_PERIODS[ticker]),
+        )
+        return cls.histories
+    
+    @classmethod
+    def fetch_all(cls) -> Dict[str, Any]:
         print("📊 抓取市場數據...")
+        histories = cls.fetch_histories()
+        quotes = {ticker: cls.quote_from_history(ticker, hist) for ticker, hist in histories.items()}
         data = {}
         
-        data['qqq'] = MarketDataFetcher.fetch_quote("QQQ")
+        data['qqq'] = quotes["QQQ"]
         if data['qqq']['success']:
             print(f"  ✓ QQQ: ${data['qqq']['close']} ({data['qqq']['change_pct']:+.2f}%)")
         
-        vix = MarketDataFetcher.fetch_quote("^VIX")
+        vix = quotes["^VIX"]
         data['vix'] = {"value": vix.get('close', 20), "change_pct": vix.get('change_pct', 0)}
         print(f"  ✓ VIX: {data['vix']['value']:.2f}")
         
-        tnx = MarketDataFetcher.fetch_quote("^TNX")
+        tnx = quotes["^TNX"]
         data['us10y'] = {"value": tnx.get('close', 4.5), "change": round(tnx.get('close', 4.5) - tnx.get('prev_close', 4.5), 3)}
         
-        data['us2y'] = {"value": MarketDataFetcher.fetch_quote("^IRX").get('close', 4.3)}
-        data['dxy'] = {"value": MarketDataFetcher.fetch_quote("DX-Y.NYB").get('close', 108)}
+        data['us2y'] = {"value": quotes["^IRX"].get('close', 4.3)}
+        data['dxy'] = {"value": quotes["DX-Y.NYB"].get('close', 108)}
         
         return data
 
@@ -170,9 +197,10 @@ class MarketDataFetcher:
 
 class TechnicalAnalyzer:
     @staticmethod
-    def analyze(ticker: str, close: float) -> Dict[str, Any]:
+    def analyze(ticker: str, close: float, history: pd.DataFrame = None) -> Dict[str, Any]:
+        """history 為已抓取的 3 個月日線；未提供時自行抓取"""
         try:
-            df = yf.Ticker(ticker).history(period="3mo")
+            df = history if history is not None and not history.empty else yf.Ticker(ticker).history(period="3mo")
             if df.empty:
                 return {}
         except:
@@ -208,28 +236,12 @@ class TechnicalAnalyzer:
         
         if len(df) >= 20 and 'ma20' in result:
             ma20_series = df['Close'].rolling(20).mean()
-            closes = df['Close']
-            
-            days_above = 0
-            days_below = 0
+            above = (df['Close'] > ma20_series).where(ma20_series.notna())
+            days_above, days_below = streak_lengths(above)
             
-            for i in range(1, min(6, len(df))):
-                idx = -i
-                if pd.isna(ma20_series.iloc[idx]):
-                    break
-                if closes.iloc[idx] > ma20_series.iloc[idx]:
-                    if days_below == 0:
-                        days_above += 1
-                    else:
-                        break
-                else:
-                    if days_above == 0:
-                        days_below += 1
-                    else:
-                        break
-            
-            result['consecutive_days_above_ma20'] = days_above
-            result['consecutive_days_below_ma20'] = days_below
+            # 只回看最近 5 天
+            result['consecutive_days_above_ma20'] = int(min(days_above[-1], 5))
+            result['consecutive_days_below_ma20'] = int(min(days_below[-1], 5))
         
         return result
 
@@ -256,10 +268,37 @@ class BaseStrategy(ABC):
     def score(self, data: Dict[str, Any]) -> Dict[str, Any]:
         pass
     
+    def score_batch(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """整批評分（欄位同 backtest.DataFetcher.prepare_data），返回陣列版的評分結果"""
+        raise NotImplementedError
+    
+    @staticmethod
+    def score_frame(data: Dict[str, Any]) -> pd.DataFrame:
+        """score() 的巢狀市場資料轉成一列的特徵表（缺少的欄位由 score_batch 套用與 score() 相同的預設值）"""
+        qqq = data.get('qqq', {})
+        technicals = data.get('technicals', {})
+        values = {
+            'close': qqq.get('close'), 'change_pct': qqq.get('change_pct'),
+            'volume_ratio': technicals.get('volume_ratio'), 'ma20': technicals.get('ma20'),
+            'ma20_diff_pct': technicals.get('ma20_diff_pct'),
+            'days_above_ma20': technicals.get('consecutive_days_above_ma20'),
+            'days_below_ma20': technicals.get('consecutive_days_below_ma20'),
+            'vix': data.get('vix', {}).get('value'), 'us10y_change': data.get('us10y', {}).get('change'),
+        }
+        return pd.DataFrame({k: [float(v)] for k, v in values.items() if v is not None})
+    
     @abstractmethod
     def get_allocation(self, score: float, risk_pref: str = 'neutral') -> Dict[str, Any]:
         pass
     
+    # get_allocation 的配置階梯（子類別設定），供 allocation_batch 查表
+    allocation_table: List[int] = None
+    
+    def allocation_batch(self, scores, risk_pref: str = 'neutral') -> np.ndarray:
+        """get_allocation 的陣列版本，返回每個分數的 qqq_pct"""
+        adj = np.asarray(scores, dtype=float) + {'conservative': -1, 'aggressive': 1}.get(risk_pref, 0)
+        return scoring.allocation_lookup(adj, self.allocation_table)
+    
     def get_regime(self, score: float) -> str:
         if score <= 3.5:
             return 'defense'
@@ -276,6 +315,7 @@ class DefaultStrategy(BaseStrategy):
     name = "default"
     version = "5.0"
     description = "多因子動能策略（自動優化）"
+    allocation_table = scoring.DEFAULT_ALLOCATION
     
     def load_params(self, params: Dict):
         default_weights = {"price_momentum": 0.30, "volume": 0.20, "vix": 0.20, "bond": 0.15, "mag7": 0.15}
@@ -283,57 +323,11 @@ class DefaultStrategy(BaseStrategy):
         print(f"  📊 Default 策略權重: {self.weights}")
     
     def score(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        change = data.get('qqq', {}).get('change_pct', 0)
-        vol_ratio = data.get('technicals', {}).get('volume_ratio', 1.0)
-        vix = data.get('vix', {}).get('value', 20)
-        bond_change = data.get('us10y', {}).get('change', 0)
-        
-        factor_scores = {}
-        
-        if change > 2.0: factor_scores['price_momentum'] = {"score": 9, "direction": "bullish"}
-        elif change > 1.0: factor_scores['price_momentum'] = {"score": 8, "direction": "bullish"}
-        elif change > 0.5: factor_scores['price_momentum'] = {"score": 7, "direction": "bullish"}
-        elif change > 0: factor_scores['price_momentum'] = {"score": 6, "direction": "neutral"}
-        elif change > -0.5: factor_scores['price_momentum'] = {"score": 5, "direction": "neutral"}
-        elif change > -1.0: factor_scores['price_momentum'] = {"score": 4, "direction": "bearish"}
-        elif change > -2.0: factor_scores['price_momentum'] = {"score": 3, "direction": "bearish"}
-        else: factor_scores['price_momentum'] = {"score": 2, "direction": "bearish"}
-        
-        if vol_ratio > 1.5 and change > 0: factor_scores['volume'] = {"score": 9, "direction": "confirm"}
-        elif vol_ratio > 1.2 and change > 0: factor_scores['volume'] = {"score": 8, "direction": "confirm"}
-        elif vol_ratio < 0.7 and change > 0: factor_scores['volume'] = {"score": 4, "direction": "diverge"}
-        elif vol_ratio > 1.5 and change < 0: factor_scores['volume'] = {"score": 2, "direction": "confirm"}
-        elif vol_ratio > 1.2 and change < 0: factor_scores['volume'] = {"score": 3, "direction": "confirm"}
-        elif vol_ratio < 0.7 and change < 0: factor_scores['volume'] = {"score": 6, "direction": "diverge"}
-        else: factor_scores['volume'] = {"score": 5, "direction": "neutral"}
-        
-        if vix < 12: factor_scores['vix'] = {"score": 9, "direction": "favorable"}
-        elif vix < 15: factor_scores['vix'] = {"score": 8, "direction": "favorable"}
-        elif vix < 18: factor_scores['vix'] = {"score": 7, "direction": "favorable"}
-        elif vix < 22: factor_scores['vix'] = {"score": 5, "direction": "neutral"}
-        elif vix < 28: factor_scores['vix'] = {"score": 4, "direction": "unfavorable"}
-        elif vix < 35: factor_scores['vix'] = {"score": 3, "direction": "unfavorable"}
-        else: factor_scores['vix'] = {"score": 1, "direction": "unfavorable"}
-        
-        if bond_change > 0.08: factor_scores['bond'] = {"score": 2, "direction": "unfavorable"}
-        elif bond_change > 0.05: factor_scores['bond'] = {"score": 3, "direction": "unfavorable"}
-        elif bond_change > 0.02: factor_scores['bond'] = {"score": 4, "direction": "unfavorable"}
-        elif bond_change < -0.08: factor_scores['bond'] = {"score": 8, "direction": "favorable"}
-        elif bond_change < -0.05: factor_scores['bond'] = {"score": 7, "direction": "favorable"}
-        elif bond_change < -0.02: factor_scores['bond'] = {"score": 6, "direction": "favorable"}
-        else: factor_scores['bond'] = {"score": 5, "direction": "neutral"}
-        
-        if change > 1.5: factor_scores['mag7'] = {"score": 8, "direction": "strong"}
-        elif change > 0.5: factor_scores['mag7'] = {"score": 7, "direction": "strong"}
-        elif change > 0: factor_scores['mag7'] = {"score": 6, "direction": "neutral"}
-        elif change > -0.5: factor_scores['mag7'] = {"score": 5, "direction": "neutral"}
-        elif change > -1.5: factor_scores['mag7'] = {"score": 4, "direction": "weak"}
-        else: factor_scores['mag7'] = {"score": 3, "direction": "weak"}
-        
-        total = sum(factor_scores[f]['score'] * self.weights[f] for f in self.weights)
-        total = round(total, 1)
-        
-        return {"total_score": total, "regime": self.get_regime(total), "factor_scores": factor_scores, "weights": self.weights}
+        """單日評分：一列的特徵表走 score_batch，與回測、優化器共用同一個評分器"""
+        return scoring.score_record(self.score_batch(self.score_frame(data)))
+    
+    def score_batch(self, df: pd.DataFrame) -> Dict[str, Any]:
+        return scoring.default_score_batch(df, self.weights)
     
     def get_allocation(self, score: float, risk_pref: str = 'neutral') -> Dict[str, Any]:
         adj = score
@@ -361,6 +355,7 @@ class MA20Strategy(BaseStrategy):
     name = "ma20"
     version = "5.0"
     description = "MA20 趨勢跟隨策略（自動優化）"
+    allocation_table = scoring.MA20_ALLOCATION
     
     def load_params(self, params: Dict):
         self.days_threshold = params.get('days_threshold', 2)
@@ -375,64 +370,30 @@ class MA20Strategy(BaseStrategy):
         print(f"     • weights: pos={self.position_weight}, trend={self.trend_weight}, vix={self.vix_weight}")
     
     def score(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        close = data.get('qqq', {}).get('close', 0)
-        technicals = data.get('technicals', {})
-        vix = data.get('vix', {}).get('value', 20)
-        
-        ma20 = technicals.get('ma20', close)
-        days_above = technicals.get('consecutive_days_above_ma20', 0)
-        days_below = technicals.get('consecutive_days_below_ma20', 0)
-        ma20_diff_pct = technicals.get('ma20_diff_pct', 0)
-        
-        factor_scores = {}
-        
-        if ma20_diff_pct > 5: factor_scores['ma20_position'] = {"score": 9, "direction": "strong_above", "value": ma20_diff_pct}
-        elif ma20_diff_pct > 3: factor_scores['ma20_position'] = {"score": 8, "direction": "above", "value": ma20_diff_pct}
-        elif ma20_diff_pct > 1: factor_scores['ma20_position'] = {"score": 7, "direction": "above", "value": ma20_diff_pct}
-        elif ma20_diff_pct > 0: factor_scores['ma20_position'] = {"score": 6, "direction": "slight_above", "value": ma20_diff_pct}
-        elif ma20_diff_pct > -1: factor_scores['ma20_position'] = {"score": 5, "direction": "slight_below", "value": ma20_diff_pct}
-        elif ma20_diff_pct > -3: factor_scores['ma20_position'] = {"score": 4, "direction": "below", "value": ma20_diff_pct}
-        elif ma20_diff_pct > -5: factor_scores['ma20_position'] = {"score": 3, "direction": "below", "value": ma20_diff_pct}
-        else: factor_scores['ma20_position'] = {"score": 2, "direction": "strong_below", "value": ma20_diff_pct}
-        
-        if days_above >= self.days_threshold + 1:
-            factor_scores['ma20_trend'] = {"score": 9, "direction": "bullish", "days_above": days_above, "signal": "BUY"}
-        elif days_above >= self.days_threshold:
-            factor_scores['ma20_trend'] = {"score": 8, "direction": "bullish", "days_above": days_above, "signal": "BUY"}
-        elif days_above == 1:
-            factor_scores['ma20_trend'] = {"score": 6, "direction": "neutral", "days_above": days_above, "signal": "WATCH"}
-        elif days_below == 1:
-            factor_scores['ma20_trend'] = {"score": 5, "direction": "neutral", "days_below": days_below, "signal": "WATCH"}
-        elif days_below >= self.days_threshold:
-            factor_scores['ma20_trend'] = {"score": 3, "direction": "bearish", "days_below": days_below, "signal": "SELL"}
-        elif days_below >= self.days_threshold + 1:
-            factor_scores['ma20_trend'] = {"score": 2, "direction": "bearish", "days_below": days_below, "signal": "SELL"}
+        """單日評分：一列的特徵表走 score_batch，factor_scores 另補上原始數值與連續天數"""
+        frame = self.score_frame(data)
+        batch = self.score_batch(frame)
+        days_above = int(batch['days_above_ma20'][0])
+        days_below = int(batch['days_below_ma20'][0])
+        
+        # 趨勢明細記錄觸發的那一側天數與 RISK_OFF 覆蓋前的訊號
+        _, trend_signal = scoring.ma20_trend_ladder(days_above, days_below, self.days_threshold)
+        if trend_signal == 'HOLD':
+            trend = {}
+        elif trend_signal == 'BUY' or (trend_signal == 'WATCH' and days_above == 1):
+            trend = {"days_above": days_above}
         else:
-            factor_scores['ma20_trend'] = {"score": 5, "direction": "neutral", "signal": "HOLD"}
-        
-        if vix < 15: factor_scores['vix_filter'] = {"score": 8, "direction": "low_risk", "value": vix}
-        elif vix < 20: factor_scores['vix_filter'] = {"score": 7, "direction": "normal", "value": vix}
-        elif vix < 25: factor_scores['vix_filter'] = {"score": 5, "direction": "elevated", "value": vix}
-        elif vix < 30: factor_scores['vix_filter'] = {"score": 3, "direction": "high", "value": vix}
-        else: factor_scores['vix_filter'] = {"score": 2, "direction": "extreme", "value": vix}
-        
-        total = (factor_scores['ma20_position']['score'] * self.position_weight +
-                 factor_scores['ma20_trend']['score'] * self.trend_weight +
-                 factor_scores['vix_filter']['score'] * self.vix_weight)
-        total = round(total, 1)
-        
-        signal = factor_scores['ma20_trend'].get('signal', 'HOLD')
-        
-        if vix > self.vix_limit:
-            signal = "RISK_OFF"
-            total = min(total, 4)
-        
-        return {
-            "total_score": total, "regime": self.get_regime(total), "factor_scores": factor_scores,
-            "weights": {"ma20_position": self.position_weight, "ma20_trend": self.trend_weight, "vix_filter": self.vix_weight},
-            "signal": signal, "ma20": ma20, "close": close, "days_above_ma20": days_above, "days_below_ma20": days_below,
-            "params_used": {"days_threshold": self.days_threshold, "vix_limit": self.vix_limit}
+            trend = {"days_below": days_below}
+        details = {
+            'ma20_position': {"value": float(scoring.frame_column(frame, 'ma20_diff_pct', 0)[0])},
+            'ma20_trend': {**trend, "signal": trend_signal},
+            'vix_filter': {"value": float(scoring.frame_column(frame, 'vix', 20)[0])},
         }
+        return scoring.score_record(batch, details=details)
+    
+    def score_batch(self, df: pd.DataFrame) -> Dict[str, Any]:
+        weights = {"ma20_position": self.position_weight, "ma20_trend": self.trend_weight, "vix_filter": self.vix_weight}
+        return scoring.ma20_score_batch(df, self.days_threshold, self.vix_limit, weights)
     
     def get_allocation(self, score: float, risk_pref: str = 'neutral') -> Dict[str, Any]:
         adj = score
@@ -534,7 +495,8 @@ def run_daily_analysis(strategy_name: str = None):
         sys.exit(1)
     
     print("\n📈 技術分析...")
-    technicals = TechnicalAnalyzer.analyze("QQQ", market_data['qqq']['close'])
+    technicals = TechnicalAnalyzer.analyze("QQQ", market_data['qqq']['close'],
+                                           MarketDataFetcher.histories.get("QQQ"))
     market_data['technicals'] = technicals
     
     if 'ma20' in technicals:
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+效能基準測試：回測引擎、參數優化器與技術指標的熱點路徑
+
+- 以 collector_prices.gen_synthetic 產生 QQQ / VIX / TNX 合成日線（1k ~ 1M 根 K 線）
+- 每個案例重複 --repeat 次取最短時間，結果附加到 reports/benchmarks.json
+- 與歷史中同一案例、同一長度的上一筆紀錄比較，變慢超過 --threshold 時標示
+
+使用方式:
+    python scripts/benchmark.py                          # 預設 1k / 10k / 100k
+    python scripts/benchmark.py --bars 1000 1000000 --repeat 5
+    python scripts/benchmark.py --cases engine_vector ma20_grid --no-save
+"""
+import sys, io, json, time, argparse, platform, subprocess, contextlib, datetime as dt
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+for p in (ROOT, ROOT / "scripts"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+import numpy as np
+import pandas as pd
+
+from collector_prices import gen_synthetic
+import backtest
+import backtest_v2
+
+HISTORY = ROOT / "reports" / "benchmarks.json"
+CHUNK = 50_000  # gen_synthetic 以工作日為索引，分段產生以免日期超出 pandas 範圍
+
+
+# ============================================
+# 合成數據
+# ============================================
+
+def synthetic_series(n: int, start: float, seed: int) -> pd.DataFrame:
+    """串接多段 gen_synthetic，得到 n 根 OHLCV（欄名同 yfinance）"""
+    parts = []
+    price = start
+    for i, offset in enumerate(range(0, n, CHUNK)):
+        size = min(CHUNK, n - offset)
+        part = gen_synthetic(n=size - 1, start=price, seed=seed + i)
+        price = float(part["close"].iloc[-1])
+        parts.append(part)
+    df = pd.concat(parts, ignore_index=True).drop(columns="date")
+    df.columns = [c.capitalize() for c in df.columns]
+    df.index = pd.date_range("2000-01-03", periods=len(df), freq="min", name="Date")
+    return df
+
+
+def synthetic_frames(n: int, seed: int = 42) -> Dict[str, pd.DataFrame]:
+    """DataFetcher.prepare_data 使用的 {QQQ, ^VIX, ^TNX} 合成日線"""
+    return {
+        "QQQ": synthetic_series(n, 400.0, seed),
+        "^VIX": synthetic_series(n, 20.0, seed + 1000),
+        "^TNX": synthetic_series(n, 4.5, seed + 2000),
+    }
+
+
+# ============================================
+# 基準案例
+# ============================================
+
+class Case:
+    """一個基準案例：setup(bars) 返回要計時的無參數函數，None 表示此長度不適用"""
+
+    def __init__(self, name: str, setup: Callable[[int], Optional[Callable[[], object]]], max_bars: int = None):
+        self.name = name
+        self.setup = setup
+        self.max_bars = max_bars
+
+
+def build_cases(frames: Dict[str, pd.DataFrame], loop_max: int) -> List[Case]:
+    features = backtest.DataFetcher.build_features(frames)
+    close = frames["QQQ"]["Close"]
+
+    def engine(vectorized: bool):
+        def setup(bars):
+            eng = backtest.BacktestEngine(features, vectorized=vectorized, record_daily=False)
+            strategies = [backtest.DefaultStrategy(), backtest.MA20Strategy()]
+            return lambda: [eng.run(s) for s in strategies]
+        return setup
+
+    def v2_backtester(bars):
+        prices = frames["QQQ"][["Close"]]
+        signals = pd.Series(np.random.default_rng(0).choice([20, 50, 80], len(prices)), index=prices.index)
+        return lambda: backtest_v2.Backtester(record_history=False).run(prices, signals)
+
+    def ma20_grid(bars):
+        optimizer = backtest.ParameterOptimizer(features, 0)
+        return lambda: optimizer.optimize_ma20(auto_save=False)
+
+    def default_sets(bars):
+        optimizer = backtest.ParameterOptimizer(features, 0)
+        return lambda: optimizer.optimize_default(auto_save=False)
+
+    def v2_optimizer(bars):
+        try:
+            from qqq_analyzer import MA20Strategy
+        except Exception as e:
+            print(f"   ⚠️ 略過 v2_optimizer：無法載入 qqq_analyzer ({e})")
+            return None
+        prices = frames["QQQ"][["Close"]]
+        market = pd.DataFrame({"VIX": frames["^VIX"]["Close"]}, index=prices.index)
+        ranges = {"days_threshold": [1, 2, 3], "vix_limit": [30, 35], "position_weight": [0.5],
+                  "trend_weight": [0.3], "vix_weight": [0.2]}
+        optimizer = backtest_v2.ParameterOptimizer(MA20Strategy)
+        return lambda: optimizer.optimize(prices, market, ranges)
+
+    def indicators(bars):
+        try:
+            from analyst_tech_llm import ema, rsi, macd
+        except Exception as e:
+            print(f"   ⚠️ 略過 indicators：無法載入 analyst_tech_llm ({e})")
+            return None
+        values = close.tolist()
+        return lambda: (ema(values, 20), rsi(values, 14), macd(values))
+
+    return [
+        Case("features", lambda bars: lambda: backtest.DataFetcher.build_features(frames)),
+        Case("engine_vector", engine(True)),
+        Case("engine_loop", engine(False), max_bars=loop_max),
+        Case("v2_backtester", v2_backtester, max_bars=loop_max * 5),
+        Case("ma20_grid", ma20_grid, max_bars=loop_max * 5),  # 組合數 × 天數矩陣，1M 根時記憶體過大
+        Case("default_sets", default_sets),
+        Case("v2_optimizer", v2_optimizer, max_bars=loop_max),
+        Case("indicators", indicators),
+    ]
+
+
+def time_call(fn: Callable[[], object], repeat: int) -> float:
+    """重複執行取最短時間（秒），期間的列印輸出丟棄"""
+    best = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+    return best
+
+
+# ============================================
+# 歷史紀錄
+# ============================================
+
+def load_history(path: Path) -> List[Dict]:
+    if not path.exists():
+        return []
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def previous_seconds(history: List[Dict], case: str, bars: int) -> Optional[float]:
+    """歷史中同一案例、同一長度最近一次的秒數"""
+    for run in reversed(history):
+        entry = run.get("results", {}).get(case, {}).get(str(bars))
+        if entry:
+            return entry["seconds"]
+    return None
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return ""
+
+
+# ============================================
+# 主程式
+# ============================================
+
+def main():
+    ap = argparse.ArgumentParser(description="回測 / 優化 / 指標效能基準")
+    ap.add_argument("--bars", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="合成 K 線數量")
+    ap.add_argument("--repeat", type=int, default=3, help="每個案例重複次數（取最短）")
+    ap.add_argument("--cases", nargs="+", default=None, help="只執行指定案例")
+    ap.add_argument("--loop-max", type=int, default=20_000, help="逐日迴圈類案例的最大 K 線數")
+    ap.add_argument("--threshold", type=float, default=0.10, help="比上次慢超過此比例時標示為退步")
+    ap.add_argument("--history", type=str, default=str(HISTORY), help="歷史紀錄 JSON 路徑")
+    ap.add_argument("--no-save", action="store_true", help="不寫入歷史紀錄")
+    args = ap.parse_args()
+
+    history_path = Path(args.history)
+    history = load_history(history_path)
+    results: Dict[str, Dict[str, Dict]] = {}
+    regressions = []
+
+    for bars in args.bars:
+        print(f"\n📊 {bars:,} 根 K 線")
+        frames = synthetic_frames(bars)
+        for case in build_cases(frames, args.loop_max):
+            if args.cases and case.name not in args.cases:
+                continue
+            if case.max_bars is not None and bars > case.max_bars:
+                continue
+            fn = case.setup(bars)
+            if fn is None:
+                continue
+
+            seconds = time_call(fn, args.repeat)
+            results.setdefault(case.name, {})[str(bars)] = {
+                "seconds": round(seconds, 6),
+                "bars_per_sec": round(bars / seconds, 1) if seconds > 0 else None,
+            }
+
+            prev = previous_seconds(history, case.name, bars)
+            note = ""
+            if prev:
+                change = seconds / prev - 1
+                note = f"  ({change:+.1%} vs 上次)"
+                if change > args.threshold:
+                    note += "  ⚠️ 退步"
+                    regressions.append((case.name, bars, change))
+            print(f"   {case.name:<14} {seconds * 1000:>10.2f} ms{note}")
+
+    run = {
+        "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if not args.no_save:
+        history_path.parent.mkdir(parents=True, exist_ok=True)
+        history_path.write_text(json.dumps(history + [run], ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n💾 已寫入 {history_path}")
+
+    if regressions:
+        print(f"\n⚠️ {len(regressions)} 個案例比上次慢超過 {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+串流績效累加器
+
+逐日迴圈每天呼叫一次 add_return() / mark()，不必保留逐日紀錄即可得出
+平均、標準差、勝率、盈虧比與最大回撤。目前只有參考實作 BacktestEngine.run_loop 使用；
+向量化引擎（run_vectorized、網格評估、backtest_v2、auto_optimize）一次取得整條損益 / 淨值路徑，
+改由 kernel.return_stats / kernel.max_drawdown 以陣列計算同樣的指標。
+"""
+import math
+
+
+class RunningMetrics:
+    """逐筆更新的績效統計（Welford 平均/變異數、峰值/回撤、勝負次數與盈虧總和）"""
+
+    def __init__(self):
+        # 報酬序列
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.wins = 0
+        self.losses = 0
+        self.gain_sum = 0.0
+        self.loss_sum = 0.0
+
+        # 淨值 / 累積損益序列
+        self.peak = None
+        self.max_drawdown = 0.0  # 絕對回撤（peak - level，>= 0）
+
+    def add_return(self, r: float):
+        """加入一期報酬"""
+        self.count += 1
+        delta = r - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (r - self.mean)
+        if r > 0:
+            self.wins += 1
+            self.gain_sum += r
+        elif r < 0:
+            self.losses += 1
+            self.loss_sum += -r
+
+    def mark(self, level: float):
+        """加入一個淨值（或累積損益）點，更新峰值與回撤"""
+        if self.peak is None or level > self.peak:
+            self.peak = level
+        dd = self.peak - level
+        if dd > self.max_drawdown:
+            self.max_drawdown = dd
+
+    @property
+    def std(self) -> float:
+        """母體標準差（與 np.std 相同的 ddof=0）"""
+        return math.sqrt(self._m2 / self.count) if self.count else 0.0
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.count * 100 if self.count else 0
+
+    @property
+    def avg_gain(self) -> float:
+        return self.gain_sum / self.wins if self.wins else 0
+
+    @property
+    def avg_loss(self) -> float:
+        """平均虧損（正值）；沒有虧損時為 1，與既有回測的慣例相同"""
+        return self.loss_sum / self.losses if self.losses else 1
+
+    @property
+    def profit_loss_ratio(self) -> float:
+        avg_loss = self.avg_loss
+        return self.avg_gain / avg_loss if avg_loss > 0 else 0
+
+    def sharpe(self, periods: int = 252) -> float:
+        """年化 Sharpe（無風險利率 = 0），標準差為 0 時返回 0"""
+        std = self.std
+        return self.mean / std * math.sqrt(periods) if std > 0 else 0
@@ -0,0 +1,158 @@
+"""
+K 線週期與分鐘線本地存放
+
+- 週期字串（'1d'、'5m'、'1m' ...）換算每年根數（年化）與每個交易日的根數
+- BarStore：每個 (週期, ticker) 一個目錄，索引與各欄位各存成一個 .npy，
+  讀取時以 np.load(mmap_mode='r') 映射，依列位置分段取出，不需整份載入記憶體
+"""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252          # 每年交易日
+SESSION_MINUTES = 390       # 美股正常交易時段 09:30 ~ 16:00
+
+BAR_MINUTES = {
+    '1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30,
+    '60m': 60, '1h': 60, '90m': 90, '1d': SESSION_MINUTES,
+}
+
+
+def bar_minutes(interval: str) -> int:
+    if interval not in BAR_MINUTES:
+        raise ValueError(f"不支援的 K 線週期: {interval}（可用: {', '.join(BAR_MINUTES)}）")
+    return BAR_MINUTES[interval]
+
+
+def is_intraday(interval: str) -> bool:
+    return bar_minutes(interval) < SESSION_MINUTES
+
+
+def bars_per_day(interval: str) -> int:
+    """每個交易日的 K 線根數（日線為 1）"""
+    return max(SESSION_MINUTES // bar_minutes(interval), 1)
+
+
+def periods_per_year(interval: str) -> int:
+    """年化因子：每年的 K 線根數（日線為 252）"""
+    return TRADING_DAYS * bars_per_day(interval)
+
+
+def date_format(interval: str) -> str:
+    return '%Y-%m-%d %H:%M' if is_intraday(interval) else '%Y-%m-%d'
+
+
+def session_lagged(df: pd.DataFrame, index: pd.DatetimeIndex) -> pd.DataFrame:
+    """
+    把日線對齊到盤中索引：每根 K 線只看到前一個交易日（含）以前的收盤
+
+    盤中 K 線的當日日線收盤尚未產生，直接 ffill 會用到未來資料。
+    """
+    daily = df.copy()
+    daily.index = _naive(daily.index).normalize()
+    daily = daily[~daily.index.duplicated(keep='last')].sort_index()
+    pos = daily.index.searchsorted(_naive(index).normalize(), side='left') - 1
+    values = daily.to_numpy(dtype=float)
+    out = np.full((len(index), daily.shape[1]), np.nan)
+    valid = pos >= 0
+    out[valid] = values[pos[valid]]
+    return pd.DataFrame(out, index=index, columns=daily.columns)
+
+
+class BarStore:
+    """以 (週期, ticker) 為單位的記憶體映射 OHLCV 存放"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def path(self, ticker: str, interval: str) -> Path:
+        safe = re.sub(r'[^A-Za-z0-9._-]', '_', ticker)
+        return self.root / interval / safe
+
+    def exists(self, ticker: str, interval: str) -> bool:
+        return (self.path(ticker, interval) / 'meta.json').exists()
+
+    def open(self, ticker: str, interval: str) -> Tuple[np.ndarray, Dict[str, np.ndarray], str]:
+        """返回 (UTC 奈秒索引, {欄位: 陣列}, 時區)，陣列皆為唯讀記憶體映射"""
+        fp = self.path(ticker, interval)
+        meta = json.loads((fp / 'meta.json').read_text(encoding='utf-8'))
+        index = np.load(fp / 'index.npy', mmap_mode='r')
+        columns = {c: np.load(fp / f'c_{c}.npy', mmap_mode='r') for c in meta['columns']}
+        return index, columns, meta['tz']
+
+    def rows(self, ticker: str, interval: str, start=None, end=None) -> Tuple[int, int]:
+        """[start, end) 時間區間對應的列位置"""
+        index, _, tz = self.open(ticker, interval)
+        lo = int(np.searchsorted(index, _utc_ns(start, tz), side='left')) if start is not None else 0
+        hi = int(np.searchsorted(index, _utc_ns(end, tz), side='left')) if end is not None else len(index)
+        return lo, hi
+
+    def frame(self, ticker: str, interval: str, lo: int, hi: int) -> pd.DataFrame:
+        """[lo, hi) 列的 DataFrame（欄位為記憶體映射切片，不複製）"""
+        index, columns, tz = self.open(ticker, interval)
+        idx = pd.DatetimeIndex(np.asarray(index[lo:hi]).view('datetime64[ns]'), name='Date').tz_localize('UTC')
+        if tz:
+            idx = idx.tz_convert(tz)
+        return pd.DataFrame({c: v[lo:hi] for c, v in columns.items()}, index=idx, copy=False)
+
+    def load(self, ticker: str, interval: str, start=None, end=None) -> pd.DataFrame:
+        if not self.exists(ticker, interval):
+            return pd.DataFrame()
+        return self.frame(ticker, interval, *self.rows(ticker, interval, start, end))
+
+    def iter_chunks(self, ticker: str, interval: str, start=None, end=None, chunk_rows: int = 50_000,
+                    overlap: int = 0) -> Iterator[Tuple[pd.DataFrame, int]]:
+        """
+        逐段讀取 [start, end)，每段最多 chunk_rows 列
+
+        每段前面多帶 overlap 列（滾動指標的暖機），返回 (DataFrame, 暖機列數)；
+        第一段的暖機列取自 start 之前（若有）。
+        """
+        lo, hi = self.rows(ticker, interval, start, end)
+        for begin in range(lo, hi, chunk_rows):
+            warm_from = max(begin - overlap, 0)
+            yield self.frame(ticker, interval, warm_from, min(begin + chunk_rows, hi)), begin - warm_from
+
+    def write(self, ticker: str, interval: str, df: pd.DataFrame):
+        """與既有資料合併（同時間以新資料為準）後整份改寫"""
+        if df.empty:
+            return
+        existing = self.load(ticker, interval)
+        if not existing.empty:
+            df = pd.concat([existing, df])
+            df = df[~df.index.duplicated(keep='last')]
+        df = df.sort_index()
+
+        fp = self.path(ticker, interval)
+        fp.mkdir(parents=True, exist_ok=True)
+        index = df.index.as_unit('ns')
+        tz = str(index.tz) if index.tz is not None else ''
+        utc = index.tz_convert('UTC').tz_localize(None) if tz else index
+
+        arrays = {'index': utc.asi8}
+        arrays.update({f'c_{c}': df[c].to_numpy(dtype=float) for c in df.columns})
+        for name, values in arrays.items():
+            tmp = fp / f'{name}.tmp.npy'
+            np.save(tmp, values)
+            os.replace(tmp, fp / f'{name}.npy')
+        meta = {'columns': [str(c) for c in df.columns], 'tz': tz, 'rows': len(df)}
+        (fp / 'meta.json').write_text(json.dumps(meta), encoding='utf-8')
+
+
+def _naive(index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    return index.tz_localize(None) if index.tz is not None else index
+
+
+def _utc_ns(ts, tz: str = '') -> int:
+    """時間點轉成 UTC 奈秒；不含時區的時間點視為 tz 的當地時間"""
+    ts = pd.Timestamp(ts)
+    if ts.tz is None and tz:
+        ts = ts.tz_localize(tz)
+    if ts.tz is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts.as_unit('ns').value
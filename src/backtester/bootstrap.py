@@ -0,0 +1,131 @@
+"""
+回測結果的穩健度重抽樣
+
+以策略的每日損益（與同日 QQQ 漲跌幅成對）產生數千條重抽樣路徑，
+每批為 (路徑數 × 天數) 的二維陣列，以向量化運算計算夏普、Alpha、最大回撤的分布：
+
+- block：stationary block bootstrap（平均區塊長度 mean_block 天，區塊長度為幾何分布）
+- start：隨機起始日，取長度 window 的連續子期間
+
+路徑分成每批 chunk_paths 條，各批使用由 seed 衍生的獨立亂數流，
+因此結果與進程數無關，記憶體只與單批大小有關。
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.backtester import kernel
+from src.backtester.bars import TRADING_DAYS
+from src.backtester.parallel import parallel_map
+
+BOOTSTRAP_METRICS = ('total_return', 'alpha', 'sharpe_ratio', 'max_drawdown')
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def stationary_block_indices(rng: np.random.Generator, n_paths: int, n_days: int,
+                             mean_block: float) -> np.ndarray:
+    """
+    (n_paths × n_days) 的重抽樣日索引
+
+    每天以 1 / mean_block 的機率開新區塊（從隨機日開始），否則延續前一天的下一日，超出尾端時繞回開頭。
+    """
+    days = np.arange(n_days)
+    new_block = rng.random((n_paths, n_days)) < 1.0 / max(mean_block, 1.0)
+    new_block[:, 0] = True
+    starts = rng.integers(0, n_days, size=(n_paths, n_days))
+    block_begin = np.maximum.accumulate(np.where(new_block, days, 0), axis=1)
+    first = np.take_along_axis(starts, block_begin, axis=1)
+    return (first + days - block_begin) % n_days
+
+
+def random_start_indices(rng: np.random.Generator, n_paths: int, n_days: int, window: int) -> np.ndarray:
+    """(n_paths × window) 的連續子期間日索引，起始日均勻分布"""
+    window = min(window, n_days)
+    offsets = rng.integers(0, n_days - window + 1, size=n_paths)
+    return offsets[:, None] + np.arange(window)
+
+
+def resampled_metrics(pnls: np.ndarray, market: np.ndarray, periods: int = TRADING_DAYS) -> Dict[str, np.ndarray]:
+    """
+    逐列計算重抽樣路徑的績效（kernel 指標，與 backtest.path_metrics 相同的定義）
+
+    pnls / market 為 (路徑數 × 天數) 的策略損益與 QQQ 漲跌幅（%），
+    Alpha 以同一組日期的 QQQ 複利報酬為基準。
+    """
+    rows, days = pnls.shape
+    cumulative = np.cumsum(pnls, axis=1)
+    total = cumulative[:, -1] if days else np.zeros(rows)
+    qqq = (np.prod(1 + market / 100, axis=1) - 1) * 100
+    max_dd = kernel.max_drawdown(cumulative)
+    sharpe = kernel.return_stats(pnls, periods)['sharpe_ratio']
+
+    return {'total_return': total, 'alpha': total - qqq, 'sharpe_ratio': sharpe, 'max_drawdown': max_dd}
+
+
+def _resample_task(frame: pd.DataFrame, payload: Tuple) -> Dict[str, np.ndarray]:
+    """一批重抽樣（frame 欄位為 pnl / market，payload = (方法, 亂數種子, 路徑數, 參數, 年化因子)）"""
+    method, seed, n_paths, size, periods = payload
+    rng = np.random.default_rng(seed)
+    pnls = frame['pnl'].to_numpy(dtype=float)
+    market = frame['market'].to_numpy(dtype=float)
+    if method == 'block':
+        idx = stationary_block_indices(rng, n_paths, len(pnls), size)
+    else:
+        idx = random_start_indices(rng, n_paths, len(pnls), size)
+    return resampled_metrics(pnls[idx], market[idx], periods)
+
+
+def resample(pnls: np.ndarray, market: np.ndarray, method: str = 'block', n_paths: int = 2000,
+             mean_block: float = 10, window: int = None, seed: int = 0, workers: int = 1,
+             chunk_paths: int = 500, periods: int = TRADING_DAYS) -> Dict[str, np.ndarray]:
+    """
+    產生 n_paths 條重抽樣路徑並返回每條的績效 {指標: (n_paths,)}
+
+    method='block' 使用 mean_block；method='start' 使用 window（預設為總天數的 3/4）。
+    """
+    if method not in ('block', 'start'):
+        raise ValueError(f"未知的重抽樣方法: {method}")
+    n_days = len(pnls)
+    if method == 'block':
+        size = mean_block
+    else:
+        size = window or max(n_days * 3 // 4, 1)
+
+    counts = [min(chunk_paths, n_paths - start) for start in range(0, n_paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    payloads = [(method, s, count, size, periods) for s, count in zip(seeds, counts)]
+    frame = pd.DataFrame({'pnl': np.asarray(pnls, dtype=float), 'market': np.asarray(market, dtype=float)})
+
+    parts: List[Dict[str, np.ndarray]] = list(parallel_map(_resample_task, payloads, frame, workers))
+    if not parts:
+        return {k: np.empty(0) for k in BOOTSTRAP_METRICS}
+    return {k: np.concatenate([p[k] for p in parts]) for k in BOOTSTRAP_METRICS}
+
+
+def summarize(samples: Dict[str, np.ndarray],
+              percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Dict[str, float]]:
+    """各指標分布的平均、標準差與百分位數（四捨五入到 0.01）"""
+    summary = {}
+    for name, values in samples.items():
+        if not len(values):
+            continue
+        stats = {'mean': float(values.mean()), 'std': float(values.std())}
+        for q, v in zip(percentiles, np.percentile(values, percentiles)):
+            stats[f'p{int(q):02d}'] = float(v)
+        summary[name] = {k: round(v, 2) for k, v in stats.items()}
+    return summary
+
+
+def robustness_summary(pnls: np.ndarray, market: np.ndarray, n_paths: int = 2000, mean_block: float = 10,
+                       window: int = None, seed: int = 0, workers: int = 1,
+                       chunk_paths: int = 500, periods: int = TRADING_DAYS) -> Dict[str, Dict]:
+    """兩種重抽樣的分布摘要，可直接寫入 backtest_result['robustness']"""
+    out: Dict[str, Dict] = {
+        'paths': n_paths, 'days': len(pnls), 'mean_block': mean_block,
+        'window': window or max(len(pnls) * 3 // 4, 1), 'seed': seed,
+    }
+    for method, key in (('block', 'block_bootstrap'), ('start', 'random_start')):
+        samples = resample(pnls, market, method, n_paths, mean_block, window, seed, workers, chunk_paths, periods)
+        out[key] = summarize(samples)
+    return out
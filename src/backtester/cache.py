@@ -0,0 +1,152 @@
+"""
+本地 OHLCV 快取
+
+每個 ticker（還原 / 未還原權值各一份）存成一個 .npz，逐欄儲存；
+讀取時只向網路補抓快取最後一根 K 線之後的資料，無網路時直接使用快取。
+還原權值的資料在除權息 / 分割後整段歷史都會被重新還原，補抓到的重疊 K 線與快取不符時整段重抓。
+"""
+import os
+import re
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+ADJUSTMENT_TOLERANCE = 1e-6  # 重疊 K 線價格的相對誤差超過此值視為還原因子已變動
+
+# fetch(ticker, start, end, adjusted) -> DataFrame（end 為不含當日的上界，None 表示到最新）
+Fetcher = Callable[[str, pd.Timestamp, Optional[pd.Timestamp], bool], pd.DataFrame]
+
+
+class OHLCVCache:
+    """以 ticker 為鍵的 OHLCV 欄式快取"""
+
+    def __init__(self, root: str, max_age: float = 6 * 3600):
+        self.root = Path(root)
+        self.max_age = max_age  # 快取在此秒數內更新過就不再補抓尾端
+
+    def path(self, ticker: str, adjusted: bool = True) -> Path:
+        safe = re.sub(r'[^A-Za-z0-9._-]', '_', ticker)
+        return self.root / f"{safe}_{'adj' if adjusted else 'raw'}.npz"
+
+    def age(self, ticker: str, adjusted: bool = True) -> float:
+        """距上次寫入的秒數，不存在時為無限大"""
+        fp = self.path(ticker, adjusted)
+        return time.time() - fp.stat().st_mtime if fp.exists() else float('inf')
+
+    def load(self, ticker: str, adjusted: bool = True) -> pd.DataFrame:
+        fp = self.path(ticker, adjusted)
+        if not fp.exists():
+            return pd.DataFrame()
+        with np.load(fp, allow_pickle=False) as z:
+            tz = str(z['__tz__'])
+            index = pd.DatetimeIndex(z['__index__'].view('datetime64[ns]'))
+            if tz:
+                index = index.tz_localize('UTC').tz_convert(tz)
+            df = pd.DataFrame({str(c): z[f'c:{c}'] for c in z['__columns__']}, index=index)
+            df.attrs['covered_from'] = pd.Timestamp(int(z['__covered_from__']))
+        return df
+
+    def save(self, ticker: str, df: pd.DataFrame, covered_from: pd.Timestamp, adjusted: bool = True):
+        fp = self.path(ticker, adjusted)
+        fp.parent.mkdir(parents=True, exist_ok=True)
+
+        index = df.index.as_unit('ns')
+        tz = str(index.tz) if index.tz is not None else ''
+        arrays = {
+            '__index__': (index.tz_convert('UTC').tz_localize(None) if tz else index).asi8,
+            '__tz__': np.array(tz),
+            '__columns__': np.array([str(c) for c in df.columns]),
+            '__covered_from__': np.array(covered_from.value),
+        }
+        for c in df.columns:
+            arrays[f'c:{c}'] = df[c].to_numpy()
+
+        tmp = fp.with_suffix('.tmp.npz')
+        np.savez(tmp, **arrays)
+        os.replace(tmp, fp)
+
+    def get(self, ticker: str, start, end=None, adjusted: bool = True,
+            fetch: Fetcher = None, offline: bool = False) -> pd.DataFrame:
+        """
+        取得 [start, end] 區間的日線
+
+        - 快取沒有涵蓋 start 時補抓前段（還原價則從 start 整段重抓）
+        - 快取超過 max_age 未更新時，從最後一根 K 線（含）開始補抓尾端；
+          還原價的最後一根 K 線價格與快取不同時（還原因子已變動）整段重抓
+        - 下載失敗或 offline 時使用現有快取
+        """
+        start = pd.Timestamp(start).normalize()
+        cached = self.load(ticker, adjusted)
+        covered_from = cached.attrs.get('covered_from', start) if not cached.empty else start
+
+        if fetch is not None and not offline:
+            parts = []
+            fetched = False
+            replace = False  # True 時 parts 已涵蓋整段，捨棄舊快取
+            try:
+                if cached.empty:
+                    parts.append(fetch(ticker, start, None, adjusted))
+                elif adjusted and start < covered_from:
+                    # 還原價不能只補前段：新舊兩段的還原因子可能不同
+                    parts.append(fetch(ticker, start, None, adjusted))
+                    replace = True
+                else:
+                    if start < covered_from:
+                        parts.append(fetch(ticker, start, _local_date(cached.index[0]), adjusted))
+                    if self.age(ticker, adjusted) > self.max_age:
+                        tail = fetch(ticker, _local_date(cached.index[-1]), None, adjusted)
+                        if adjusted and _adjustment_changed(cached, tail):
+                            print(f"   ↻ {ticker} 還原因子已變動，重新下載完整歷史")
+                            tail = fetch(ticker, min(covered_from, start), None, adjusted)
+                            replace = True
+                        parts.append(tail)
+                fetched = bool(parts)
+            except Exception as e:
+                print(f"⚠️ 更新 {ticker} 快取失敗，使用本地資料: {e}")
+                parts = []
+                replace = False
+
+            parts = [p for p in parts if p is not None and not p.empty]
+            if parts:
+                merged = pd.concat([cached] + parts) if not cached.empty and not replace else pd.concat(parts)
+                cached = merged[~merged.index.duplicated(keep='last')].sort_index()
+            if fetched and not cached.empty:
+                # 即使沒有新資料也寫回，記錄已涵蓋的起點並更新時間戳
+                covered_from = min(covered_from, start)
+                self.save(ticker, cached, covered_from, adjusted)
+
+        if cached.empty:
+            return cached
+        local = _local_index(cached.index)
+        mask = local >= start
+        if end is not None:
+            mask &= local < pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+        return cached[mask]
+
+
+def _adjustment_changed(cached: pd.DataFrame, fresh: Optional[pd.DataFrame]) -> bool:
+    """
+    新抓資料與快取重疊的 K 線價格不同（除權息 / 分割後 yfinance 重新還原了整段歷史）
+
+    優先比較開盤價：快取可能存了盤中未完成的最後一根 K 線，它的收盤價本來就會變，開盤價不會。
+    """
+    if fresh is None or fresh.empty:
+        return False
+    column = next((c for c in ('Open', 'Close') if c in fresh.columns and c in cached.columns), None)
+    overlap = cached.index.intersection(fresh.index)
+    if column is None or not len(overlap):
+        return False
+    old = cached.loc[overlap, column].to_numpy(dtype=float)
+    new = fresh.loc[overlap, column].to_numpy(dtype=float)
+    return not np.allclose(old, new, rtol=ADJUSTMENT_TOLERANCE, atol=0, equal_nan=True)
+
+
+def _local_index(index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    return index.tz_localize(None) if index.tz is not None else index
+
+
+def _local_date(ts: pd.Timestamp) -> pd.Timestamp:
+    return (ts.tz_localize(None) if ts.tz is not None else ts).normalize()
@@ -0,0 +1,129 @@
+"""
+可續跑的優化工作檢查點
+
+每個工作（job_id）在 SQLite 中保存啟動時的設定與輸入資料（數值型 DataFrame）快照，
+每評估完一個參數組合就立即寫入一列並 commit；進程被中斷後以相同 job_id 續跑時，
+直接使用快照資料（不需重新下載）並跳過已完成的組合。
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.backtester.results import _plain
+
+
+def point_key(params: Dict) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class CheckpointStore:
+    """單一優化工作的檢查點（SQLite WAL，逐筆 commit）"""
+
+    def __init__(self, path: str, job_id: str):
+        self.path = Path(path)
+        self.job_id = job_id
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' job_id TEXT PRIMARY KEY, status TEXT NOT NULL, config TEXT NOT NULL,'
+            ' frame_index BLOB, frame_tz TEXT, frame_columns TEXT, frame_values BLOB,'
+            ' created REAL NOT NULL, updated REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS points ('
+            ' job_id TEXT NOT NULL, strategy TEXT NOT NULL, key TEXT NOT NULL,'
+            ' params TEXT NOT NULL, metrics TEXT NOT NULL, finished REAL NOT NULL,'
+            ' PRIMARY KEY (job_id, strategy, key))'
+        )
+        self._conn.commit()
+
+    def status(self) -> Optional[str]:
+        """'running' / 'partial' / 'done'，工作不存在時為 None"""
+        row = self._conn.execute('SELECT status FROM jobs WHERE job_id = ?', (self.job_id,)).fetchone()
+        return row[0] if row else None
+
+    def config(self) -> Dict:
+        row = self._conn.execute('SELECT config FROM jobs WHERE job_id = ?', (self.job_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def start(self, config: Dict, frame: pd.DataFrame):
+        """建立（或重新開始）工作：清除舊紀錄並保存設定與輸入資料快照"""
+        now = time.time()
+        index, tz, columns, values = _pack_frame(frame)
+        self._conn.execute('DELETE FROM points WHERE job_id = ?', (self.job_id,))
+        self._conn.execute(
+            'INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (self.job_id, 'running', json.dumps(_plain(config), sort_keys=True), index, tz, columns, values, now, now)
+        )
+        self._conn.commit()
+
+    def frame(self) -> pd.DataFrame:
+        """工作啟動時保存的輸入資料"""
+        row = self._conn.execute(
+            'SELECT frame_index, frame_tz, frame_columns, frame_values FROM jobs WHERE job_id = ?', (self.job_id,)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return pd.DataFrame()
+        return _unpack_frame(*row)
+
+    def completed(self, strategy: str, params_list: Sequence[Dict]) -> List[Optional[Dict]]:
+        """依 params_list 順序返回已完成組合的指標，未完成為 None"""
+        rows = self._conn.execute(
+            'SELECT key, metrics FROM points WHERE job_id = ? AND strategy = ?', (self.job_id, strategy)
+        ).fetchall()
+        found = {k: json.loads(m) for k, m in rows}
+        return [found.get(point_key(p)) for p in params_list]
+
+    def record(self, strategy: str, params: Dict, metrics: Dict):
+        """寫入一個已完成的組合（立即 commit，進程中斷也不會遺失）"""
+        now = time.time()
+        self._conn.execute(
+            'INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?, ?, ?)',
+            (self.job_id, strategy, point_key(params), json.dumps(_plain(params), sort_keys=True),
+             json.dumps(_plain(metrics), sort_keys=True), now)
+        )
+        self._conn.execute('UPDATE jobs SET updated = ? WHERE job_id = ?', (now, self.job_id))
+        self._conn.commit()
+
+    def finish(self, status: str = 'done'):
+        self._conn.execute('UPDATE jobs SET status = ?, updated = ? WHERE job_id = ?',
+                           (status, time.time(), self.job_id))
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def _pack_frame(df: pd.DataFrame):
+    """數值型 DataFrame 轉成 (索引 int64 bytes, 時區, 欄名 JSON, float64 bytes)，不使用 pickle"""
+    index = pd.DatetimeIndex(df.index).as_unit('ns')
+    tz = str(index.tz) if index.tz is not None else ''
+    utc = index.tz_convert('UTC').tz_localize(None) if tz else index
+    columns = {
+        'names': [list(c) if isinstance(c, tuple) else c for c in df.columns.tolist()],
+        'levels': list(df.columns.names) if isinstance(df.columns, pd.MultiIndex) else None,
+        'index_name': df.index.name,
+    }
+    values = np.ascontiguousarray(df.to_numpy(dtype=float))
+    return utc.asi8.tobytes(), tz, json.dumps(columns, default=str), values.tobytes()
+
+
+def _unpack_frame(index: bytes, tz: str, columns: str, values: bytes) -> pd.DataFrame:
+    spec = json.loads(columns)
+    idx = pd.DatetimeIndex(np.frombuffer(index, dtype=np.int64).view('datetime64[ns]'), name=spec['index_name'])
+    if tz:
+        idx = idx.tz_localize('UTC').tz_convert(tz)
+    if spec['levels'] is not None:
+        cols = pd.MultiIndex.from_tuples([tuple(c) for c in spec['names']], names=spec['levels'])
+    else:
+        cols = pd.Index(spec['names'])
+    data = np.frombuffer(values, dtype=np.float64).reshape(len(idx), len(cols)).copy()
+    return pd.DataFrame(data, index=idx, columns=cols)
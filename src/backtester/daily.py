@@ -0,0 +1,103 @@
+"""
+逐日回測結果的欄式容器
+
+每個欄位是一個 NumPy 陣列；需要逐列物件時才在迭代 / 索引時建立，
+可零複製轉成 pandas / Arrow，並以 .npz（不含 pickle）存取。
+"""
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class DailyColumns:
+    """
+    欄式逐日結果，行為與 list 相容（len、索引、迭代）
+
+    - 整數索引返回單列物件（row_factory(**欄位)，預設為 dict）
+    - 切片 / 布林遮罩 / 整數陣列返回共用記憶體（切片時）的新 DailyColumns
+    """
+
+    def __init__(self, columns: Dict[str, Any], row_factory: Optional[Callable[..., Any]] = None):
+        self.columns = {name: _plain_array(values) for name, values in columns.items()}
+        lengths = {len(v) for v in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"欄位長度不一致: { {k: len(v) for k, v in self.columns.items()} }")
+        self.row_factory = row_factory
+
+    @classmethod
+    def empty(cls, fields: Sequence[str] = (), row_factory: Optional[Callable[..., Any]] = None) -> 'DailyColumns':
+        return cls({f: np.empty(0) for f in fields}, row_factory)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Any], fields: Sequence[str],
+                  row_factory: Optional[Callable[..., Any]] = None) -> 'DailyColumns':
+        """由逐列物件（屬性或 dict 鍵與 fields 相同）建立"""
+        def get(row, f):
+            return row[f] if isinstance(row, dict) else getattr(row, f)
+        return cls({f: np.array([get(r, f) for r in rows]) if rows else np.empty(0) for f in fields},
+                   row_factory)
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.columns)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        if isinstance(key, (int, np.integer)):
+            n = len(self)
+            if not -n <= key < n:
+                raise IndexError(key)
+            return self._row({f: v[key].item() for f, v in self.columns.items()})
+        return DailyColumns({f: v[key] for f, v in self.columns.items()}, self.row_factory)
+
+    def __iter__(self) -> Iterator[Any]:
+        names = self.fields
+        for values in zip(*(v.tolist() for v in self.columns.values())):
+            yield self._row(dict(zip(names, values)))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, DailyColumns):
+            return NotImplemented
+        return self.fields == other.fields and all(
+            np.array_equal(v, other.columns[f]) for f, v in self.columns.items()
+        )
+
+    def __repr__(self) -> str:
+        return f"DailyColumns({len(self)} rows × {len(self.columns)} fields)"
+
+    def _row(self, values: Dict[str, Any]):
+        return self.row_factory(**values) if self.row_factory is not None else values
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        names = self.fields
+        return [dict(zip(names, values)) for values in zip(*(v.tolist() for v in self.columns.values()))]
+
+    def to_pandas(self, index: Optional[str] = None) -> pd.DataFrame:
+        """不複製欄位陣列的 DataFrame；index 指定欄位時設為索引"""
+        df = pd.DataFrame(self.columns, copy=False)
+        return df.set_index(index) if index else df
+
+    def to_arrow(self):
+        """pyarrow.Table（數值欄位零複製；需安裝 pyarrow）"""
+        import pyarrow as pa
+        return pa.table(self.columns)
+
+    def save(self, path):
+        """存成 .npz，不使用 pickle"""
+        np.savez(path, **{f'c:{f}': v for f, v in self.columns.items()})
+
+    @classmethod
+    def load(cls, path, row_factory: Optional[Callable[..., Any]] = None) -> 'DailyColumns':
+        with np.load(path, allow_pickle=False) as z:
+            return cls({k[2:]: z[k] for k in z.files if k.startswith('c:')}, row_factory)
+
+
+def _plain_array(values) -> np.ndarray:
+    """object 陣列（字串）轉成定長字串，使 .npz 與 Arrow 不需要 pickle"""
+    arr = np.asarray(values)
+    return arr.astype(str) if arr.dtype == object else arr
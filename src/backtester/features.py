@@ -0,0 +1,131 @@
+"""
+向量化特徵
+
+- streak_lengths：連續天數（run-length）計數
+- market_features：由 QQQ / ^VIX / ^TNX 一次算出回測與策略評分使用的逐日特徵矩陣
+- day_records：特徵矩陣還原成 strategy.score 使用的逐日巢狀 dict
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.backtester.bars import is_intraday, session_lagged
+from src.backtester.fetch import align_closes
+
+
+def streak_lengths(condition) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    每一列的連續 True / False 天數（自上次翻轉起算，含當日）
+
+    返回 (days_true, days_false)，每列只有其中一個非零；
+    NaN 列兩者皆為 0，並中斷前後的連續計數。
+    二維輸入 (日期 × 標的) 沿第 0 軸逐欄計算。
+    """
+    cond = np.asarray(condition, dtype=float)
+    n = len(cond)
+    if n == 0:
+        return np.zeros(cond.shape, dtype=np.int64), np.zeros(cond.shape, dtype=np.int64)
+
+    # 狀態：1 = True、0 = False、-1 = NaN；狀態改變處為新區段起點
+    state = np.where(np.isnan(cond), -1, (cond != 0).astype(np.int64))
+    starts = np.empty(cond.shape, dtype=bool)
+    starts[0] = True
+    starts[1:] = state[1:] != state[:-1]
+
+    idx = np.arange(n).reshape((n,) + (1,) * (cond.ndim - 1))
+    run_start = np.maximum.accumulate(np.where(starts, idx, 0), axis=0)
+    length = idx - run_start + 1
+    return np.where(state == 1, length, 0), np.where(state == 0, length, 0)
+
+
+def market_features(frames: Dict[str, pd.DataFrame], bar_interval: str = '1d', dropna: bool = True) -> pd.DataFrame:
+    """
+    由 QQQ / ^VIX / ^TNX 計算回測特徵（預設移除 NaN 列）
+
+    滾動視窗以 K 線根數計（盤中週期的 ma20 為 20 根）；盤中週期時 QQQ 為該週期的 K 線，
+    VIX / 10Y 仍為日線，每根 K 線只使用前一個交易日的收盤。
+    """
+    qqq, vix, tnx = frames["QQQ"], frames["^VIX"], frames["^TNX"]
+    intraday = is_intraday(bar_interval)
+    if intraday:
+        market = {t: frames[t] for t in ("^VIX", "^TNX")}
+        levels = pd.DataFrame({
+            t: session_lagged(df[['Close']], qqq.index)['Close'] if not df.empty else float('nan')
+            for t, df in market.items()
+        }, index=qqq.index)
+    else:
+        levels = align_closes(frames, base="QQQ")
+
+    # 合併數據
+    df = pd.DataFrame()
+    df['close'] = qqq['Close']
+    df['high'] = qqq['High']
+    df['low'] = qqq['Low']
+    df['volume'] = qqq['Volume']
+    df['change_pct'] = qqq['Close'].pct_change() * 100
+
+    # 計算技術指標
+    df['ma5'] = qqq['Close'].rolling(5).mean()
+    df['ma20'] = qqq['Close'].rolling(20).mean()
+    df['ma60'] = qqq['Close'].rolling(60).mean()
+
+    # RSI
+    delta = qqq['Close'].diff()
+    gain = delta.where(delta > 0, 0).rolling(14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
+    rs = gain / loss
+    df['rsi'] = 100 - (100 / (1 + rs))
+
+    # 成交量比
+    df['volume_ratio'] = qqq['Volume'] / qqq['Volume'].rolling(20).mean()
+
+    # MA20 相對位置
+    df['ma20_diff_pct'] = (df['close'] - df['ma20']) / df['ma20'] * 100
+    df['above_ma20'] = df['close'] > df['ma20']
+
+    # 計算連續站上/跌破天數
+    df['days_above_ma20'], df['days_below_ma20'] = streak_lengths(df['above_ma20'])
+
+    # 加入 VIX
+    def aligned(change: pd.Series) -> pd.Series:
+        if intraday:
+            return session_lagged(change.to_frame(), df.index).iloc[:, 0]
+        return change.reindex(df.index, method='ffill')
+
+    if not vix.empty:
+        df['vix'] = levels["^VIX"]
+        df['vix_change'] = aligned(vix['Close'].pct_change()) * 100
+    else:
+        df['vix'] = 20
+        df['vix_change'] = 0
+
+    # 加入 10Y
+    if not tnx.empty:
+        df['us10y'] = levels["^TNX"]
+        df['us10y_change'] = aligned(tnx['Close'].diff())
+    else:
+        df['us10y'] = 4.5
+        df['us10y_change'] = 0
+
+    # 移除 NaN
+    return df.dropna() if dropna else df
+
+
+def day_records(features: pd.DataFrame) -> List[Dict]:
+    """把特徵矩陣還原成 strategy.score 使用的逐日巢狀 dict（沒有 score_batch 的策略使用）"""
+    return [
+        {
+            'qqq': {'close': row['close'], 'change_pct': row['change_pct']},
+            'vix': {'value': row['vix']},
+            'us10y': {'change': row['us10y_change']},
+            'technicals': {
+                'ma20': row['ma20'],
+                'ma20_diff_pct': row['ma20_diff_pct'],
+                'volume_ratio': row['volume_ratio'],
+                'consecutive_days_above_ma20': int(row['days_above_ma20']),
+                'consecutive_days_below_ma20': int(row['days_below_ma20']),
+            },
+        }
+        for row in features.to_dict('records')
+    ]
@@ -0,0 +1,51 @@
+"""
+多 ticker 並行抓取
+
+yfinance 每個 ticker 都是一次獨立的 HTTP 往返；以有限數量的執行緒同時發出，
+整批的等待時間約等於最慢的一次往返，而不是逐一相加。
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Sequence
+
+import pandas as pd
+
+
+def fetch_concurrent(tickers: Sequence[str], fetch_one: Callable[[str], pd.DataFrame],
+                     max_workers: int = 8) -> Dict[str, pd.DataFrame]:
+    """
+    以執行緒池同時呼叫 fetch_one(ticker)，依輸入順序返回 {ticker: DataFrame}
+
+    單一 ticker 失敗不影響其他 ticker，失敗者返回空 DataFrame。
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return {}
+
+    def _safe(ticker: str) -> pd.DataFrame:
+        try:
+            df = fetch_one(ticker)
+            return df if df is not None else pd.DataFrame()
+        except Exception as e:
+            print(f"❌ 抓取 {ticker} 失敗: {e}")
+            return pd.DataFrame()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers)))) as executor:
+        return dict(zip(tickers, executor.map(_safe, tickers)))
+
+
+def align_closes(frames: Dict[str, pd.DataFrame], base: str,
+                 column: str = 'Close', index: Optional[pd.Index] = None) -> pd.DataFrame:
+    """
+    把各 ticker 的單一欄位對齊到同一個索引（預設為 base 的索引），缺值向前填補
+
+    空 DataFrame 對應的欄位全為 NaN，由呼叫端決定預設值。
+    """
+    if index is None:
+        index = frames[base].index
+    aligned = pd.DataFrame(index=index)
+    for ticker, df in frames.items():
+        if df.empty or column not in df.columns:
+            aligned[ticker] = float('nan')
+        else:
+            aligned[ticker] = df[column].reindex(index, method='ffill')
+    return aligned
@@ -0,0 +1,183 @@
+"""
+共用回測核心
+
+各回測引擎都是「對齊的報酬 / 價格 + 目標配置 → 成交模型 → 路徑 → 指標」，
+成交模型與指標定義集中在這裡，引擎只負責準備輸入與組出各自的結果格式：
+
+- 成交模型
+  - fractional_pnl：損益 = 報酬 × 持有比例，可持有任意比例、不考慮現金；支援 (組合數 × 期數)
+  - share_fill：整數股、現金不足不買的逐期模擬（所有整數股引擎共用的唯一逐期迴圈）
+  - share_fill_batch：同一模型的多組版本，逐期迴圈內以陣列同時處理 (組合數 × 期數) 的目標配置
+- 指標（逐列計算，一維輸入視為單列）
+  - return_stats：平均、標準差、年化夏普、勝率、平均獲利 / 虧損、盈虧比
+  - max_drawdown：絕對回撤（累積損益）或相對回撤（淨值，比例）
+"""
+import math
+from typing import Dict
+
+import numpy as np
+
+from src.backtester.bars import TRADING_DAYS
+
+# 整數股成交的交易明細（row 為該筆交易在價格序列中的列位置）
+TRADE_DTYPE = np.dtype([
+    ('row', np.int64), ('action', 'U4'), ('shares', np.int64), ('price', np.float64), ('value', np.float64),
+])
+
+
+def fractional_pnl(returns, held) -> np.ndarray:
+    """每期損益（%）= 報酬（%）× 持有配置（%）/ 100，held 可為 (組合數 × 期數)"""
+    return np.asarray(returns) * (np.asarray(held) / 100)
+
+
+def share_fill(close, target, initial_capital: float, record: bool = False) -> Dict:
+    """
+    整數股成交模型
+
+    每期以收盤價把持股調整到 int(淨值 × 目標比例 / 價格) 股，買入金額超過現金時該期不買。
+    target 為比例（0 ~ 1）。返回 nav（每期收盤淨值）、trades（交易次數）與期末 cash / shares；
+    record 時另含每期 cash_series / shares_series 與 ledger（TRADE_DTYPE，每期最多一筆）。
+    """
+    close = np.asarray(close, dtype=float)
+    target = np.asarray(target, dtype=float)
+    n = min(len(close), len(target))
+    nav = np.empty(n)
+    if record:
+        cash_series = np.empty(n)
+        shares_series = np.empty(n, dtype=np.int64)
+        ledger = np.empty(n, dtype=TRADE_DTYPE)
+
+    cash = float(initial_capital)
+    shares = 0
+    trades = 0
+    for i, (price, target_pct) in enumerate(zip(close[:n].tolist(), target[:n].tolist())):
+        total_value = cash + shares * price
+        target_value = total_value * target_pct
+        target_shares = int(target_value / price) if price > 0 else 0
+
+        if target_shares > shares:
+            shares_to_buy = target_shares - shares
+            cost = shares_to_buy * price
+            if cost <= cash:
+                shares += shares_to_buy
+                cash -= cost
+                if record:
+                    ledger[trades] = (i, 'BUY', shares_to_buy, price, cost)
+                trades += 1
+        elif target_shares < shares:
+            shares_to_sell = shares - target_shares
+            proceeds = shares_to_sell * price
+            shares -= shares_to_sell
+            cash += proceeds
+            if record:
+                ledger[trades] = (i, 'SELL', shares_to_sell, price, proceeds)
+            trades += 1
+
+        nav[i] = cash + shares * price
+        if record:
+            cash_series[i] = cash
+            shares_series[i] = shares
+
+    out = {'nav': nav, 'trades': trades, 'cash': cash, 'shares': shares}
+    if record:
+        out.update(cash_series=cash_series, shares_series=shares_series, ledger=ledger[:trades])
+    return out
+
+
+def share_fill_batch(close, targets, initial_capital: float) -> Dict:
+    """
+    share_fill 的多組版本
+
+    targets 為 (組合數 × 期數) 的比例，每期對所有組合同時套用與 share_fill 相同的成交規則，
+    結果與逐組呼叫 share_fill 相同。返回 nav（組合數 × 期數）與每組的 trades / cash / shares。
+    """
+    close = np.asarray(close, dtype=float)
+    targets = np.atleast_2d(np.asarray(targets, dtype=float))
+    rows = len(targets)
+    n = min(len(close), targets.shape[1])
+    nav = np.empty((rows, n))
+
+    cash = np.full(rows, float(initial_capital))
+    shares = np.zeros(rows, dtype=np.int64)
+    trades = np.zeros(rows, dtype=np.int64)
+    for i, price in enumerate(close[:n].tolist()):
+        total_value = cash + shares * price
+        target_value = total_value * targets[:, i]
+        if price > 0:
+            target_shares = np.trunc(target_value / price).astype(np.int64)
+        else:
+            target_shares = np.zeros(rows, dtype=np.int64)
+
+        delta = target_shares - shares
+        amount = delta * price
+        buy = (delta > 0) & (amount <= cash)
+        sell = delta < 0
+        fill = buy | sell
+        shares = np.where(fill, target_shares, shares)
+        cash = np.where(fill, cash - amount, cash)
+        trades += fill
+
+        nav[:, i] = cash + shares * price
+
+    return {'nav': nav, 'trades': trades, 'cash': cash, 'shares': shares}
+
+
+def level_returns(levels) -> np.ndarray:
+    """淨值路徑的逐期報酬（比例），沿最後一軸"""
+    levels = np.asarray(levels, dtype=float)
+    return np.diff(levels, axis=-1) / levels[..., :-1]
+
+
+def return_stats(returns, periods: int = TRADING_DAYS, ddof: int = 0,
+                 min_std: float = 0.0) -> Dict[str, np.ndarray]:
+    """
+    逐列的報酬統計
+
+    夏普 = 平均 × periods / (標準差 × sqrt(periods))，無風險利率為 0；
+    只有一期或標準差不大於 min_std 時夏普為 0（報酬固定時標準差只剩浮點誤差）。
+    沒有虧損期時平均虧損記為 1。
+    """
+    returns = np.atleast_2d(np.asarray(returns, dtype=float))
+    rows, days = returns.shape
+    zeros = np.zeros(rows)
+    if days == 0:
+        return {'mean': zeros, 'std': zeros, 'sharpe_ratio': zeros, 'win_rate': zeros,
+                'avg_gain': zeros, 'avg_loss': np.ones(rows), 'profit_loss_ratio': zeros}
+
+    wins = returns > 0
+    losses = returns < 0
+    n_wins = wins.sum(axis=1)
+    n_losses = losses.sum(axis=1)
+    avg_gain = np.divide(np.where(wins, returns, 0).sum(axis=1), n_wins, out=np.zeros(rows), where=n_wins > 0)
+    avg_loss = np.divide(np.where(losses, -returns, 0).sum(axis=1), n_losses, out=np.ones(rows), where=n_losses > 0)
+
+    mean = returns.mean(axis=1)
+    std = returns.std(axis=1, ddof=ddof) if days > ddof else zeros
+    if days > 1:
+        sharpe = np.divide(mean * periods, std * math.sqrt(periods), out=np.zeros(rows), where=std > min_std)
+    else:
+        sharpe = zeros
+
+    return {
+        'mean': mean, 'std': std, 'sharpe_ratio': sharpe, 'win_rate': n_wins / days * 100,
+        'avg_gain': avg_gain, 'avg_loss': avg_loss,
+        'profit_loss_ratio': np.divide(avg_gain, avg_loss, out=np.zeros(rows), where=avg_loss > 0),
+    }
+
+
+def max_drawdown(levels, relative: bool = False) -> np.ndarray:
+    """
+    逐列的最大回撤（>= 0）
+
+    relative=False：peak - level（累積損益路徑，單位與 levels 相同）
+    relative=True：(peak - level) / peak（淨值路徑，比例；peak 不為正的點不計）
+    峰值自路徑第一個點起算。
+    """
+    levels = np.atleast_2d(np.asarray(levels, dtype=float))
+    if levels.shape[1] == 0:
+        return np.zeros(len(levels))
+    peak = np.maximum.accumulate(levels, axis=1)
+    drop = peak - levels
+    if relative:
+        drop = np.divide(drop, peak, out=np.zeros_like(drop), where=peak > 0)
+    return np.maximum(drop.max(axis=1), 0)
@@ -1,27 +1,23 @@
-import math
+import numpy as np
+
+from src.backtester import kernel
 
 def equity_curve(prices, position=0.0):
-    # 僅做簡單「隔日收盤報酬 × 部位」疊代的 equity 曲線
-    eq=[1.0]
-    for i in range(1, len(prices)):
-        p0=prices[i-1]["close"]; p1=prices[i]["close"]
-        ret = (p1/p0 - 1.0) * position
-        eq.append(eq[-1]*(1.0+ret))
-    return eq
+    # 僅做簡單「隔日收盤報酬 × 部位」疊代的 equity 曲線（kernel.fractional_pnl 成交模型）
+    close = np.array([p["close"] for p in prices], dtype=float)
+    if len(close) < 2: return [1.0]
+    rets = kernel.fractional_pnl(close[1:] / close[:-1] - 1.0, position * 100)
+    return np.cumprod(np.concatenate(([1.0], 1.0 + rets))).tolist()
 
 def simple_stats(eq):
     if not eq: return {"final":1.0,"maxdd":0.0,"sharpe":0.0}
     final=eq[-1]
     # 近似日報酬
-    rets=[(eq[i]/eq[i-1]-1.0) for i in range(1,len(eq))]
-    if not rets: return {"final":final,"maxdd":0.0,"sharpe":0.0}
+    levels=np.asarray(eq, dtype=float)
+    rets=kernel.level_returns(levels)
+    if not len(rets): return {"final":final,"maxdd":0.0,"sharpe":0.0}
     # 最大回撤
-    peak=eq[0]; maxdd=0.0
-    for x in eq:
-        peak=max(peak,x)
-        maxdd=max(maxdd, (peak-x)/peak)
-    # Sharpe（不年化、樣本 stdev）
-    mu=sum(rets)/len(rets)
-    sd=(sum((r-mu)**2 for r in rets)/max(1,len(rets)-1))**0.5
-    sharpe = (mu/sd) if sd>1e-12 else 0.0
+    maxdd=float(kernel.max_drawdown(levels, relative=True)[0])
+    # Sharpe（不年化、樣本 stdev；stdev <= 1e-12 視為 0，避免固定報酬的浮點誤差放大）
+    sharpe=float(kernel.return_stats(rets, periods=1, ddof=1, min_std=1e-12)["sharpe_ratio"][0])
     return {"final":final,"maxdd":maxdd,"sharpe":sharpe}
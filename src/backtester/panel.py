@@ -0,0 +1,45 @@
+"""
+多標的面板數據
+
+從 data/symbols.yaml 讀取標的清單，將 data/prices/{SYMBOL}.csv 對齊成
+(日期 × 標的) 的 DataFrame，每個欄位（close、volume ...）一張表。
+"""
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import pandas as pd
+import yaml
+
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def load_universe(path) -> List[str]:
+    """symbols.yaml 的 universe（大寫、去重、保留順序）"""
+    cfg = yaml.safe_load(Path(path).read_text(encoding='utf-8')) or {}
+    symbols = [str(s).strip().upper() for s in cfg.get('universe', []) if s]
+    return list(dict.fromkeys(symbols))
+
+
+def load_price_panel(symbols: Sequence[str], prices_dir,
+                     fields: Sequence[str] = PANEL_FIELDS) -> Dict[str, pd.DataFrame]:
+    """
+    讀取各標的日線 CSV，返回 {欄位: DataFrame(日期 × 標的)}
+
+    日期取所有標的的聯集並排序，某標的當日無資料時為 NaN；缺檔的標的略過。
+    """
+    prices_dir = Path(prices_dir)
+    columns: Dict[str, List[pd.Series]] = {f: [] for f in fields}
+
+    for symbol in symbols:
+        fp = prices_dir / f"{symbol}.csv"
+        if not fp.exists():
+            print(f"⚠️ 略過 {symbol}: 找不到 {fp}")
+            continue
+        df = pd.read_csv(fp, usecols=['date', *fields], parse_dates=['date'])
+        df = df.drop_duplicates('date', keep='last').set_index('date').sort_index()
+        for f in fields:
+            columns[f].append(df[f].astype(float).rename(symbol))
+
+    if not columns[fields[0]]:
+        return {f: pd.DataFrame() for f in fields}
+    return {f: pd.concat(series, axis=1).sort_index() for f, series in columns.items()}
@@ -0,0 +1,127 @@
+"""
+多進程參數評估
+
+市場數據只放進共享記憶體一次，工作進程在初始化時掛載成 DataFrame，
+之後每個任務只傳遞參數；結果依輸入順序返回。
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class SharedFrame:
+    """把數值型 DataFrame（索引 + 欄位）複製到一塊共享記憶體"""
+
+    def __init__(self, df: pd.DataFrame):
+        values = df.to_numpy(dtype=float)
+        index = df.index
+        tz = getattr(index, 'tz', None)
+        is_datetime = isinstance(index, pd.DatetimeIndex)
+        index_values = index.asi8 if is_datetime else np.asarray(index, dtype=np.int64)
+
+        n_rows, n_cols = values.shape
+        nbytes = max((n_rows + n_rows * n_cols) * 8, 8)
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.spec = {
+            'name': self._shm.name,
+            'rows': n_rows,
+            'columns': df.columns,
+            'dtypes': df.dtypes.to_dict(),
+            'datetime_index': is_datetime,
+            'unit': getattr(index, 'unit', 'ns') if is_datetime else None,
+            'tz': str(tz) if tz is not None else None,
+            'index_name': index.name,
+        }
+        idx_view, val_view = _views(self._shm, n_rows, n_cols)
+        idx_view[:] = index_values
+        val_view[:] = values
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> 'SharedFrame':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def attach(spec: dict):
+        """在工作進程中掛載共享區塊，返回 (DataFrame, shm)；shm 需保持存活"""
+        try:
+            shm = shared_memory.SharedMemory(name=spec['name'], track=False)
+        except TypeError:  # Python < 3.13
+            shm = shared_memory.SharedMemory(name=spec['name'])
+        columns = spec['columns']
+        idx_view, val_view = _views(shm, spec['rows'], len(columns))
+
+        if spec['datetime_index']:
+            index = pd.DatetimeIndex(idx_view.view(f"datetime64[{spec['unit']}]"), name=spec['index_name'])
+            if spec['tz']:
+                index = index.tz_localize('UTC').tz_convert(spec['tz'])
+        else:
+            index = pd.Index(idx_view, name=spec['index_name'])
+
+        df = pd.DataFrame(val_view, index=index, columns=columns, copy=False)
+        for col, dtype in spec['dtypes'].items():
+            if dtype != np.float64:
+                df[col] = df[col].astype(dtype)
+        return df, shm
+
+
+def _views(shm: shared_memory.SharedMemory, n_rows: int, n_cols: int):
+    idx_view = np.ndarray((n_rows,), dtype=np.int64, buffer=shm.buf)
+    val_view = np.ndarray((n_rows, n_cols), dtype=np.float64, buffer=shm.buf, offset=n_rows * 8)
+    return idx_view, val_view
+
+
+# 工作進程狀態（由 initializer 設定）
+_worker_frame: Optional[pd.DataFrame] = None
+_worker_shm = None
+
+
+def _init_worker(spec: dict):
+    global _worker_frame, _worker_shm
+    _worker_frame, _worker_shm = SharedFrame.attach(spec)
+
+
+def _call(task):
+    func, payload = task
+    return func(_worker_frame, payload)
+
+
+def resolve_workers(workers: int) -> int:
+    """workers <= 0 代表使用全部 CPU"""
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def parallel_map(func: Callable[[pd.DataFrame, Any], Any], payloads: Iterable,
+                 frame: pd.DataFrame, workers: int = 1, chunksize: int = 1) -> Iterator:
+    """
+    對每個 payload 執行 func(frame, payload)，依輸入順序逐一返回結果
+
+    func 必須是模組層級函式（可被 pickle）；workers == 1 時直接在本進程執行。
+    """
+    payloads = list(payloads)
+    workers = min(resolve_workers(workers), max(len(payloads), 1))
+
+    if workers == 1:
+        for payload in payloads:
+            yield func(frame, payload)
+        return
+
+    with SharedFrame(frame) as shared:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared.spec,)) as executor:
+            try:
+                yield from executor.map(_call, [(func, p) for p in payloads], chunksize=chunksize)
+            finally:
+                # 呼叫端提前停止讀取（close）時取消尚未開始的任務，不必等全部跑完
+                executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,147 @@
+"""
+多目標 Pareto 前緣
+
+優化器原本把每個參數組合的績效壓成一個純量（綜合評分或夏普）只留最佳者；
+這裡改為保留所有目標上都不被其他組合支配的參數組合（非支配前緣）並存成 JSON，
+之後調整各目標的權重時只需在前緣上重新挑選（select），不必重跑參數搜索。
+"""
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from src.backtester.results import _plain
+
+# 預設目標：指標名稱 → 方向（1 = 越大越好，-1 = 越小越好）
+OBJECTIVES = {'alpha': 1, 'sharpe_ratio': 1, 'max_drawdown': -1, 'accuracy': 1}
+
+
+def _dominated(points: np.ndarray, others: np.ndarray, block: int) -> np.ndarray:
+    """points 中每一點是否被 others 中任一點支配（所有目標 >= 且至少一個 >，越大越好）"""
+    out = np.zeros(len(points), dtype=bool)
+    for start in range(0, len(others), block):
+        chunk = others[start:start + block]
+        ge = np.ones((len(points), len(chunk)), dtype=bool)
+        gt = np.zeros_like(ge)
+        for j in range(points.shape[1]):
+            a, b = chunk[None, :, j], points[:, None, j]
+            ge &= a >= b
+            gt |= a > b
+        out |= (ge & gt).any(axis=1)
+    return out
+
+
+def pareto_mask(values, senses: Sequence[int] = None, block: int = 1024) -> np.ndarray:
+    """
+    (點數 × 目標數) 的非支配點遮罩
+
+    先把各目標轉成越大越好並依字典序由好到壞排序（能支配某點的點必排在它前面），
+    再逐塊與目前前緣、以及塊內互相比較，只需 O(點數 × 前緣大小) 次向量化比較，
+    10^5 個點約一秒內完成。含 NaN / inf 的點不列入前緣；完全相同的點互不支配，都會保留。
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    n, k = values.shape
+    points = values * (np.ones(k) if senses is None else np.asarray(senses, dtype=float))
+
+    idx = np.flatnonzero(np.isfinite(points).all(axis=1))
+    order = idx[np.lexsort(-points[idx][:, ::-1].T)] if k else idx
+
+    front = np.empty((0, k))
+    members = []
+    for start in range(0, len(order), block):
+        rows = order[start:start + block]
+        cand = points[rows]
+        keep = ~_dominated(cand, front, block)
+        rows, cand = rows[keep], cand[keep]
+        keep = ~_dominated(cand, cand, block)
+        front = np.concatenate((front, cand[keep]))
+        members.append(rows[keep])
+
+    mask = np.zeros(n, dtype=bool)
+    if members:
+        mask[np.concatenate(members)] = True
+    return mask
+
+
+def metric_columns(rows: Sequence[Dict]) -> Dict[str, List]:
+    """list of 指標 dict 轉成 {指標: 逐組合的值}（缺少的值記為 NaN）"""
+    keys = dict.fromkeys(key for row in rows for key in row)
+    return {key: [row.get(key, np.nan) for row in rows] for key in keys}
+
+
+def front_document(strategy: str, params_list: Sequence[Dict], columns: Dict[str, Sequence],
+                   objectives: Dict[str, int] = None, meta: Dict = None) -> Dict:
+    """
+    計算前緣並組成可保存的文件
+
+    columns 為 {指標: 逐組合的值}（與 params_list 同順序），缺少某個目標的組合不列入前緣；
+    前緣中每一組保存完整的 params 與 columns 中的所有指標，依輸入順序排列。
+    """
+    objectives = dict(objectives or OBJECTIVES)
+    missing = np.full(len(params_list), np.nan)
+    values = np.column_stack([np.asarray(columns.get(name, missing), dtype=float) for name in objectives]) \
+        if len(params_list) else np.empty((0, len(objectives)))
+    front = np.flatnonzero(pareto_mask(values, list(objectives.values())))
+    return {
+        'strategy': strategy,
+        'objectives': objectives,
+        'evaluated': len(params_list),
+        'created': datetime.now().isoformat(),
+        'meta': _plain(meta or {}),
+        'front': [
+            {'params': _plain(params_list[i]), 'metrics': {k: _plain(v[i]) for k, v in columns.items()}}
+            for i in front.tolist()
+        ],
+    }
+
+
+def save_front(path: str, strategy: str, params_list: Sequence[Dict], columns: Dict[str, Sequence],
+               objectives: Dict[str, int] = None, meta: Dict = None) -> Dict:
+    """計算前緣並寫入 JSON，返回文件內容"""
+    doc = front_document(strategy, params_list, columns, objectives, meta)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+    return doc
+
+
+def load_front(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def select(doc: Dict, weights: Dict[str, float]) -> Dict:
+    """
+    以 Σ 權重 × 指標 在前緣上挑出最佳的一組（同分取前者），返回 {'params', 'metrics', 'score'}
+
+    權重的正負號決定方向（例如最大回撤給負權重）。權重只涵蓋前緣目標且方向與目標一致時，
+    結果與在全部組合上挑選的最佳分數相同；用到其他指標時只在前緣內挑選。
+    """
+    if not doc['front']:
+        raise ValueError(f"{doc.get('strategy')} 的 Pareto 前緣是空的")
+    missing = [name for name in weights if name not in doc['front'][0]['metrics']]
+    if missing:
+        raise ValueError(f"前緣沒有指標 {missing}")
+    scores = np.array([
+        sum(w * entry['metrics'][name] for name, w in weights.items()) for entry in doc['front']
+    ], dtype=float)
+    best = int(np.argmax(scores))
+    return {**doc['front'][best], 'score': float(scores[best])}
+
+
+def parse_weights(text: str) -> Dict[str, float]:
+    """'alpha=0.3,sharpe_ratio=0.25,max_drawdown=-0.1' → {'alpha': 0.3, ...}"""
+    weights = {}
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        name, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f"權重格式應為 名稱=數值: {item!r}")
+        weights[name.strip()] = float(value)
+    return weights
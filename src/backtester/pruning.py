@@ -0,0 +1,195 @@
+"""
+網格優化的上界剪枝
+
+把歷史切成區段逐段推進每個參數組合的損益路徑，以前綴統計加上「剩餘天數最樂觀情況」
+算出完整期間綜合評分的上界；上界已低於目前第 k 名的確定分數時放棄該組合。
+
+剩餘天數的漲跌幅已知、配置落在策略配置表的 [最小, 最大] 之間，因此：
+- 報酬 / Alpha：前綴累計 + 每天 max(漲跌幅 × 最小配置, 漲跌幅 × 最大配置)
+- 勝率：前綴獲利天數 + 剩餘天數中可能獲利的天數
+- 準確率：假設剩餘每天都產生正確預測
+- 夏普：以平均數上界與平方和下界界定 mean / std
+- 最大回撤：只會增加，前綴回撤即為下界
+
+存活者最後仍以完整回測重算，因此最佳組合與不剪枝時相同。
+"""
+import math
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+from src.backtester.bars import TRADING_DAYS
+
+# 綜合評分各指標的權重（與 backtest.composite_score 相同）
+COMPOSITE_WEIGHTS = {
+    'alpha': 0.30, 'sharpe_ratio': 0.25, 'win_rate': 0.20, 'accuracy': 0.15, 'max_drawdown': -0.10,
+}
+
+# 指標四捨五入（alpha / 夏普 / 回撤到 0.01，勝率 / 準確率到 0.1）可能造成的最大評分差
+ROUNDING_SLACK = 0.30 * 0.005 + 0.25 * 0.005 + 0.20 * 0.05 + 0.15 * 0.05 + 0.10 * 0.005 + 1e-6
+
+# rows(組合索引, start, end) -> (配置, 訊號代碼)，皆為 (組合數, end - start)
+RowEvaluator = Callable[[np.ndarray, int, int], Tuple[np.ndarray, np.ndarray]]
+# full(組合索引) -> 完整回測指標 {指標: (組合數,)}，須含 composite_score
+FullEvaluator = Callable[[np.ndarray], Dict[str, np.ndarray]]
+
+
+class PrefixBound:
+    """
+    (組合數) 條損益路徑的前綴統計
+
+    第 i 天（i >= 1）的損益 = change[i] × 第 i-2 列配置 / 100（第 1 天為 50%），
+    預測以第 i-1 列的訊號比對 change[i]，與 backtest.lagged_pnl / path_metrics 相同。
+    """
+
+    def __init__(self, n: int, change: np.ndarray, alloc_range: Tuple[float, float], buy: int, sell: int,
+                 periods: int = TRADING_DAYS):
+        self.change = change
+        self.periods = periods                  # 夏普年化因子
+        self.buy, self.sell = buy, sell
+        self.rows = 0                           # 已處理的列數
+        self.held = np.full((n, 2), 50.0)       # 最後兩列的配置（第 i 天使用 held[:, 0]）
+        self.last_code = np.zeros(n, dtype=np.int8)
+        self.cumulative = np.zeros(n)
+        self.peak = np.full(n, -np.inf)         # 與 path_metrics 相同，不以 0 為起始高點
+        self.max_dd = np.zeros(n)
+        self.wins = np.zeros(n)
+        self.total = np.zeros(n)
+        self.sumsq = np.zeros(n)
+        self.predictions = np.zeros(n)
+        self.correct = np.zeros(n)
+
+        # 第 i 天之後（含）剩餘天數的最樂觀統計，days = change[1:]
+        lo, hi = alloc_range[0] / 100, alloc_range[1] / 100
+        days = change[1:]
+        best = np.maximum(days * lo, days * hi)
+        can_win = ((days > 0) & (hi > 0)) | ((days < 0) & (lo < 0))
+        min_sq = np.where((lo <= 0) & (hi >= 0), 0.0, np.minimum((days * lo) ** 2, (days * hi) ** 2))
+
+        def suffix(values):
+            return np.concatenate((np.cumsum(values[::-1])[::-1], [0.0]))
+
+        self._future_best = suffix(best)
+        self._future_wins = suffix(can_win.astype(float))
+        self._future_sq = suffix(min_sq)
+        self._future_moves = suffix((days != 0).astype(float))
+
+    def take(self, keep: np.ndarray):
+        """只保留 keep 遮罩內的組合"""
+        for name in ('held', 'last_code', 'cumulative', 'peak', 'max_dd', 'wins',
+                     'total', 'sumsq', 'predictions', 'correct'):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def update(self, allocations: np.ndarray, codes: np.ndarray):
+        """推進下一段列（配置與訊號代碼為 (組合數, 列數)）"""
+        start = self.rows
+        n_rows = allocations.shape[1]
+        held = np.concatenate((self.held, allocations), axis=1)
+        prev_codes = np.concatenate((self.last_code[:, None], codes), axis=1)
+
+        first = max(start, 1)                   # 第 0 列沒有損益
+        offset = first - start
+        day_change = self.change[first:start + n_rows]
+        pnls = day_change * (held[:, offset:n_rows] / 100)
+        day_codes = prev_codes[:, offset:n_rows]
+
+        path = self.cumulative[:, None] + np.cumsum(pnls, axis=1)
+        peak = np.maximum(self.peak[:, None], np.maximum.accumulate(path, axis=1))
+        if path.shape[1]:
+            self.max_dd = np.maximum(self.max_dd, (peak - path).max(axis=1))
+            self.cumulative = path[:, -1]
+            self.peak = peak[:, -1]
+        self.wins += (pnls > 0).sum(axis=1)
+        self.total += pnls.sum(axis=1)
+        self.sumsq += (pnls ** 2).sum(axis=1)
+        is_buy = day_codes == self.buy
+        is_sell = day_codes == self.sell
+        self.predictions += (is_buy | is_sell).sum(axis=1)
+        self.correct += ((is_buy & (day_change > 0)) | (is_sell & (day_change < 0))).sum(axis=1)
+
+        self.held = held[:, -2:]
+        self.last_code = prev_codes[:, -1]
+        self.rows = start + n_rows
+
+    def upper_bound(self, qqq_return: float) -> np.ndarray:
+        """完整期間綜合評分的上界（未加四捨五入餘裕）"""
+        days = len(self.change) - 1
+        if days <= 0:
+            return np.full(len(self.total), np.inf)
+        done = max(self.rows - 1, 0)            # 已計入的損益天數
+        w = COMPOSITE_WEIGHTS
+
+        total_ub = self.total + self._future_best[done]
+        win_ub = (self.wins + self._future_wins[done]) / days * 100
+        moves = self._future_moves[done]
+        acc_ub = np.divide((self.correct + moves) * 100, self.predictions + moves,
+                           out=np.zeros_like(self.total), where=(self.predictions + moves) > 0)
+
+        # 夏普 = sqrt(periods) · m / sqrt(q - m²)，m 越大、q 越小越高
+        if days > 1:
+            m = total_ub / days
+            q = (self.sumsq + self._future_sq[done]) / days
+            var = q - m ** 2
+            ratio = np.divide(m, np.sqrt(np.maximum(var, 0)), out=np.full_like(m, np.inf), where=var > 0)
+            sharpe_ub = np.where(m <= 0, 0.0, ratio * math.sqrt(self.periods))
+        else:
+            sharpe_ub = np.zeros_like(total_ub)
+
+        return (w['alpha'] * (total_ub - qqq_return) + w['sharpe_ratio'] * sharpe_ub +
+                w['win_rate'] * win_ub + w['accuracy'] * acc_ub + w['max_drawdown'] * self.max_dd)
+
+
+def pruned_grid_search(n_combos: int, rows: RowEvaluator, full: FullEvaluator, change: np.ndarray,
+                       qqq_return: float, alloc_range: Tuple[float, float], signal_codes: Dict[str, int],
+                       top_k: int = 1, block: int = 21, seeds: int = None,
+                       periods: int = TRADING_DAYS) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    以上界剪枝評估 n_combos 個組合
+
+    1. 所有組合先跑第一段，依上界挑出 seeds 個完整回測，取第 top_k 名為門檻
+    2. 其餘組合逐段（長度每段加倍）推進，上界 + ROUNDING_SLACK 低於門檻者放棄
+    3. 未被放棄的組合完整回測
+
+    返回 (指標, 是否完整評估的遮罩)；被放棄的組合 composite_score 為 -inf，其餘指標為 NaN。
+    """
+    n_rows = len(change)
+    seeds = min(n_combos, seeds or max(top_k, math.ceil(n_combos / 16)))
+    active = np.arange(n_combos)
+    bound = PrefixBound(n_combos, change, alloc_range, signal_codes['BUY'], signal_codes['SELL'], periods)
+
+    end = min(block, n_rows)
+    bound.update(*rows(active, 0, end))
+    first_ub = bound.upper_bound(qqq_return)
+    seed_idx = np.sort(np.argsort(-first_ub, kind='stable')[:seeds])
+
+    out: Dict[str, np.ndarray] = {}
+    evaluated = np.zeros(n_combos, dtype=bool)
+
+    def record(idx: np.ndarray, metrics: Dict[str, np.ndarray]):
+        for k, v in metrics.items():
+            if k not in out:
+                out[k] = np.full(n_combos, np.nan)
+            out[k][idx] = v
+        evaluated[idx] = True
+
+    record(seed_idx, full(seed_idx))
+    threshold = np.sort(out['composite_score'][seed_idx])[::-1][min(top_k, seeds) - 1]
+
+    keep = ~np.isin(active, seed_idx)
+    active = active[keep]
+    bound.take(keep)
+
+    start = end
+    while start < n_rows and len(active):
+        end = min(start + block, n_rows)
+        bound.update(*rows(active, start, end))
+        alive = bound.upper_bound(qqq_return) + ROUNDING_SLACK >= threshold
+        active = active[alive]
+        bound.take(alive)
+        start = end
+        block *= 2                              # 存活者越少、區段越長，控制逐段呼叫次數
+
+    if len(active):
+        record(active, full(active))
+    out['composite_score'] = np.where(evaluated, out['composite_score'], -np.inf)
+    return out, evaluated
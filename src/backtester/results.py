@@ -0,0 +1,111 @@
+"""
+回測結果快取
+
+以「特徵資料指紋 + 策略名稱 + 參數」為鍵，把回測績效指標（BacktestResult.to_dict()）
+存進 SQLite；相同資料與參數再次回測時直接取回，總大小超過上限時淘汰最久未使用的紀錄。
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# 指標定義或回測邏輯改變時遞增，使舊紀錄自動失效
+SCHEMA_VERSION = 1
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """資料內容（索引、欄名、數值）的 SHA-256 指紋"""
+    h = hashlib.sha256()
+    h.update(repr([str(c) for c in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def result_key(fingerprint: str, strategy: str, params: Dict) -> str:
+    payload = json.dumps([SCHEMA_VERSION, fingerprint, strategy, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """SQLite 回測結果快取（以最後存取時間做 LRU 淘汰）"""
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            ' key TEXT PRIMARY KEY, metrics TEXT NOT NULL,'
+            ' size INTEGER NOT NULL, accessed REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def get(self, fingerprint: str, strategy: str, params: Dict) -> Optional[Dict]:
+        return self.get_many(fingerprint, strategy, [params])[0]
+
+    def get_many(self, fingerprint: str, strategy: str, params_list: Sequence[Dict]) -> List[Optional[Dict]]:
+        """依 params_list 順序返回快取的指標，未命中為 None"""
+        keys = [result_key(fingerprint, strategy, p) for p in params_list]
+        found: Dict[str, Dict] = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT key, metrics FROM results WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update((k, json.loads(m)) for k, m in rows)
+        if found:
+            now = time.time()
+            self._conn.executemany('UPDATE results SET accessed = ? WHERE key = ?', [(now, k) for k in found])
+            self._conn.commit()
+        return [found.get(k) for k in keys]
+
+    def put(self, fingerprint: str, strategy: str, params: Dict, metrics: Dict):
+        self.put_many(fingerprint, strategy, [(params, metrics)])
+
+    def put_many(self, fingerprint: str, strategy: str, items: Sequence[Tuple[Dict, Dict]]):
+        """寫入 (參數, 指標) 並在超過 max_bytes 時淘汰"""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for params, metrics in items:
+            blob = json.dumps(_plain(metrics), sort_keys=True)
+            rows.append((result_key(fingerprint, strategy, params), blob, len(blob), now))
+        self._conn.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', rows)
+        self._evict()
+        self._conn.commit()
+
+    def size(self) -> int:
+        return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+
+    def clear(self):
+        self._conn.execute('DELETE FROM results')
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def _evict(self):
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        freed = 0
+        stale = []
+        for key, size in self._conn.execute('SELECT key, size FROM results ORDER BY accessed'):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany('DELETE FROM results WHERE key = ?', stale)
+
+
+def _plain(value: Any) -> Any:
+    """numpy 純量轉成 JSON 可序列化的 Python 型別"""
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    return value.item() if hasattr(value, 'item') else value
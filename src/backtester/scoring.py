@@ -0,0 +1,311 @@
+"""
+向量化因子評分：以 bin edges + lookup table 重現各策略的 if/elif 評分階梯
+
+- 階梯 `if x > e_k` 由高至低 → 遞增 edges + searchsorted(side='left')
+- 階梯 `if x < e_k` 由低至高 → 遞增 edges + searchsorted(side='right')
+- NaN 與原始 Python 比較相同，一律落入 else 分支
+"""
+import math
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+SIGNALS = ('HOLD', 'BUY', 'SELL', 'WATCH', 'RISK_OFF')
+SIGNAL_CODES = {name: code for code, name in enumerate(SIGNALS)}
+SIGNAL_NAMES = np.array(SIGNALS, dtype=object)
+
+REGIMES = ('defense', 'neutral', 'offense')
+REGIME_CODES = {name: code for code, name in enumerate(REGIMES)}
+REGIME_NAMES = np.array(REGIMES, dtype=object)
+
+# (edges, table, side)
+PRICE_MOMENTUM = ([-2.0, -1.0, -0.5, 0.0, 0.5, 1.0, 2.0], [2, 3, 4, 5, 6, 7, 8, 9], 'left')
+MAG7 = ([-1.5, -0.5, 0.0, 0.5, 1.5], [3, 4, 5, 6, 7, 8], 'left')
+VIX_LEVEL = ([12, 15, 18, 22, 28, 35], [9, 8, 7, 5, 4, 3, 1], 'right')
+MA20_POSITION = ([-5, -3, -1, 0, 1, 3, 5], [2, 3, 4, 5, 6, 7, 8, 9], 'left')
+VIX_FILTER = ([15, 20, 25, 30], [8, 7, 5, 3, 2], 'right')
+
+# 債券：下緣 `x < e` 與上緣 `x > e` 兩段階梯
+BOND_LOWER = [-0.08, -0.05, -0.02]
+BOND_UPPER = [0.02, 0.05, 0.08]
+BOND_TABLE = np.array([8, 7, 6, 5, 4, 3, 2])
+
+# 成交量：列 = 漲跌方向 (跌, 平, 漲)，欄 = 量比區間 (<0.7, 0.7~1.2, 1.2~1.5, >1.5)
+VOLUME_EDGES = [1.2, 1.5]
+VOLUME_TABLE = np.array([
+    [6, 5, 3, 2],
+    [5, 5, 5, 5],
+    [4, 5, 8, 9],
+])
+
+# 配置：`if score <= e_k`
+ALLOCATION_EDGES = [2, 3, 4, 5, 6, 7, 8]
+DEFAULT_ALLOCATION = [10, 20, 35, 50, 60, 75, 85, 90]
+MA20_ALLOCATION = [0, 10, 25, 40, 55, 70, 85, 95]
+
+
+def frame_column(df: pd.DataFrame, name: str, default: float) -> np.ndarray:
+    """取出欄位為 float 陣列，缺欄時以預設值填滿（對應 row.get(name, default)）"""
+    if name in df.columns:
+        return df[name].to_numpy(dtype=float)
+    return np.full(len(df), default, dtype=float)
+
+
+def bucket(values, ladder) -> np.ndarray:
+    """依 (edges, table, side) 將數值映射為分數，NaN 給 else 分支分數"""
+    edges, table, side = ladder
+    table = np.asarray(table)
+    values = np.asarray(values, dtype=float)
+    scores = table[np.searchsorted(edges, values, side=side)]
+    fallback = table[0] if side == 'left' else table[-1]
+    return np.where(np.isnan(values), fallback, scores)
+
+
+def price_momentum_scores(change) -> np.ndarray:
+    return bucket(change, PRICE_MOMENTUM)
+
+
+def mag7_scores(change) -> np.ndarray:
+    return bucket(change, MAG7)
+
+
+def vix_level_scores(vix) -> np.ndarray:
+    return bucket(vix, VIX_LEVEL)
+
+
+def bond_scores(bond_change) -> np.ndarray:
+    bond_change = np.asarray(bond_change, dtype=float)
+    idx = (np.searchsorted(BOND_LOWER, bond_change, side='right') +
+           np.searchsorted(BOND_UPPER, bond_change, side='left'))
+    return np.where(np.isnan(bond_change), 5, BOND_TABLE[idx])
+
+
+def volume_scores(volume_ratio, change) -> np.ndarray:
+    volume_ratio = np.asarray(volume_ratio, dtype=float)
+    change = np.asarray(change, dtype=float)
+    direction = (change > 0).astype(int) - (change < 0).astype(int) + 1
+    col = np.searchsorted(VOLUME_EDGES, volume_ratio, side='left') + 1
+    col = np.where(volume_ratio < 0.7, 0, col)
+    col = np.where(np.isnan(volume_ratio), 1, col)
+    return VOLUME_TABLE[direction, col]
+
+
+def ma20_position_scores(ma20_diff) -> np.ndarray:
+    return bucket(ma20_diff, MA20_POSITION)
+
+
+def vix_filter_scores(vix) -> np.ndarray:
+    return bucket(vix, VIX_FILTER)
+
+
+def ma20_trend_ladder(days_above, days_below, days_threshold) -> Tuple[int, str]:
+    """MA20 趨勢階梯（保留原始順序，含無法到達的 days_below >= threshold+1 分支）"""
+    if days_above >= days_threshold + 1:
+        return 9, 'BUY'
+    elif days_above >= days_threshold:
+        return 8, 'BUY'
+    elif days_above == 1:
+        return 6, 'WATCH'
+    elif days_below == 1:
+        return 5, 'WATCH'
+    elif days_below >= days_threshold:
+        return 3, 'SELL'
+    elif days_below >= days_threshold + 1:
+        return 2, 'SELL'
+    return 5, 'HOLD'
+
+
+def ma20_trend_scores(days_above, days_below, days_threshold) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    以查表方式計算 MA20 趨勢分數與訊號代碼
+
+    表格由 ma20_trend_ladder 在 0..cap 的整數天數上展開；
+    階梯只與 1、threshold、threshold+1 比較，超過 cap 的天數結果相同。
+    """
+    days_above = np.asarray(days_above, dtype=float)
+    days_below = np.asarray(days_below, dtype=float)
+    cap = max(math.ceil(days_threshold) + 1, 2)
+
+    score_table = np.empty((cap + 1, cap + 1), dtype=int)
+    code_table = np.empty((cap + 1, cap + 1), dtype=np.int8)
+    for a in range(cap + 1):
+        for b in range(cap + 1):
+            score, signal = ma20_trend_ladder(a, b, days_threshold)
+            score_table[a, b] = score
+            code_table[a, b] = SIGNAL_CODES[signal]
+
+    missing = np.isnan(days_above) | np.isnan(days_below)
+    a = np.clip(np.nan_to_num(days_above), 0, cap).astype(int)
+    b = np.clip(np.nan_to_num(days_below), 0, cap).astype(int)
+    scores = np.where(missing, 5, score_table[a, b])
+    codes = np.where(missing, SIGNAL_CODES['HOLD'], code_table[a, b]).astype(np.int8)
+    return scores, codes
+
+
+def default_factor_scores(change, volume_ratio, vix, bond_change) -> Dict[str, np.ndarray]:
+    """Default 策略五因子分數"""
+    return {
+        'price_momentum': price_momentum_scores(change),
+        'volume': volume_scores(volume_ratio, change),
+        'vix': vix_level_scores(vix),
+        'bond': bond_scores(bond_change),
+        'mag7': mag7_scores(change),
+    }
+
+
+def weighted_total(factors: Dict[str, np.ndarray], weights: Dict[str, float]) -> np.ndarray:
+    """依 weights 的順序逐項累加（與 sum(factors[f] * w[f] for f in w) 相同的浮點順序）"""
+    total = 0
+    for f in weights:
+        total = total + factors[f] * weights[f]
+    return np.asarray(total, dtype=float)
+
+
+def matrix_totals(factor_matrix: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    一次矩陣乘法算出多組權重的四捨五入總分
+
+    factor_matrix 為 (因子數 × 列數)，weights 為 (組合數 × 因子數)，欄順序即加總順序。
+    矩陣乘法的加總順序與 weighted_total 不同，只有落在 x.x5 邊界附近的元素可能捨入到不同方向，
+    這些元素改以 weighted_total 的順序逐項重算並以 round() 處理，因此結果與逐組
+    round_scores(weighted_total(...)) 相同；其餘元素離邊界夠遠，直接以 rint 取到 0.1。
+    """
+    factor_matrix = np.asarray(factor_matrix, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    tenths = (weights @ factor_matrix) * 10
+    rounded = np.rint(tenths) / 10
+    near = np.abs(tenths - np.floor(tenths) - 0.5) < 1e-6
+    if near.any():
+        rows, cols = np.nonzero(near)
+        total = 0
+        for k in range(factor_matrix.shape[0]):
+            total = total + factor_matrix[k, cols] * weights[rows, k]
+        rounded[rows, cols] = round_scores(total)
+    return rounded
+
+
+def round_scores(values, ndigits: int = 1) -> np.ndarray:
+    """
+    以 Python round() 的語意四捨五入
+
+    np.round 在 x.x5 這類邊界上與 round() 結果不同，會改變配置與訊號；
+    總分的相異值很少，逐一以 round() 處理後再展開。
+    """
+    values = np.asarray(values, dtype=float)
+    if values.size == 0:
+        return values.copy()
+    unique, inverse = np.unique(values, return_inverse=True)
+    rounded = np.array([round(float(v), ndigits) for v in unique])
+    return rounded[inverse.reshape(values.shape)]
+
+
+def threshold_signal_codes(total) -> np.ndarray:
+    """總分 >= 6.5 為 BUY、<= 3.5 為 SELL，其餘 HOLD"""
+    total = np.asarray(total, dtype=float)
+    codes = np.full(total.shape, SIGNAL_CODES['HOLD'], dtype=np.int8)
+    codes[total >= 6.5] = SIGNAL_CODES['BUY']
+    codes[total <= 3.5] = SIGNAL_CODES['SELL']
+    return codes
+
+
+def regime_codes(total) -> np.ndarray:
+    """BaseStrategy.get_regime 的陣列版本：總分 <= 3.5 為 defense、>= 6.5 為 offense，其餘 neutral"""
+    total = np.asarray(total, dtype=float)
+    codes = np.full(total.shape, REGIME_CODES['neutral'], dtype=np.int8)
+    codes[total >= 6.5] = REGIME_CODES['offense']
+    codes[total <= 3.5] = REGIME_CODES['defense']
+    return codes
+
+
+def default_score_batch(df: pd.DataFrame, weights: Dict[str, float]) -> Dict[str, Any]:
+    """DefaultStrategy.score 的整批版本，鍵與 score() 相同（regime 為 REGIME_CODES 代碼陣列）"""
+    change = frame_column(df, 'change_pct', 0)
+    factor_scores = default_factor_scores(
+        change,
+        frame_column(df, 'volume_ratio', 1.0),
+        frame_column(df, 'vix', 20),
+        frame_column(df, 'us10y_change', 0),
+    )
+    total = round_scores(weighted_total(factor_scores, weights))
+    return {"total_score": total, "regime": regime_codes(total), "factor_scores": factor_scores, "weights": weights}
+
+
+def ma20_score_batch(df: pd.DataFrame, days_threshold: int, vix_limit: float,
+                     weights: Dict[str, float]) -> Dict[str, Any]:
+    """
+    MA20Strategy.score 的整批版本，鍵與 score() 相同
+
+    regime / signal 為 REGIME_CODES / SIGNAL_CODES 代碼陣列；weights 的鍵為
+    ma20_position / ma20_trend / vix_filter，順序即加總順序。
+    """
+    close = frame_column(df, 'close', 0)
+    ma20 = frame_column(df, 'ma20', np.nan)
+    days_above = frame_column(df, 'days_above_ma20', 0)
+    days_below = frame_column(df, 'days_below_ma20', 0)
+    vix = frame_column(df, 'vix', 20)
+    trend, trend_codes = ma20_trend_scores(days_above, days_below, days_threshold)
+    factor_scores = {
+        'ma20_position': ma20_position_scores(frame_column(df, 'ma20_diff_pct', 0)),
+        'ma20_trend': trend,
+        'vix_filter': vix_filter_scores(vix),
+    }
+    total = round_scores(weighted_total(factor_scores, weights))
+
+    risk_off = vix > vix_limit
+    total = np.where(risk_off, np.minimum(total, 4), total)
+    signal = np.where(risk_off, SIGNAL_CODES['RISK_OFF'], trend_codes).astype(np.int8)
+
+    return {
+        "total_score": total, "regime": regime_codes(total), "factor_scores": factor_scores, "weights": weights,
+        "signal": signal, "ma20": np.where(np.isnan(ma20), close, ma20), "close": close,
+        "days_above_ma20": days_above, "days_below_ma20": days_below,
+        "params_used": {"days_threshold": days_threshold, "vix_limit": vix_limit}
+    }
+
+
+# score() 的 factor_scores 明細：各因子分數 → 方向標籤
+FACTOR_DIRECTIONS = {
+    'price_momentum': {9: 'bullish', 8: 'bullish', 7: 'bullish', 6: 'neutral', 5: 'neutral',
+                       4: 'bearish', 3: 'bearish', 2: 'bearish'},
+    'volume': {9: 'confirm', 8: 'confirm', 6: 'diverge', 5: 'neutral', 4: 'diverge', 3: 'confirm', 2: 'confirm'},
+    'vix': {9: 'favorable', 8: 'favorable', 7: 'favorable', 5: 'neutral',
+            4: 'unfavorable', 3: 'unfavorable', 1: 'unfavorable'},
+    'bond': {8: 'favorable', 7: 'favorable', 6: 'favorable', 5: 'neutral',
+             4: 'unfavorable', 3: 'unfavorable', 2: 'unfavorable'},
+    'mag7': {8: 'strong', 7: 'strong', 6: 'neutral', 5: 'neutral', 4: 'weak', 3: 'weak'},
+    'ma20_position': {9: 'strong_above', 8: 'above', 7: 'above', 6: 'slight_above', 5: 'slight_below',
+                      4: 'below', 3: 'below', 2: 'strong_below'},
+    'ma20_trend': {9: 'bullish', 8: 'bullish', 6: 'neutral', 5: 'neutral', 3: 'bearish', 2: 'bearish'},
+    'vix_filter': {8: 'low_risk', 7: 'normal', 5: 'elevated', 3: 'high', 2: 'extreme'},
+}
+
+
+def score_record(batch: Dict[str, Any], i: int = 0, details: Dict[str, Dict] = None) -> Dict[str, Any]:
+    """
+    整批評分結果（default_score_batch / ma20_score_batch）的第 i 列還原成 score() 的 dict
+
+    代碼轉回名稱，factor_scores 還原為 {因子: {"score", "direction", ...}}，
+    details 為各因子附加在 direction 之後的欄位（例如 value、days_above）。
+    """
+    details = details or {}
+    factor_scores = {}
+    for f, scores in batch['factor_scores'].items():
+        score = int(scores[i])
+        factor_scores[f] = {"score": score, "direction": FACTOR_DIRECTIONS[f][score], **details.get(f, {})}
+    total = float(batch['total_score'][i])
+    record = {"total_score": total, "regime": str(REGIME_NAMES[batch['regime'][i]]),
+              "factor_scores": factor_scores, "weights": batch['weights']}
+    if 'signal' in batch:
+        record.update({
+            "signal": str(SIGNAL_NAMES[batch['signal'][i]]), "ma20": float(batch['ma20'][i]),
+            "close": float(batch['close'][i]), "days_above_ma20": int(batch['days_above_ma20'][i]),
+            "days_below_ma20": int(batch['days_below_ma20'][i]), "params_used": batch['params_used'],
+        })
+    return record
+
+
+def allocation_lookup(scores, table) -> np.ndarray:
+    """依 `score <= 2, 3, ..., 8` 的配置階梯查表"""
+    return np.asarray(table)[np.searchsorted(ALLOCATION_EDGES, np.asarray(scores, dtype=float), side='left')]
@@ -0,0 +1,125 @@
+"""
+自適應參數搜索：successive halving
+
+先以短視窗回測評估大量候選，只讓前 1/eta 進入下一輪更長的視窗，
+最後一輪才做完整長度回測；權重候選直接在單純形上以細格點取樣，
+不必展開整個笛卡兒網格；需要完整網格時以 simplex_grid 直接列舉單純形上的整數格點。
+"""
+import math
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# evaluate(candidates, budget) -> 每個候選的分數（越高越好，None / NaN 代表失敗）
+Evaluator = Callable[[List[Any], int], Sequence[Optional[float]]]
+
+
+def sample_weights(n: int, names: Sequence[str], bounds: Dict[str, Tuple[float, float]] = None,
+                   resolution: float = 0.01, seed: int = 0, max_draws: int = 100_000) -> List[Dict[str, float]]:
+    """
+    在權重單純形上隨機取樣 n 組不重複的權重
+
+    每組權重和為 1、落在 resolution 的格點上，並滿足各因子的 (下限, 上限)。
+    """
+    units = int(round(1 / resolution))
+    lower = np.array([round((bounds or {}).get(f, (0.0, 1.0))[0] * units) for f in names])
+    upper = np.array([round((bounds or {}).get(f, (0.0, 1.0))[1] * units) for f in names])
+    rng = np.random.default_rng(seed)
+
+    seen = set()
+    samples = []
+    draws = 0
+    while len(samples) < n and draws < max_draws:
+        batch = rng.dirichlet(np.ones(len(names)), size=max(n, 64)) * units
+        draws += len(batch)
+        # 最大餘數法取整，確保總和剛好為 units
+        base = np.floor(batch).astype(int)
+        remainder = units - base.sum(axis=1)
+        order = np.argsort(-(batch - base), axis=1)
+        for row, extra, rank in zip(base, remainder, order):
+            row[rank[:extra]] += 1
+            if np.any(row < lower) or np.any(row > upper):
+                continue
+            key = tuple(row)
+            if key in seen:
+                continue
+            seen.add(key)
+            samples.append({f: round(int(u) / units, 6) for f, u in zip(names, row)})
+            if len(samples) >= n:
+                break
+    return samples
+
+
+def simplex_grid(names: Sequence[str], resolution: float = 0.05,
+                 bounds: Dict[str, Tuple[float, float]] = None) -> np.ndarray:
+    """
+    列舉權重單純形上所有 resolution 格點，返回 (組合數 × 因子數) 的整數單位矩陣
+
+    每列和為 units = 1 / resolution，第 k 欄落在 bounds[names[k]] × units 之間（含端點）。
+    逐因子以整數展開，剩餘單位已無法落在其餘因子上下限內的前綴直接捨去；
+    列的順序與由第一個因子開始的巢狀迴圈相同。
+    """
+    units = int(round(1 / resolution))
+    limits = [(bounds or {}).get(f, (0.0, 1.0)) for f in names]
+    lower = [max(math.ceil(lo * units - 1e-9), 0) for lo, _ in limits]
+    upper = [min(math.floor(hi * units + 1e-9), units) for _, hi in limits]
+    if not names:
+        return np.zeros((0, 0), dtype=np.int64)
+
+    rows = np.zeros((1, 0), dtype=np.int64)
+    used = np.zeros(1, dtype=np.int64)
+    for k in range(len(names) - 1):
+        values = np.arange(lower[k], upper[k] + 1)
+        remaining = units - (used[:, None] + values[None, :])
+        ok = (remaining >= sum(lower[k + 1:])) & (remaining <= sum(upper[k + 1:]))
+        r, c = np.nonzero(ok)
+        rows = np.column_stack((rows[r], values[c]))
+        used = used[r] + values[c]
+
+    last = units - used
+    keep = (last >= lower[-1]) & (last <= upper[-1])
+    return np.column_stack((rows[keep], last[keep]))
+
+
+def weight_dicts(grid: np.ndarray, names: Sequence[str], resolution: float = 0.05) -> List[Dict[str, float]]:
+    """simplex_grid 的整數單位轉成權重 dict（u / units，與直接寫 0.15 等字面值相同的浮點數）"""
+    units = int(round(1 / resolution))
+    return [{f: int(u) / units for f, u in zip(names, row)} for row in grid]
+
+
+def halving_budgets(full: int, min_budget: int, eta: int = 3) -> List[int]:
+    """由完整長度往回以 1/eta 縮短，得到遞增的評估視窗長度（最後一個為 full）"""
+    budgets = [full]
+    while budgets[0] // eta >= min_budget:
+        budgets.insert(0, budgets[0] // eta)
+    return budgets
+
+
+def successive_halving(candidates: Sequence[Any], evaluate: Evaluator, budgets: Sequence[int],
+                       eta: int = 3, verbose: bool = True) -> List[Tuple[Any, float]]:
+    """
+    依 budgets 逐輪評估，每輪保留前 ceil(n / eta) 名
+
+    返回最後一輪（完整視窗）存活者的 (候選, 分數)，分數由高至低，同分保持輸入順序。
+    """
+    survivors = list(candidates)
+    ranked: List[Tuple[Any, float]] = []
+
+    for round_no, budget in enumerate(budgets, 1):
+        scores = evaluate(survivors, budget)
+        ranked = [
+            (c, float(s)) for c, s in zip(survivors, scores)
+            if s is not None and not math.isnan(s)
+        ]
+        ranked.sort(key=lambda x: x[1], reverse=True)
+
+        if verbose:
+            best = f"{ranked[0][1]:.2f}" if ranked else "-"
+            print(f"   第 {round_no} 輪: {len(survivors)} 組 × {budget} 天, 最佳 {best}")
+
+        if round_no == len(budgets) or not ranked:
+            break
+        keep = max(1, math.ceil(len(ranked) / eta))
+        survivors = [c for c, _ in ranked[:keep]]
+
+    return ranked
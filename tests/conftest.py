@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# 與 scripts/ 相同，以 repo 根目錄為匯入起點（backtest、src.backtester）
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def synthetic_frames(n: int, seed: int = 7, freq: str = 'B') -> dict:
+    """合成的 QQQ / ^VIX / ^TNX 行情（QQQ 依 freq 產生，VIX / 10Y 為涵蓋同一期間的日線）"""
+    rng = np.random.default_rng(seed)
+    start = '2024-01-02' if freq == 'B' else '2024-01-02 09:30'
+    idx = pd.date_range(start, periods=n, freq=freq, tz='America/New_York')
+    close = 400 * np.cumprod(1 + rng.normal(0, 0.012 if freq == 'B' else 0.002, n))
+    qqq = pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.002, n)), 'High': close * 1.01, 'Low': close * 0.99,
+        'Close': close, 'Volume': rng.integers(30_000_000, 60_000_000, n).astype(float),
+    }, index=idx)
+    days = pd.date_range(idx[0].normalize() - pd.Timedelta(days=120), idx[-1].normalize(), freq='B')
+    vix = pd.DataFrame({'Close': rng.uniform(12, 38, len(days))}, index=days)
+    tnx = pd.DataFrame({'Close': 4 + np.cumsum(rng.normal(0, 0.05, len(days)))}, index=days)
+    return {'QQQ': qqq, '^VIX': vix, '^TNX': tnx}
+
+
+@pytest.fixture(scope='session')
+def features() -> pd.DataFrame:
+    """320 個交易日合成行情的回測特徵（backtest.DataFetcher.build_features）"""
+    from src.backtester.features import market_features
+    return market_features(synthetic_frames(320))
@@ -0,0 +1,29 @@
+"""RunningMetrics（run_loop 的串流統計）與 kernel 陣列計算一致"""
+import numpy as np
+import pytest
+
+from src.backtester import kernel
+from src.backtester.accumulator import RunningMetrics
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_running_metrics_match_kernel(seed):
+    returns = np.random.default_rng(seed).normal(0, 1, 250).round(2)
+    returns[::17] = 0.0
+    stats = RunningMetrics()
+    for r, level in zip(returns, np.cumsum(returns)):
+        stats.add_return(r)
+        stats.mark(level)
+
+    expected = {k: float(v[0]) for k, v in kernel.return_stats(returns).items()}
+    assert stats.mean == pytest.approx(expected['mean'], abs=1e-12)
+    assert stats.std == pytest.approx(expected['std'], rel=1e-9)
+    assert stats.sharpe() == pytest.approx(expected['sharpe_ratio'], rel=1e-9)
+    assert stats.win_rate == expected['win_rate']
+    assert stats.profit_loss_ratio == pytest.approx(expected['profit_loss_ratio'], rel=1e-12)
+    assert stats.max_drawdown == pytest.approx(float(kernel.max_drawdown(np.cumsum(returns))[0]), abs=1e-9)
+
+
+def test_empty_accumulator():
+    stats = RunningMetrics()
+    assert (stats.std, stats.win_rate, stats.avg_loss, stats.sharpe()) == (0.0, 0, 1, 0)
@@ -0,0 +1,67 @@
+"""auto_optimize：Default 權重單純形搜索與矩陣計分"""
+import time
+
+import numpy as np
+import pytest
+
+import auto_optimize as ao
+from src.backtester.search import simplex_grid, weight_dicts
+
+
+@pytest.fixture(scope='module')
+def auto_features(features):
+    return features[ao.FEATURE_COLUMNS].astype(float)
+
+
+def test_simplex_grid_covers_bounds_without_float_noise():
+    grid = simplex_grid(ao.DEFAULT_WEIGHT_NAMES, ao.DEFAULT_WEIGHT_RESOLUTION, ao.DEFAULT_WEIGHT_BOUNDS)
+    assert grid.shape == (826, 5)
+    assert (grid.sum(axis=1) == 20).all()
+    assert len({tuple(row) for row in grid.tolist()}) == len(grid)
+    for k, name in enumerate(ao.DEFAULT_WEIGHT_NAMES):
+        lo, hi = ao.DEFAULT_WEIGHT_BOUNDS[name]
+        assert grid[:, k].min() == round(lo * 20) and grid[:, k].max() == round(hi * 20)
+
+    weights = weight_dicts(grid, ao.DEFAULT_WEIGHT_NAMES, ao.DEFAULT_WEIGHT_RESOLUTION)
+    values = {v for w in weights for v in w.values()}
+    assert values <= {round(u * 0.05, 2) for u in range(21)}
+
+
+@pytest.mark.parametrize('days', [5, 60, 200])
+def test_default_weight_metrics_match_per_combo_backtest(auto_features, days):
+    grid = simplex_grid(ao.DEFAULT_WEIGHT_NAMES, 0.1, ao.DEFAULT_WEIGHT_BOUNDS)
+    weights = weight_dicts(grid, ao.DEFAULT_WEIGHT_NAMES, 0.1)
+
+    batch = ao.SimpleBacktester.default_weight_metrics(auto_features, weights, days)
+    for w, metrics in zip(weights, batch):
+        strategy = ao.DefaultStrategy()
+        strategy.load_params({'weights': w})
+        assert metrics == ao.SimpleBacktester.backtest(strategy, auto_features, days)
+
+
+def test_batch_path_stops_at_deadline(auto_features):
+    grid = simplex_grid(ao.DEFAULT_WEIGHT_NAMES, ao.DEFAULT_WEIGHT_RESOLUTION, ao.DEFAULT_WEIGHT_BOUNDS)
+    payloads = [('default', {'weights': w}, 60)
+                for w in weight_dicts(grid, ao.DEFAULT_WEIGHT_NAMES, ao.DEFAULT_WEIGHT_RESOLUTION)]
+    calls = []
+
+    def slow_batch(features, chunk):
+        calls.append(len(chunk))
+        time.sleep(0.3)
+        return ao._default_weights_batch(features, chunk)
+
+    results = ao._run_backtests(payloads, auto_features, deadline=time.monotonic() + 0.1,
+                                batch=slow_batch, batch_size=100)
+    # 第一段算完時已超過時間上限，之後的段不再計算
+    assert calls == [100]
+    assert all(m is not None for m in results[:1])
+    assert all(m is None for m in results[100:])
+
+
+def test_batch_path_evaluates_every_chunk(auto_features):
+    grid = simplex_grid(ao.DEFAULT_WEIGHT_NAMES, 0.1, ao.DEFAULT_WEIGHT_BOUNDS)
+    weights = weight_dicts(grid, ao.DEFAULT_WEIGHT_NAMES, 0.1)
+    payloads = [('default', {'weights': w}, 60) for w in weights]
+
+    results = ao._run_backtests(payloads, auto_features, batch=ao._default_weights_batch, batch_size=7)
+    assert results == ao.SimpleBacktester.default_weight_metrics(auto_features, weights, 60)
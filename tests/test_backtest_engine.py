@@ -0,0 +1,29 @@
+"""BacktestEngine 向量化路徑與逐日迴圈 run_loop 的等價性（合成資料，不連網）"""
+import pytest
+
+import backtest as bt
+
+
+@pytest.mark.parametrize('strategy', [
+    bt.DefaultStrategy(),
+    bt.DefaultStrategy({'weights': {'price_momentum': 0.4, 'volume': 0.1, 'vix': 0.2, 'bond': 0.1, 'mag7': 0.2}}),
+    bt.MA20Strategy(),
+    bt.MA20Strategy({'days_threshold': 4, 'vix_limit': 25, 'position_weight': 0.4,
+                     'trend_weight': 0.3, 'vix_weight': 0.3}),
+], ids=['default', 'default-momentum', 'ma20', 'ma20-strict'])
+def test_run_vectorized_matches_run_loop(features, strategy):
+    engine = bt.BacktestEngine(features)
+    vectorized = engine.run_vectorized(strategy)
+    loop = engine.run_loop(strategy)
+
+    assert vectorized.to_dict() == loop.to_dict()
+    assert len(vectorized.daily_results) == len(loop.daily_results)
+    for a, b in zip(vectorized.daily_results, loop.daily_results):
+        assert a == b
+
+
+def test_run_uses_vectorized_path_by_default(features):
+    engine = bt.BacktestEngine(features)
+    strategy = bt.MA20Strategy()
+    assert engine.run(strategy).to_dict() == engine.run_loop(strategy).to_dict()
+    assert bt.BacktestEngine(features, vectorized=False).run(strategy).to_dict() == engine.run(strategy).to_dict()
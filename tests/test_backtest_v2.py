@@ -0,0 +1,126 @@
+"""backtest_v2：以 kernel.share_fill 成交的 Backtester 與原始逐日迴圈一致、優化器的配置序列去重"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest_v2 as v2
+
+
+def reference_run(close: np.ndarray, target_pct: np.ndarray, capital: float):
+    """原始 Backtester.run 的逐日迴圈：整數股、現金不足不買"""
+    cash, shares = capital, 0
+    navs, trades = [], []
+    for i, (price, pct) in enumerate(zip(close, target_pct / 100)):
+        target_shares = int((cash + shares * price) * pct / price)
+        if target_shares > shares:
+            cost = (target_shares - shares) * price
+            if cost <= cash:
+                trades.append((i, 'BUY', target_shares - shares, cost))
+                shares, cash = target_shares, cash - cost
+        elif target_shares < shares:
+            proceeds = (shares - target_shares) * price
+            trades.append((i, 'SELL', shares - target_shares, proceeds))
+            shares, cash = target_shares, cash + proceeds
+        navs.append(cash + shares * price)
+    return np.array(navs), cash, shares, trades
+
+
+def reference_metrics(navs: np.ndarray, close: np.ndarray, capital: float, trades: int) -> dict:
+    returns = np.diff(navs) / navs[:-1]
+    std = np.std(returns)
+    total_return = (navs[-1] - capital) / capital * 100
+    benchmark = (close[-1] - close[0]) / close[0] * 100
+    drawdown = ((navs - np.maximum.accumulate(navs)) / np.maximum.accumulate(navs) * 100).min()
+    profits, losses = returns[returns > 0], -returns[returns < 0]
+    avg_loss = losses.mean() if len(losses) else 1
+    return {
+        'total_return': round(total_return, 2), 'benchmark_return': round(benchmark, 2),
+        'alpha': round(total_return - benchmark, 2), 'max_drawdown': round(drawdown, 2),
+        'sharpe_ratio': round(returns.mean() / std * np.sqrt(252) if std > 0 else 0, 2),
+        'win_rate': round((returns > 0).mean() * 100, 1),
+        'profit_loss_ratio': round((profits.mean() if len(profits) else 0) / avg_loss, 2),
+        'total_trades': trades, 'final_nav': round(navs[-1], 2), 'days': len(navs),
+    }
+
+
+@pytest.fixture(scope='module')
+def prices():
+    rng = np.random.default_rng(2)
+    close = 400 * np.cumprod(1 + rng.normal(0, 0.015, 300))
+    return pd.DataFrame({'Close': close}, index=pd.date_range('2024-01-02', periods=300, freq='B'))
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_backtester_matches_reference_loop(prices, seed):
+    rng = np.random.default_rng(seed)
+    signals = pd.Series(rng.choice([0, 10, 25, 40, 55, 70, 85, 95, 100], len(prices)), index=prices.index)
+    close = prices['Close'].to_numpy()
+    navs, cash, shares, trades = reference_run(close, signals.to_numpy(dtype=float), 1_000_000)
+
+    bt = v2.Backtester(1_000_000)
+    metrics = bt.run(prices, signals)
+    np.testing.assert_allclose(bt.nav, navs, rtol=1e-12)
+    assert (bt.shares, bt.cash) == (shares, pytest.approx(cash, rel=1e-12))
+    assert [(row, action, n) for row, action, n, _, _ in bt.ledger.tolist()] == \
+        [(i, action, n) for i, action, n, _ in trades]
+    np.testing.assert_allclose(bt.ledger['value'], [v for *_, v in trades], rtol=1e-12)
+    assert metrics == reference_metrics(navs, close, 1_000_000, len(trades))
+
+    # 不保留明細時指標相同
+    assert v2.Backtester(1_000_000, record_history=False).run(prices, signals) == metrics
+    assert bt.nav_frame()['nav'].tolist() == bt.nav.tolist() and len(bt.trades) == len(trades)
+
+
+def test_flat_nav_has_zero_drawdown(prices):
+    metrics = v2.Backtester().run(prices, pd.Series(0, index=prices.index))
+    assert metrics['max_drawdown'] == 0.0 and str(metrics['max_drawdown']) == '0.0'
+    assert metrics['total_trades'] == 0
+
+
+@pytest.fixture(scope='module')
+def market(prices):
+    rng = np.random.default_rng(5)
+    ohlcv = prices.assign(Volume=rng.integers(30_000_000, 60_000_000, len(prices)).astype(float))
+    market_data = pd.DataFrame({
+        'VIX': rng.uniform(12, 38, len(prices)),
+        'US10Y': 4 + np.cumsum(rng.normal(0, 0.05, len(prices))),
+    }, index=prices.index)
+    return ohlcv, market_data
+
+
+def test_optimizer_dedup_matches_per_combo_backtests(market):
+    from qqq_analyzer import MA20Strategy
+    ohlcv, market_data = market
+    # VIX 最高約 38：vix_limit 40 / 45 / 50 產生相同的配置序列
+    ranges = {'days_threshold': [1, 2], 'vix_limit': [25, 40, 45, 50], 'position_weight': [0.4, 0.5],
+              'trend_weight': [0.3, 0.4], 'vix_weight': [0.2, 0.3]}
+
+    optimizer = v2.ParameterOptimizer(MA20Strategy, 1_000_000)
+    best, results = optimizer.optimize(ohlcv, market_data, ranges)
+    assert len(results) == 64
+    for result in results:
+        expected = v2.evaluate_params(MA20Strategy, result['params'], ohlcv, market_data, 1_000_000)
+        assert result['metrics'] == expected
+        assert result['score'] == expected['sharpe_ratio']
+    assert best == results[0]['params']
+    assert [r['score'] for r in results] == sorted((r['score'] for r in results), reverse=True)
+
+
+class PerDay:
+    """只提供 score / get_allocation 的包裝，讓 generate_signals 走逐日路徑"""
+
+    def __init__(self, strategy):
+        self.score = strategy.score
+        self.get_allocation = strategy.get_allocation
+
+
+@pytest.mark.parametrize('name', ['DefaultStrategy', 'MA20Strategy'])
+def test_generate_signals_batch_matches_per_day(market, name):
+    import qqq_analyzer
+    ohlcv, market_data = market
+    strategy = getattr(qqq_analyzer, name)(config={'capital': 1_000_000})
+
+    batch = v2.generate_signals(strategy, ohlcv, market_data)
+    per_day = v2.generate_signals(PerDay(strategy), ohlcv, market_data)
+    pd.testing.assert_series_equal(batch, per_day, check_dtype=False)
+    assert batch.index.equals(ohlcv.index)
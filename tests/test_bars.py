@@ -0,0 +1,79 @@
+"""K 線週期換算、BarStore 與分段特徵計算"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest as bt
+from src.backtester.bars import BarStore, bars_per_day, periods_per_year, session_lagged
+from conftest import synthetic_frames
+
+
+def bars(start: str, n: int, offset: float = 0.0) -> pd.DataFrame:
+    idx = pd.date_range(start, periods=n, freq='5min', tz='America/New_York')
+    values = np.arange(n, dtype=float) + offset
+    return pd.DataFrame({'Open': values, 'Close': values + 0.5}, index=idx)
+
+
+def test_interval_factors():
+    assert bars_per_day('1d') == 1 and periods_per_year('1d') == 252
+    assert bars_per_day('5m') == 78 and periods_per_year('5m') == 252 * 78
+    with pytest.raises(ValueError):
+        bars_per_day('7m')
+
+
+def test_session_lagged_uses_previous_close():
+    daily = pd.DataFrame({'Close': [10.0, 11.0, 12.0]}, index=pd.date_range('2024-01-02', periods=3, freq='B'))
+    index = pd.DatetimeIndex(['2024-01-02 10:00', '2024-01-03 09:35', '2024-01-04 15:55'], tz='America/New_York')
+    lagged = session_lagged(daily, index)['Close'].to_numpy()
+    np.testing.assert_array_equal(lagged, [np.nan, 10.0, 11.0])
+
+
+def test_bar_store_write_merges_and_prefers_new_rows(tmp_path):
+    store = BarStore(str(tmp_path))
+    store.write('QQQ', '5m', bars('2024-01-02 09:30', 10))
+    store.write('QQQ', '5m', bars('2024-01-02 10:00', 10, offset=100))  # 與前 4 根重疊
+
+    merged = store.load('QQQ', '5m')
+    assert len(merged) == 16
+    assert merged.index.is_monotonic_increasing and merged.index.tz is not None
+    np.testing.assert_array_equal(merged['Open'].to_numpy(), np.r_[np.arange(6.0), np.arange(10.0) + 100])
+
+
+def test_bar_store_iter_chunks_overlap(tmp_path):
+    store = BarStore(str(tmp_path))
+    df = bars('2024-01-02 09:30', 25)
+    store.write('QQQ', '5m', df)
+
+    chunks = list(store.iter_chunks('QQQ', '5m', chunk_rows=10, overlap=3))
+    assert [(len(c), warm) for c, warm in chunks] == [(10, 0), (13, 3), (8, 3)]
+    # 去掉暖機列後依序串接即為原資料
+    body = pd.concat([c.iloc[warm:] for c, warm in chunks])
+    pd.testing.assert_frame_equal(body, store.load('QQQ', '5m'), check_freq=False)
+    assert chunks[1][0].index[0] == df.index[7]
+
+    # 第一段的暖機列取自 start 之前
+    first, warm = next(store.iter_chunks('QQQ', '5m', start=df.index[5], chunk_rows=10, overlap=3))
+    assert warm == 3 and first.index[0] == df.index[2]
+
+
+@pytest.mark.parametrize('chunk_rows', [97, 400, 5000])
+def test_build_features_chunked_matches_build_features(tmp_path, chunk_rows):
+    frames = synthetic_frames(1200, seed=11, freq='5min')
+    store = BarStore(str(tmp_path))
+    store.write('QQQ', '5m', frames['QQQ'])
+    market = {t: frames[t] for t in ('^VIX', '^TNX')}
+
+    whole = bt.DataFetcher.build_features({'QQQ': store.load('QQQ', '5m'), **market}, '5m')
+    chunked = bt.DataFetcher.build_features_chunked(store, 'QQQ', '5m', market, chunk_rows=chunk_rows)
+
+    pd.testing.assert_frame_equal(chunked, whole, check_freq=False)
+
+
+def test_intraday_engine_annualises_per_bar(tmp_path):
+    frames = synthetic_frames(600, seed=3, freq='5min')
+    data = bt.DataFetcher.build_features(frames, '5m')
+    daily = bt.BacktestEngine(data).run(bt.MA20Strategy())
+    intraday = bt.BacktestEngine(data, bar_interval='5m').run(bt.MA20Strategy())
+
+    assert intraday.total_return == daily.total_return
+    assert intraday.sharpe_ratio == pytest.approx(daily.sharpe_ratio * np.sqrt(78), abs=0.01)
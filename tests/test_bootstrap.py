@@ -0,0 +1,62 @@
+"""穩健度重抽樣：索引產生、逐列指標與多進程結果一致"""
+import numpy as np
+import pytest
+
+from src.backtester import bootstrap, kernel
+
+
+@pytest.fixture(scope='module')
+def returns():
+    rng = np.random.default_rng(8)
+    market = rng.normal(0.05, 1.2, 240).round(2)
+    return (market * rng.choice([0.25, 0.55, 0.85], 240)).round(4), market
+
+
+def test_stationary_block_indices_continue_within_blocks():
+    idx = bootstrap.stationary_block_indices(np.random.default_rng(0), 200, 50, mean_block=5)
+    assert idx.shape == (200, 50) and idx.min() >= 0 and idx.max() < 50
+    step = (idx[:, 1:] - idx[:, :-1]) % 50
+    continued = step == 1
+    # 每天以 1/5 的機率開新區塊，其餘延續前一天的下一日
+    assert 0.75 < continued.mean() < 0.85
+
+
+def test_random_start_indices_are_contiguous_windows():
+    idx = bootstrap.random_start_indices(np.random.default_rng(0), 100, 50, window=30)
+    assert idx.shape == (100, 30)
+    assert (np.diff(idx, axis=1) == 1).all() and idx[:, -1].max() <= 49
+
+
+def test_identity_path_matches_full_period_metrics(returns):
+    pnls, market = returns
+    metrics = bootstrap.resampled_metrics(pnls[None, :], market[None, :])
+    cumulative = np.cumsum(pnls)
+    assert metrics['total_return'][0] == cumulative[-1]
+    assert metrics['alpha'][0] == pytest.approx(cumulative[-1] - (np.prod(1 + market / 100) - 1) * 100)
+    assert metrics['max_drawdown'][0] == kernel.max_drawdown(cumulative)[0]
+    assert metrics['sharpe_ratio'][0] == kernel.return_stats(pnls)['sharpe_ratio'][0]
+
+
+@pytest.mark.parametrize('method', ['block', 'start'])
+def test_resample_is_independent_of_workers(returns, method):
+    pnls, market = returns
+    single = bootstrap.resample(pnls, market, method, n_paths=1100, seed=3, workers=1, chunk_paths=300)
+    pooled = bootstrap.resample(pnls, market, method, n_paths=1100, seed=3, workers=2, chunk_paths=300)
+    assert set(single) == set(bootstrap.BOOTSTRAP_METRICS)
+    for name in bootstrap.BOOTSTRAP_METRICS:
+        assert len(single[name]) == 1100
+        np.testing.assert_array_equal(single[name], pooled[name])
+
+    other = bootstrap.resample(pnls, market, method, n_paths=1100, seed=4, chunk_paths=300)
+    assert not np.array_equal(single['sharpe_ratio'], other['sharpe_ratio'])
+
+
+def test_robustness_summary_shape(returns):
+    pnls, market = returns
+    summary = bootstrap.robustness_summary(pnls, market, n_paths=400, seed=1)
+    assert summary['window'] == 180
+    for key in ('block_bootstrap', 'random_start'):
+        stats = summary[key]['sharpe_ratio']
+        assert stats['p05'] <= stats['p50'] <= stats['p95']
+    with pytest.raises(ValueError):
+        bootstrap.resample(pnls, market, 'jackknife')
@@ -0,0 +1,95 @@
+"""OHLCVCache：增量補抓尾端、還原因子變動時整段重抓、離線讀取"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backtester.cache import OHLCVCache
+
+
+class FakeYahoo:
+    """模擬 yfinance：可調整最新 K 線位置與還原因子，記錄每次下載的區間"""
+
+    def __init__(self, n: int = 300):
+        idx = pd.date_range('2024-01-01', periods=n, freq='B', tz='America/New_York')
+        close = np.linspace(100, 200, n)
+        self.raw = pd.DataFrame({'Open': close - 1, 'Close': close}, index=idx)
+        self.upto = 200
+        self.factor = 1.0
+        self.calls = []
+
+    def __call__(self, ticker, start, end, adjusted):
+        self.calls.append((start, end))
+        df = self.raw.iloc[:self.upto] * (self.factor if adjusted else 1.0)
+        local = df.index.tz_localize(None)
+        mask = local >= start
+        if end is not None:
+            mask &= local < end
+        return df[mask]
+
+    def expected(self, index, adjusted=True):
+        return self.raw.loc[index, 'Close'] * (self.factor if adjusted else 1.0)
+
+
+@pytest.fixture
+def yahoo():
+    return FakeYahoo()
+
+
+def test_tail_refresh_fetches_only_new_bars(tmp_path, yahoo):
+    cache = OHLCVCache(str(tmp_path), max_age=0)
+    first = cache.get('QQQ', '2024-03-01', fetch=yahoo)
+    assert first.index[0] == yahoo.raw.loc['2024-03-01':].index[0] and first.index[-1] == yahoo.raw.index[199]
+
+    yahoo.upto = 250
+    yahoo.calls.clear()
+    df = cache.get('QQQ', '2024-03-01', fetch=yahoo)
+    assert yahoo.calls == [(first.index[-1].tz_localize(None).normalize(), None)]
+    assert df.index[-1] == yahoo.raw.index[249]
+    np.testing.assert_array_equal(df['Close'], yahoo.expected(df.index))
+
+
+def test_adjustment_change_refetches_full_history(tmp_path, yahoo):
+    cache = OHLCVCache(str(tmp_path), max_age=0)
+    cache.get('QQQ', '2024-03-01', fetch=yahoo)
+
+    # 除息後 yfinance 重新還原整段歷史
+    yahoo.factor, yahoo.upto = 0.98, 280
+    yahoo.calls.clear()
+    df = cache.get('QQQ', '2024-03-01', fetch=yahoo)
+    assert len(yahoo.calls) == 2 and yahoo.calls[1] == (pd.Timestamp('2024-03-01'), None)
+    np.testing.assert_allclose(df['Close'], yahoo.expected(df.index))
+
+
+def test_adjusted_head_backfill_refetches_from_start(tmp_path, yahoo):
+    cache = OHLCVCache(str(tmp_path), max_age=1e9)
+    cache.get('QQQ', '2024-03-01', fetch=yahoo)
+
+    yahoo.factor = 0.97
+    yahoo.calls.clear()
+    df = cache.get('QQQ', '2024-01-01', fetch=yahoo)
+    assert yahoo.calls == [(pd.Timestamp('2024-01-01'), None)]
+    assert df.index[0] == yahoo.raw.index[0]
+    np.testing.assert_allclose(df['Close'], yahoo.expected(df.index))
+
+
+def test_raw_head_backfill_fetches_only_missing_range(tmp_path, yahoo):
+    cache = OHLCVCache(str(tmp_path), max_age=1e9)
+    first = cache.get('QQQ', '2024-03-01', adjusted=False, fetch=yahoo)
+
+    yahoo.calls.clear()
+    df = cache.get('QQQ', '2024-01-01', adjusted=False, fetch=yahoo)
+    assert yahoo.calls == [(pd.Timestamp('2024-01-01'), first.index[0].tz_localize(None).normalize())]
+    np.testing.assert_array_equal(df['Close'], yahoo.expected(df.index, adjusted=False))
+
+
+def test_offline_and_failed_fetch_use_cache(tmp_path, yahoo):
+    cache = OHLCVCache(str(tmp_path), max_age=0)
+    cached = cache.get('QQQ', '2024-03-01', fetch=yahoo)
+
+    def broken(*args):
+        raise ConnectionError('offline')
+
+    same = dict(check_index_type=False, check_freq=False)  # 重新載入的索引為 ns 單位、沒有 freq
+    pd.testing.assert_frame_equal(cache.get('QQQ', '2024-03-01', fetch=broken), cached, **same)
+    pd.testing.assert_frame_equal(cache.get('QQQ', '2024-03-01', fetch=yahoo, offline=True), cached, **same)
+    assert cache.get('QQQ', '2024-03-01', end='2024-03-29', offline=True).index[-1].day == 29
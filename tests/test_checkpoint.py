@@ -0,0 +1,80 @@
+"""CheckpointStore：輸入資料快照、逐筆紀錄與續跑時跳過已完成的組合"""
+import pandas as pd
+import pytest
+
+import auto_optimize as ao
+from src.backtester.checkpoint import CheckpointStore
+from src.backtester.search import simplex_grid, weight_dicts
+
+
+@pytest.fixture(scope='module')
+def auto_features(features):
+    return features[ao.FEATURE_COLUMNS].astype(float)
+
+
+@pytest.fixture
+def payloads():
+    grid = simplex_grid(ao.DEFAULT_WEIGHT_NAMES, 0.1, ao.DEFAULT_WEIGHT_BOUNDS)
+    return [('default', {'weights': w}, 60) for w in weight_dicts(grid, ao.DEFAULT_WEIGHT_NAMES, 0.1)]
+
+
+def counting_batch(calls):
+    def batch(features, chunk):
+        calls.extend(params for _, params, _ in chunk)
+        return ao._default_weights_batch(features, chunk)
+    return batch
+
+
+def test_start_keeps_config_and_frame(tmp_path, auto_features):
+    path = tmp_path / 'jobs.db'
+    store = CheckpointStore(str(path), 'job-1')
+    assert store.status() is None
+    store.start({'days': 60, 'strategies': ['default']}, auto_features)
+    store.close()
+
+    store = CheckpointStore(str(path), 'job-1')
+    assert store.status() == 'running'
+    assert store.config() == {'days': 60, 'strategies': ['default']}
+    pd.testing.assert_frame_equal(store.frame(), auto_features, check_index_type=False, check_freq=False)
+    store.finish('partial')
+    assert store.status() == 'partial'
+    store.close()
+
+
+def test_completed_follows_params_order(tmp_path):
+    store = CheckpointStore(str(tmp_path / 'jobs.db'), 'job-1')
+    store.start({}, pd.DataFrame())
+    keys = [{'params': {'a': k}, 'days': 60} for k in range(4)]
+    store.record('simple_ma20', keys[2], {'sharpe_ratio': 1.5})
+    store.record('simple_ma20', keys[0], {'sharpe_ratio': 0.5})
+
+    assert store.completed('simple_ma20', keys) == [{'sharpe_ratio': 0.5}, None, {'sharpe_ratio': 1.5}, None]
+    # 鍵包含回測天數，策略名稱也分開記錄
+    assert store.completed('simple_ma20', [{'params': {'a': 0}, 'days': 30}]) == [None]
+    assert store.completed('simple_default', keys) == [None] * 4
+    # 以相同 job_id 重新開始會清除舊紀錄
+    store.start({}, pd.DataFrame())
+    assert store.completed('simple_ma20', keys) == [None] * 4
+    store.close()
+
+
+def test_resume_skips_finished_points(tmp_path, auto_features, payloads):
+    path = str(tmp_path / 'jobs.db')
+    store = CheckpointStore(path, 'job-1')
+    store.start({'days': 60}, auto_features)
+    first = ao._run_backtests(payloads[:10], auto_features, checkpoint=store, batch=ao._default_weights_batch)
+    store.close()
+
+    # 中斷後續跑：前 10 組直接取自檢查點，只評估其餘組合
+    store = CheckpointStore(path, 'job-1')
+    calls = []
+    resumed = ao._run_backtests(payloads, auto_features, checkpoint=store, batch=counting_batch(calls))
+    assert calls == [params for _, params, _ in payloads[10:]]
+    assert resumed[:10] == first
+    assert resumed == ao._run_backtests(payloads, auto_features, batch=ao._default_weights_batch)
+
+    # 全部完成後再續跑不再評估任何組合
+    calls.clear()
+    assert ao._run_backtests(payloads, auto_features, checkpoint=store, batch=counting_batch(calls)) == resumed
+    assert calls == []
+    store.close()
@@ -0,0 +1,48 @@
+"""DailyColumns：欄式逐日結果與 List[DailyResult] 相容的行為、存取與零複製轉換"""
+import numpy as np
+import pytest
+
+import backtest as bt
+from src.backtester.daily import DailyColumns
+
+
+@pytest.fixture(scope='module')
+def daily(features):
+    return bt.BacktestEngine(features).run(bt.MA20Strategy()).daily_results
+
+
+def test_behaves_like_list_of_daily_results(daily):
+    rows = list(daily)
+    assert len(rows) == len(daily) and isinstance(rows[0], bt.DailyResult)
+    assert daily[0] == rows[0] and daily[-1] == rows[-1]
+    assert isinstance(rows[0].qqq_pct, int) and isinstance(rows[0].signal, str)
+    assert list(daily[5:10]) == rows[5:10]
+    assert daily[daily['qqq_pct'] > 50] == DailyColumns.from_rows([r for r in rows if r.qqq_pct > 50],
+                                                                   bt.DAILY_FIELDS, bt.DailyResult)
+    with pytest.raises(IndexError):
+        daily[len(daily)]
+
+
+def test_save_load_round_trip(tmp_path, daily):
+    path = tmp_path / 'daily.npz'
+    daily.save(path)
+    loaded = DailyColumns.load(path, bt.DailyResult)
+    assert loaded == daily
+    assert list(loaded) == list(daily)
+    with np.load(path, allow_pickle=False) as z:  # 不需要 pickle
+        assert all(z[k].dtype != object for k in z.files)
+
+
+def test_to_pandas_does_not_copy(daily):
+    df = daily.to_pandas()
+    assert list(df.columns) == list(bt.DAILY_FIELDS)
+    for name in ('close', 'score', 'qqq_pct', 'cumulative_pnl'):
+        assert np.shares_memory(df[name].to_numpy(), daily[name])
+    assert daily.to_pandas(index='date').index.name == 'date'
+
+
+def test_slices_share_memory_and_lengths_are_checked(daily):
+    assert np.shares_memory(daily[10:20]['close'], daily['close'])
+    with pytest.raises(ValueError):
+        DailyColumns({'a': np.zeros(3), 'b': np.zeros(4)})
+    assert len(bt.daily_columns()) == 0 and list(bt.daily_columns()) == []
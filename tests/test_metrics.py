@@ -0,0 +1,42 @@
+"""src.backtester.metrics（scripts/backtest_runner.py 使用）與原始純 Python 實作一致"""
+import numpy as np
+import pytest
+
+from src.backtester.metrics import equity_curve, simple_stats
+
+
+def reference_stats(eq):
+    rets = [(eq[i] / eq[i - 1] - 1.0) for i in range(1, len(eq))]
+    peak = eq[0]
+    maxdd = 0.0
+    for x in eq:
+        peak = max(peak, x)
+        maxdd = max(maxdd, (peak - x) / peak)
+    mu = sum(rets) / len(rets)
+    sd = (sum((r - mu) ** 2 for r in rets) / max(1, len(rets) - 1)) ** 0.5
+    return {"final": eq[-1], "maxdd": maxdd, "sharpe": (mu / sd) if sd > 1e-12 else 0.0}
+
+
+def test_constant_return_has_zero_sharpe():
+    # 固定成長的曲線標準差只剩浮點誤差，不能放大成極大的夏普
+    stats = simple_stats([1.01 ** k for k in range(30)])
+    assert stats["sharpe"] == 0.0
+    assert stats["maxdd"] == 0.0
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_simple_stats_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    prices = [{"close": c} for c in 100 * np.cumprod(1 + rng.normal(0, 0.01, 120))]
+    eq = equity_curve(prices, position=0.6)
+
+    stats = simple_stats(eq)
+    expected = reference_stats(eq)
+    assert stats["final"] == expected["final"]
+    assert stats["maxdd"] == pytest.approx(expected["maxdd"], rel=1e-12)
+    assert stats["sharpe"] == pytest.approx(expected["sharpe"], rel=1e-9)
+
+
+def test_short_curves():
+    assert simple_stats([]) == {"final": 1.0, "maxdd": 0.0, "sharpe": 0.0}
+    assert simple_stats([1.0]) == {"final": 1.0, "maxdd": 0.0, "sharpe": 0.0}
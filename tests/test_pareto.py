@@ -0,0 +1,66 @@
+"""Pareto 前緣：pareto_mask 與 O(n²) 參考實作相同，前緣文件的保存與重新挑選"""
+import numpy as np
+import pytest
+
+from src.backtester import pareto
+
+
+def brute_force_front(values: np.ndarray, senses) -> np.ndarray:
+    points = values * np.asarray(senses, dtype=float)
+    finite = np.isfinite(points).all(axis=1)
+    others = points[finite]
+    mask = np.zeros(len(points), dtype=bool)
+    for i in np.flatnonzero(finite):
+        dominated = ((others >= points[i]).all(axis=1) & (others > points[i]).any(axis=1)).any()
+        mask[i] = not dominated
+    return mask
+
+
+@pytest.mark.parametrize('n, k, seed', [(1, 2, 0), (300, 2, 1), (500, 4, 2), (2500, 3, 3)])
+def test_pareto_mask_matches_brute_force(n, k, seed):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(n, k)).round(1)  # 四捨五入製造平手與重複點
+    if n > 10:
+        values[rng.integers(0, n, 5), rng.integers(0, k, 5)] = np.nan
+    senses = [1, -1, 1, -1][:k]
+
+    np.testing.assert_array_equal(pareto.pareto_mask(values, senses, block=64),
+                                  brute_force_front(values, senses))
+
+
+def test_select_on_front_matches_best_over_all_points(tmp_path):
+    rng = np.random.default_rng(4)
+    n = 400
+    columns = {
+        'alpha': rng.normal(0, 5, n).round(2), 'sharpe_ratio': rng.normal(1, 0.5, n).round(2),
+        'max_drawdown': rng.uniform(1, 20, n).round(2), 'accuracy': rng.uniform(40, 60, n).round(1),
+        'total_trades': rng.integers(0, 50, n),
+    }
+    params_list = [{'id': i} for i in range(n)]
+    path = tmp_path / 'ma20.json'
+    doc = pareto.save_front(str(path), 'ma20', params_list, columns, meta={'weeks': 52})
+
+    loaded = pareto.load_front(str(path))
+    assert loaded == doc and loaded['evaluated'] == n
+    assert [e['params']['id'] for e in loaded['front']] == \
+        np.flatnonzero(pareto.pareto_mask(np.column_stack([columns[k] for k in pareto.OBJECTIVES]),
+                                          list(pareto.OBJECTIVES.values()))).tolist()
+
+    weights = pareto.parse_weights('alpha=0.3, sharpe_ratio=0.25, max_drawdown=-0.1, accuracy=0.15')
+    scores = sum(w * np.asarray(columns[k], dtype=float) for k, w in weights.items())
+    assert pareto.select(loaded, weights)['score'] == pytest.approx(scores.max())
+
+    with pytest.raises(ValueError):
+        pareto.select(loaded, {'win_rate': 1})
+    with pytest.raises(ValueError):
+        pareto.parse_weights('alpha')
+
+
+def test_halving_front_covers_every_candidate(features, tmp_path):
+    import backtest as bt
+    optimizer = bt.ParameterOptimizer(features, 52, pareto_dir=str(tmp_path), prune=True)
+    assert not optimizer.prune  # 保存前緣時不剪枝
+
+    optimizer.optimize_default(auto_save=False, search='halving', samples=30)
+    doc = pareto.load_front(str(tmp_path / 'default.json'))
+    assert doc['evaluated'] == len(bt.DEFAULT_WEIGHT_SETS) + 30
@@ -0,0 +1,42 @@
+"""上界剪枝（ParameterOptimizer._pruned_scores）與完整網格評估的最佳組合相同"""
+import numpy as np
+import pytest
+
+import backtest as bt
+
+
+def params_for(optimizer, name):
+    if name == 'ma20':
+        return optimizer.ma20_param_combinations(bt.MA20_WIDE_PARAM_GRID)[0]
+    names = list(bt.DEFAULT_WEIGHT_SETS[0])
+    grid = bt.simplex_grid(names, 0.1, bt.DEFAULT_WEIGHT_BOUNDS)
+    return [{'weights': w} for w in bt.weight_dicts(grid, names, 0.1)]
+
+
+@pytest.mark.parametrize('name', ['ma20', 'default'])
+@pytest.mark.parametrize('block', [7, 21])
+def test_pruned_scores_best_matches_full_grid(features, name, block):
+    optimizer = bt.ParameterOptimizer(features, 52)
+    params_list = params_for(optimizer, name)
+    allocate = optimizer.ma20_allocations if name == 'ma20' else optimizer.default_allocations
+
+    full = optimizer._grid_metrics(*allocate(params_list))['composite_score']
+    pruned = optimizer._pruned_scores(name, params_list, block=block)['composite_score']
+
+    best = int(np.argsort(-full, kind='stable')[0])
+    assert int(np.argsort(-pruned, kind='stable')[0]) == best
+    assert pruned[best] == full[best]
+    # 剪枝確實生效，且未被剪掉的組合分數與完整評估相同
+    kept = np.isfinite(pruned)
+    assert not kept.all()
+    np.testing.assert_array_equal(pruned[kept], full[kept])
+
+
+def test_pruned_top_k_keeps_the_k_best(features):
+    optimizer = bt.ParameterOptimizer(features, 52)
+    params_list = params_for(optimizer, 'ma20')
+    full = optimizer._grid_metrics(*optimizer.ma20_allocations(params_list))['composite_score']
+    pruned = optimizer._pruned_scores('ma20', params_list, top_k=5)['composite_score']
+
+    top = np.argsort(-full, kind='stable')[:5]
+    np.testing.assert_array_equal(pruned[top], full[top])
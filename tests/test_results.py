@@ -0,0 +1,57 @@
+"""ResultCache：以資料指紋 + 策略 + 參數為鍵的回測結果快取"""
+import backtest as bt
+from src.backtester.results import ResultCache, frame_fingerprint
+
+METRICS = {'alpha': 1.5, 'sharpe_ratio': 0.8}
+
+
+def test_hit_and_miss_keyed_on_fingerprint(tmp_path, features):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'))
+    fingerprint = frame_fingerprint(features)
+    cache.put(fingerprint, 'ma20', {'days_threshold': 2, 'vix_limit': 30}, METRICS)
+
+    # 參數 dict 的鍵順序不影響
+    assert cache.get(fingerprint, 'ma20', {'vix_limit': 30, 'days_threshold': 2}) == METRICS
+    assert cache.get(fingerprint, 'ma20', {'days_threshold': 3, 'vix_limit': 30}) is None
+    assert cache.get(fingerprint, 'default', {'days_threshold': 2, 'vix_limit': 30}) is None
+
+    changed = features.copy()
+    changed.iloc[-1, changed.columns.get_loc('close')] += 0.01
+    assert frame_fingerprint(changed) != fingerprint
+    assert cache.get(frame_fingerprint(changed), 'ma20', {'days_threshold': 2, 'vix_limit': 30}) is None
+    assert frame_fingerprint(features.copy()) == fingerprint
+
+    # 重新開啟後仍然命中
+    cache.close()
+    assert ResultCache(str(tmp_path / 'results.sqlite')).get(fingerprint, 'ma20',
+                                                              {'days_threshold': 2, 'vix_limit': 30}) == METRICS
+
+
+def test_get_many_order_and_lru_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'), max_bytes=10 ** 6)
+    cache.put_many('fp', 's', [({'i': i}, {'v': i}) for i in range(5)])
+    assert cache.get_many('fp', 's', [{'i': 3}, {'i': 9}, {'i': 0}]) == [{'v': 3}, None, {'v': 0}]
+
+    entry = cache.size() // 5
+    cache.max_bytes = entry * 5
+    cache.get('fp', 's', {'i': 1})  # 最近使用，不應被淘汰
+    cache.put('fp', 's', {'i': 5}, {'v': 5})
+    assert cache.size() <= cache.max_bytes
+    assert cache.get('fp', 's', {'i': 1}) == {'v': 1}
+    assert cache.get('fp', 's', {'i': 5}) == {'v': 5}
+    assert None in cache.get_many('fp', 's', [{'i': i} for i in (0, 2, 3, 4)])
+
+
+def test_engine_returns_cached_metrics(tmp_path, features):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'))
+    engine = bt.BacktestEngine(features, record_daily=False, result_cache=cache)
+    strategy = bt.MA20Strategy()
+
+    first = engine.run(strategy)
+    assert cache.get(engine.fingerprint, 'ma20', strategy.get_params_for_save()) == first.to_dict()
+    assert engine.run(strategy).to_dict() == first.to_dict()
+
+    # 命中時直接返回快取內容（不重新回測）
+    cache.put(engine.fingerprint, 'ma20', strategy.get_params_for_save(), {**first.to_dict(), 'alpha': 99.0})
+    assert engine.run(strategy).alpha == 99.0
+    assert bt.BacktestEngine(features, bar_interval='5m').fingerprint != engine.fingerprint
@@ -0,0 +1,106 @@
+"""向量化評分（scoring）與逐列 if/elif 評分階梯一致"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest as bt
+import qqq_analyzer
+import qqq_analyzer_v5
+from src.backtester import scoring
+
+
+def boundary_rows() -> pd.DataFrame:
+    """落在各階梯邊界上的值（含 NaN），與隨機值交錯組合"""
+    rng = np.random.default_rng(0)
+    n = 2000
+    pick = lambda edges, lo, hi: np.where(rng.random(n) < 0.5, rng.choice(edges, n), rng.uniform(lo, hi, n))
+    df = pd.DataFrame({
+        'close': rng.uniform(300, 500, n),
+        'change_pct': pick([-2.0, -1.5, -1.0, -0.5, 0.0, 0.5, 1.0, 1.5, 2.0], -3, 3),
+        'volume_ratio': pick([0.7, 1.2, 1.5], 0.3, 2.0),
+        'vix': pick([12, 15, 18, 20, 22, 25, 28, 30, 35], 8, 45),
+        'us10y_change': pick([-0.08, -0.05, -0.02, 0.02, 0.05, 0.08], -0.1, 0.1),
+        'ma20': rng.uniform(300, 500, n),
+        'ma20_diff_pct': pick([-5, -3, -1, 0, 1, 3, 5], -7, 7),
+        'days_above_ma20': rng.integers(0, 6, n).astype(float),
+        'days_below_ma20': rng.integers(0, 6, n).astype(float),
+    })
+    df.loc[rng.integers(0, n, 40), 'vix'] = np.nan
+    df.loc[rng.integers(0, n, 40), 'change_pct'] = np.nan
+    return df
+
+
+def per_row(strategy, df):
+    """BaseStrategy.score_batch 的逐列後備路徑：對每列呼叫 score()"""
+    return bt.BaseStrategy.score_batch(strategy, df)
+
+
+@pytest.mark.parametrize('weights', [
+    None, {'mag7': 0.2, 'bond': 0.1, 'vix': 0.2, 'volume': 0.1, 'price_momentum': 0.4},
+])
+def test_default_score_batch_matches_per_row(weights):
+    df = boundary_rows()
+    strategy = bt.DefaultStrategy({'weights': weights} if weights else None)
+    totals, codes, factors = per_row(strategy, df)
+
+    batch = scoring.default_score_batch(df, strategy.weights)
+    np.testing.assert_array_equal(batch['total_score'], totals)
+    np.testing.assert_array_equal(batch['regime'], scoring.regime_codes(totals))
+    for name, values in factors.items():
+        np.testing.assert_array_equal(batch['factor_scores'][name], values)
+
+
+@pytest.mark.parametrize('days_threshold, vix_limit', [(1, 35), (2, 25), (3, 30), (4, 20)])
+def test_ma20_score_batch_matches_per_row(days_threshold, vix_limit):
+    df = boundary_rows()
+    params = {'days_threshold': days_threshold, 'vix_limit': vix_limit,
+              'position_weight': 0.4, 'trend_weight': 0.35, 'vix_weight': 0.25}
+    strategy = bt.MA20Strategy(params)
+    totals, codes, factors = per_row(strategy, df)
+
+    weights = {'ma20_position': 0.4, 'ma20_trend': 0.35, 'vix_filter': 0.25}
+    batch = scoring.ma20_score_batch(df, days_threshold, vix_limit, weights)
+    np.testing.assert_array_equal(batch['total_score'], totals)
+    np.testing.assert_array_equal(batch['signal'], codes)
+    for name, values in factors.items():
+        np.testing.assert_array_equal(batch['factor_scores'][name], values)
+
+
+@pytest.mark.parametrize('days_threshold', [1, 2, 3])
+def test_ma20_trend_keeps_unreachable_branch(days_threshold):
+    # days_below >= threshold 先於 >= threshold+1 判斷，跌破更多天也只有 3 分
+    below = np.arange(0, 8, dtype=float)
+    scores, codes = scoring.ma20_trend_scores(np.zeros_like(below), below, days_threshold)
+    assert 2 not in scores
+    for b, score, code in zip(below, scores, codes):
+        assert (score, scoring.SIGNALS[code]) == scoring.ma20_trend_ladder(0, b, days_threshold)
+    assert scores[days_threshold + 1] == 3
+
+
+@pytest.mark.parametrize('module', [qqq_analyzer, qqq_analyzer_v5])
+def test_analyzer_score_is_one_row_of_score_batch(module):
+    data = {
+        'qqq': {'close': 480.0, 'change_pct': 1.2},
+        'technicals': {'volume_ratio': 1.3, 'ma20': 470.0, 'ma20_diff_pct': 2.1,
+                       'consecutive_days_above_ma20': 1, 'consecutive_days_below_ma20': 0},
+        'vix': {'value': 36.0}, 'us10y': {'change': -0.03},
+    }
+    default = module.DefaultStrategy()
+    default.load_params({'weights': {'price_momentum': 0.3, 'volume': 0.2, 'vix': 0.2, 'bond': 0.15, 'mag7': 0.15}})
+    result = default.score(data)
+    assert result['total_score'] == 6.1 and result['regime'] == 'neutral'
+    assert result['factor_scores']['volume'] == {'score': 8, 'direction': 'confirm'}
+    assert set(result) == set(default.score_batch(default.score_frame(data)))
+
+    ma20 = module.MA20Strategy()
+    ma20.load_params({'days_threshold': 2, 'vix_limit': 35})
+    result = ma20.score(data)
+    assert result['signal'] == 'RISK_OFF' and result['total_score'] == 4.0 and result['regime'] == 'neutral'
+    assert result['factor_scores']['ma20_trend'] == {'score': 6, 'direction': 'neutral', 'days_above': 1,
+                                                     'signal': 'WATCH'}
+    assert result['factor_scores']['vix_filter'] == {'score': 2, 'direction': 'extreme', 'value': 36.0}
+    assert set(result) == set(ma20.score_batch(ma20.score_frame(data)))
+
+    # 缺少的欄位套用與原本 dict.get 相同的預設值
+    bare = ma20.score({'qqq': {'close': 100.0}})
+    assert bare['ma20'] == 100.0 and bare['signal'] == 'HOLD' and bare['factor_scores']['vix_filter']['value'] == 20.0
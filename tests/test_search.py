@@ -0,0 +1,65 @@
+"""Default 權重搜索：取樣、successive halving 與 walk-forward 使用的搜索設定"""
+import sys
+
+import numpy as np
+import pytest
+
+import backtest as bt
+from src.backtester.search import halving_budgets, sample_weights, successive_halving
+
+
+def test_sample_weights_on_grid_and_within_bounds():
+    names = list(bt.DEFAULT_WEIGHT_SETS[0])
+    samples = sample_weights(200, names, bt.DEFAULT_WEIGHT_BOUNDS, resolution=0.01, seed=3)
+    assert len(samples) == 200
+    assert len({tuple(w.values()) for w in samples}) == 200
+    for w in samples:
+        units = np.array([w[f] * 100 for f in names])
+        np.testing.assert_allclose(units, units.round(), atol=1e-9)
+        assert round(units.sum()) == 100
+        assert all(0.05 <= w[f] <= 0.45 for f in names)
+    assert samples == sample_weights(200, names, bt.DEFAULT_WEIGHT_BOUNDS, resolution=0.01, seed=3)
+
+
+def test_halving_budgets_and_survivors():
+    assert halving_budgets(300, 40, 3) == [100, 300]
+    assert halving_budgets(1000, 40, 3) == [111, 333, 1000]
+
+    seen = []
+
+    def evaluate(batch, budget):
+        seen.append((budget, list(batch)))
+        return [float(c) * (1 if budget == 1000 else -1 if c == 7 else 1) for c in batch]
+
+    ranked = successive_halving(list(range(10)), evaluate, [111, 333, 1000], eta=3, verbose=False)
+    assert [len(b) for _, b in seen] == [10, 4, 2]
+    assert ranked[0] == (9, 9.0)
+    assert 7 not in seen[1][1]  # 短視窗表現差的候選在第一輪被淘汰
+
+
+@pytest.mark.parametrize('search, options', [
+    ('sets', {}), ('simplex', {'resolution': 0.1}), ('halving', {'samples': 20}),
+])
+def test_walk_forward_honours_default_search(features, search, options):
+    default_search = {'search': search, **options}
+    wf = bt.WalkForwardOptimizer(features, train_weeks=26, test_weeks=8, default_search=default_search)
+    windows, _ = wf.run('default')
+
+    for window, (train_start, test_start, _) in zip(windows, wf.windows()):
+        optimizer = bt.ParameterOptimizer(features.iloc[train_start:test_start], 0)
+        params, _ = optimizer.best_default_params(**default_search)
+        assert window.params == params
+
+
+def test_walk_forward_honours_prune(features):
+    pruned, _ = bt.WalkForwardOptimizer(features, 26, 8, prune=True).run('ma20', bt.MA20_WIDE_PARAM_GRID)
+    full, _ = bt.WalkForwardOptimizer(features, 26, 8).run('ma20', bt.MA20_WIDE_PARAM_GRID)
+    assert [w.params for w in pruned] == [w.params for w in full]
+    assert [w.train_score for w in pruned] == [w.train_score for w in full]
+
+
+def test_walk_forward_rejects_pareto(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['backtest.py', '--optimize', '--walk-forward', '--pareto'])
+    with pytest.raises(SystemExit) as exc:
+        bt.main()
+    assert exc.value.code == 2